@@ -0,0 +1,198 @@
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+from telethon import TelegramClient
+from telethon.tl.types import Message
+from loguru import logger
+
+from entity_cache import EntityCache
+from routing import RoutingTable
+
+
+# Answers never start with a command, so an answer seen in the control chat isn't run again
+HELP_TEXT = (
+    "Commands:\n"
+    "/track <user ID or @username> [route] - forward messages from a user\n"
+    "/untrack <user ID or @username> [route] - stop forwarding messages from a user\n"
+    "/tracked - list the tracked users of every route\n"
+    "/reload - reload the configuration"
+)
+
+
+class AdminCommands:
+    """
+    Commands sent to a control chat by the owner to change the forwarder at runtime.
+    
+    Tracked users added or removed with commands are remembered and applied again
+    to the routing table built by every reload, until the next restart.
+    """
+    
+    def __init__(self, client: TelegramClient, entity_cache: EntityCache,
+                 get_routing_table: Callable[[], RoutingTable], reload: Callable[[], Awaitable[bool]],
+                 admin_user_ids: List[int]):
+        """
+        Initialize the AdminCommands.
+        
+        Args:
+            client: An authenticated TelegramClient instance, used to resolve usernames
+            entity_cache: Cache warmed for newly tracked users
+            get_routing_table: Function returning the routing table currently in use
+            reload: Coroutine function reloading the configuration, returning whether it succeeded
+            admin_user_ids: IDs of the users allowed to send commands
+        """
+        self._client = client
+        self._entity_cache = entity_cache
+        self._get_routing_table = get_routing_table
+        self._reload = reload
+        self._admin_user_ids = set(admin_user_ids)
+        
+        # Changes made with commands in order: (tracked, user_id, route name or None for every route)
+        self._changes: List[Tuple[bool, int, Optional[str]]] = []
+        # IDs of the answers sent, which come back as new messages when the account itself is the admin
+        self._answer_ids: Set[int] = set()
+    
+    def is_admin(self, user_id: Optional[int]) -> bool:
+        """
+        Check if a user may send commands.
+        
+        Args:
+            user_id: The ID of the user
+        
+        Returns:
+            True if the user is an admin, False otherwise
+        """
+        return user_id in self._admin_user_ids
+    
+    async def handle(self, message: Message) -> Optional[str]:
+        """
+        Run the command in a message.
+        
+        Args:
+            message: A message from the control chat
+        
+        Returns:
+            The answer to send back, None if the message isn't a command from an admin
+        """
+        if message.id in self._answer_ids:
+            self._answer_ids.discard(message.id)
+            return None
+        text = (message.message or '').strip()
+        if not text.startswith('/') or not self.is_admin(message.sender_id):
+            return None
+        
+        # Commands may be addressed to a bot, e.g. /track@forwarder_bot
+        parts = text.split()
+        command = parts[0].split('@', 1)[0].lower()
+        arguments = parts[1:]
+        logger.info(f"Admin command from {message.sender_id}: {text}")
+        
+        try:
+            if command in ('/track', '/untrack'):
+                if not arguments or len(arguments) > 2:
+                    return f"Usage: {command} <user ID or @username> [route]"
+                return await self._set_tracked(command == '/track', arguments[0],
+                                               arguments[1] if len(arguments) > 1 else None)
+            if command == '/tracked':
+                return self._list_tracked()
+            if command == '/reload':
+                return "Configuration reloaded" if await self._reload() else "Reload failed, see the log"
+        except Exception as e:
+            logger.error(f"Error running admin command '{text}': {e}")
+            return f"Error: {e}"
+        return HELP_TEXT
+    
+    def remember_answer(self, message_id: int) -> None:
+        """
+        Record a sent answer so it is ignored when it comes back as a new message.
+        
+        Args:
+            message_id: The ID of the answer in the control chat
+        """
+        self._answer_ids.add(message_id)
+    
+    def apply(self, routing_table: RoutingTable) -> None:
+        """
+        Apply the changes made with commands to a newly built routing table.
+        
+        Args:
+            routing_table: The routing table to update
+        """
+        for tracked, user_id, route_name in self._changes:
+            self._update_routes(routing_table, tracked, user_id, route_name)
+    
+    async def _set_tracked(self, tracked: bool, user: str, route_name: Optional[str]) -> str:
+        """
+        Start or stop tracking a user.
+        
+        Args:
+            tracked: Whether the user should be tracked
+            user: The user ID or @username
+            route_name: The route to change, None for every route
+        
+        Returns:
+            The answer to the command
+        """
+        user_id = await self._resolve_user(user)
+        changed = self._update_routes(self._get_routing_table(), tracked, user_id, route_name)
+        if not changed:
+            return f"No route named '{route_name}'"
+        
+        self._changes.append((tracked, user_id, route_name))
+        if tracked:
+            # Resolve the user now so their first message doesn't wait for it
+            await self._entity_cache.prewarm([user_id])
+            self._entity_cache.save()
+        action = "Tracking" if tracked else "No longer tracking"
+        return f"{action} user {user_id} in {', '.join(changed)}"
+    
+    def _list_tracked(self) -> str:
+        """
+        Describe the tracked users of every route.
+        
+        Returns:
+            One line per route
+        """
+        lines = []
+        for route_name, user_service in self._get_routing_table().routes:
+            users = ', '.join(str(user_id) for user_id in sorted(user_service.tracked_users)) or 'none'
+            lines.append(f"{route_name}: {users}")
+        return '\n'.join(lines) or "No routes"
+    
+    async def _resolve_user(self, user: str) -> int:
+        """
+        Turn a command argument into a user ID.
+        
+        Args:
+            user: A user ID or @username
+        
+        Returns:
+            The user ID
+        """
+        try:
+            return int(user)
+        except ValueError:
+            return await self._client.get_peer_id(user)
+    
+    @staticmethod
+    def _update_routes(routing_table: RoutingTable, tracked: bool, user_id: int,
+                       route_name: Optional[str]) -> List[str]:
+        """
+        Add a user to or remove them from the tracked users of routes.
+        
+        Args:
+            routing_table: The routing table whose routes are changed
+            tracked: Whether the user should be tracked
+            user_id: The ID of the user
+            route_name: The route to change, None for every route
+        
+        Returns:
+            Names of the changed routes
+        """
+        changed = []
+        for name, user_service in routing_table.routes:
+            if route_name is not None and name != route_name:
+                continue
+            if tracked:
+                user_service.add_tracked_user(user_id)
+            else:
+                user_service.remove_tracked_user(user_id)
+            changed.append(name)
+        return changed
\ No newline at end of file
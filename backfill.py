@@ -0,0 +1,221 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set
+from telethon import TelegramClient
+from loguru import logger
+
+from message_cache import RecentMessageCache
+from message_pipeline import MessagePipeline
+from routing import RoutingTable
+
+
+class CursorStore:
+    """
+    Persisted ID of the last processed message per source chat.
+    
+    Messages are processed in parallel and may stay buffered after their worker is done,
+    so a cursor only moves past a message once it and every earlier message started in
+    the chat were forwarded. A message that failed holds the cursor back until the
+    restart that retries it.
+    """
+    
+    def __init__(self, path: str, save_interval: float = 5.0):
+        """
+        Initialize the CursorStore.
+        
+        Args:
+            path: Path of the JSON file the cursors are saved to
+            save_interval: Minimum seconds between saves triggered by advancing a cursor
+        """
+        self._path = path
+        self._save_interval = save_interval
+        self._cursors: Dict[int, int] = {}
+        # Messages started but not forwarded yet, and the highest forwarded message, per chat
+        self._in_flight: Dict[int, Set[int]] = {}
+        self._completed: Dict[int, int] = {}
+        self._saved_at = 0.0
+        self._dirty = False
+    
+    def load(self) -> None:
+        """Load the saved cursors from disk."""
+        if not os.path.exists(self._path):
+            return
+        
+        try:
+            with open(self._path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading backfill cursors: {e}")
+            return
+        
+        self._cursors = {int(chat_id): int(message_id) for chat_id, message_id in data.items()}
+        logger.info(f"Loaded backfill cursors for {len(self._cursors)} chats")
+    
+    def get(self, chat_id: int) -> Optional[int]:
+        """
+        Get the ID of the last processed message in a chat.
+        
+        Args:
+            chat_id: The ID of the source chat
+        
+        Returns:
+            The message ID, or None if nothing was processed in the chat yet
+        """
+        return self._cursors.get(chat_id)
+    
+    def begin(self, chat_id: int, message_id: int) -> None:
+        """
+        Record that a message was submitted for processing, holding the cursor back until it completes.
+        
+        Args:
+            chat_id: The ID of the source chat
+            message_id: The ID of the message
+        """
+        self._in_flight.setdefault(chat_id, set()).add(message_id)
+    
+    def complete(self, chat_id: int, message_id: int, forwarded: bool = True) -> None:
+        """
+        Record that a message was processed and move the chat's cursor forward as far as possible, saving periodically.
+        
+        Args:
+            chat_id: The ID of the source chat
+            message_id: The ID of the processed message
+            forwarded: Whether the message reached every destination; if not, the cursor stays before it
+        """
+        if not forwarded:
+            return
+        
+        in_flight = self._in_flight.get(chat_id)
+        if in_flight is not None:
+            in_flight.discard(message_id)
+            if not in_flight:
+                del self._in_flight[chat_id]
+                in_flight = None
+        completed = self._completed[chat_id] = max(self._completed.get(chat_id, 0), message_id)
+        
+        # Everything below the oldest unfinished message is done
+        cursor = completed if in_flight is None else min(completed, min(in_flight) - 1)
+        if cursor <= self._cursors.get(chat_id, 0):
+            return
+        
+        self._cursors[chat_id] = cursor
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self._save_interval:
+            self.save()
+    
+    def save(self) -> None:
+        """Write the cursors to disk if they changed."""
+        if not self._dirty:
+            return
+        
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        temp_path = f"{self._path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({str(chat_id): message_id for chat_id, message_id in self._cursors.items()}, file)
+            os.replace(temp_path, self._path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        except OSError as e:
+            logger.error(f"Error saving backfill cursors: {e}")
+
+
+class Backfiller:
+    """Pages through the history of source chats and feeds missed messages to the pipeline."""
+    
+    def __init__(self, client: TelegramClient, routing_table: RoutingTable, pipeline: MessagePipeline,
+                 cursor_store: CursorStore, recent_messages: RecentMessageCache, progress_interval: int = 1000):
+        """
+        Initialize the Backfiller.
+        
+        Args:
+            client: An authenticated TelegramClient instance
+            routing_table: Routing table used to check whether a sender is tracked in a chat
+            pipeline: Pipeline the matching messages are submitted to
+            cursor_store: Store of the last processed message per chat
+            recent_messages: Buffer of recent source messages, fed so replies resolve locally
+            progress_interval: Number of scanned messages between progress reports
+        """
+        self._client = client
+        self._routing_table = routing_table
+        self._pipeline = pipeline
+        self._cursor_store = cursor_store
+        self._recent_messages = recent_messages
+        self._progress_interval = progress_interval
+        
+        # Highest message ID already scanned per chat, so a second pass only picks up newer messages
+        self._scanned: Dict[int, int] = {}
+    
+    def watermark(self, chat_id: int) -> Optional[int]:
+        """
+        Get the newest message of a chat that the backfill has seen.
+        
+        Args:
+            chat_id: The ID of the source chat
+        
+        Returns:
+            The highest scanned message ID, None if nothing was scanned in the chat
+        """
+        return self._scanned.get(chat_id)
+    
+    async def run(self, chat_ids: List[int], from_message_id: Optional[int] = None) -> None:
+        """
+        Submit every tracked message posted after the cursor of each chat.
+        
+        Chats without a cursor are skipped unless a starting message ID is given,
+        so a first run doesn't replay the whole history.
+        
+        Args:
+            chat_ids: IDs of the source chats to catch up on
+            from_message_id: Message ID to start from in every chat, overriding the saved cursors
+        """
+        for chat_id in chat_ids:
+            if from_message_id is not None:
+                min_id = from_message_id - 1
+            else:
+                cursor = self._cursor_store.get(chat_id)
+                if cursor is None:
+                    logger.info(f"No backfill cursor for chat {chat_id}, starting from live messages")
+                    continue
+                min_id = max(cursor, self._scanned.get(chat_id, 0))
+            
+            await self._backfill_chat(chat_id, min_id)
+    
+    async def _backfill_chat(self, chat_id: int, min_id: int) -> None:
+        """
+        Submit every tracked message in a chat newer than a message ID.
+        
+        Args:
+            chat_id: The ID of the source chat
+            min_id: Only messages with a greater ID are submitted
+        """
+        started_at = time.monotonic()
+        scanned = 0
+        submitted = 0
+        
+        # Telethon pages through history in requests of 100 messages, the most the API allows
+        async for message in self._client.iter_messages(chat_id, min_id=min_id, reverse=True,
+                                                        limit=None, wait_time=0):
+            scanned += 1
+            self._scanned[chat_id] = max(self._scanned.get(chat_id, 0), message.id)
+            self._recent_messages.add(message)
+            
+            # Check the sender before anything that could need another request
+            if message.sender_id and self._routing_table.is_tracked(chat_id, message.sender_id):
+                self._cursor_store.begin(chat_id, message.id)
+                await self._pipeline.submit(message)
+                submitted += 1
+            
+            if scanned % self._progress_interval == 0:
+                elapsed = time.monotonic() - started_at
+                logger.info(f"Backfill of chat {chat_id}: scanned {scanned} messages, submitted {submitted} "
+                            f"({scanned / elapsed:.0f} msg/s), at message {message.id}")
+        
+        elapsed = time.monotonic() - started_at
+        rate = scanned / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Backfill of chat {chat_id} done: scanned {scanned} messages, submitted {submitted} "
+                    f"in {elapsed:.1f}s ({rate:.0f} msg/s)")
\ No newline at end of file
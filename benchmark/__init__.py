@@ -0,0 +1 @@
+"""Offline benchmarks for the forwarder, driven by a fake TelegramClient."""
\ No newline at end of file
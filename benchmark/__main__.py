@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+from loguru import logger
+
+from benchmark.fake_client import FakeTelegramClient, LatencyModel
+from benchmark.harness import configure_environment, run_benchmark, scratch_directory
+from benchmark.streams import STREAMS, TRACKED_USERS, load_recording
+from logging_setup import LOG_MODES, setup_logging
+
+
+def parse_arguments():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Offline benchmark of the Telegram forwarder")
+    
+    parser.add_argument("--stream", choices=sorted(STREAMS) + ['all'], default='all',
+                        help="Synthetic stream to run")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Replay a recording made with RECORD_EVENTS_PATH instead of a synthetic stream")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument("--messages", type=int, default=2000, help="Number of messages per synthetic stream")
+    parser.add_argument("--rate", type=float, default=500, help="Messages per second of synthetic streams")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean latency of fake API calls in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Latency jitter in seconds")
+    parser.add_argument("--flood-every", type=int, default=0, help="Raise a FloodWaitError on every n-th send")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of a send failing")
+    parser.add_argument("--senders", type=int, default=0, help="Number of additional sending accounts")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--trace-memory", action="store_true", help="Report the peak Python heap (slower)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a forwarder setting, e.g. --set PIPELINE_WORKERS=8")
+    parser.add_argument("--verbose", action="store_true", help="Show the forwarder's own log output")
+    parser.add_argument("--log-mode", choices=LOG_MODES,
+                        help="Write the forwarder's log to a file in the given mode to measure its overhead")
+    
+    return parser.parse_args()
+
+
+async def main():
+    """Run the selected benchmarks and print their reports."""
+    args = parse_arguments()
+    
+    def setup_console_logging():
+        logger.remove()
+        logger.add(sys.stderr, level="INFO" if args.verbose else "WARNING")
+    
+    setup_console_logging()
+    overrides = dict(setting.split('=', 1) for setting in args.set)
+    
+    if args.replay:
+        runs = [(f"replay {args.replay} x{args.speed:g}", lambda: load_recording(args.replay))]
+    else:
+        names = sorted(STREAMS) if args.stream == 'all' else [args.stream]
+        runs = [(name, lambda name=name: STREAMS[name](args.messages, args.rate)) for name in names]
+    
+    for name, build_stream in runs:
+        random.seed(args.seed)
+        stream = build_stream()
+        latency = LatencyModel(args.latency, args.jitter)
+        # The accounts send to the same chats, where message IDs are unique
+        message_ids = itertools.count(1)
+        clients = [
+            FakeTelegramClient(
+                latency={method: latency for method in
+                         ('start', 'get_entity', 'get_dialogs', 'get_messages', 'iter_messages', 'send_message',
+                          'send_file', 'forward_messages', 'edit_message', 'delete_messages')},
+                failure_rate=args.failure_rate,
+                flood_wait_every=args.flood_every,
+                usernames={user_id: f"user{user_id}" for user_id in TRACKED_USERS},
+                message_ids=message_ids
+            )
+            for _ in range(1 + args.senders)
+        ]
+        
+        with scratch_directory() as data_dir:
+            configure_environment(data_dir, overrides)
+            if args.log_mode:
+                # Log like the forwarder does in production, so its cost is part of the measurement
+                setup_logging(args.log_mode, os.path.join(data_dir, 'forwarder.log'), console=args.verbose)
+                name = f"{name} (log {args.log_mode})"
+            result = await run_benchmark(name, stream, clients[0], speed=args.speed, trace_memory=args.trace_memory,
+                                         senders=clients[1:])
+            if args.log_mode:
+                await logger.complete()
+                setup_console_logging()
+        
+        print(result.format())
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,302 @@
+import asyncio
+import itertools
+import random
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from telethon.errors import FloodWaitError, MessageAuthorRequiredError, MessageDeleteForbiddenError
+
+
+class FakeMessage:
+    """Stand-in for a Telethon message with the attributes the forwarder reads."""
+    
+    def __init__(self, message_id: int, chat_id: int, sender_id: Optional[int], text: str = '',
+                 reply_to_msg_id: Optional[int] = None, media: Any = None, grouped_id: Optional[int] = None,
+                 entities: Optional[List[Any]] = None, noforwards: bool = False):
+        """
+        Initialize the FakeMessage.
+        
+        Args:
+            message_id: The ID of the message
+            chat_id: The ID of the chat the message was sent in
+            sender_id: The ID of the sender
+            text: The text of the message
+            reply_to_msg_id: The ID of the message this one replies to, if any
+            media: The media of the message, if any
+            grouped_id: The album ID of the message, if any
+            entities: The formatting entities of the text
+            noforwards: Whether the chat forbids forwarding its content
+        """
+        self.id = message_id
+        self.chat_id = chat_id
+        self.peer_id = chat_id
+        self.sender_id = sender_id
+        self.text = text
+        self.raw_text = text
+        self.message = text
+        self.reply_to = FakeReplyHeader(reply_to_msg_id) if reply_to_msg_id is not None else None
+        self.reply_to_msg_id = reply_to_msg_id
+        self.media = media
+        self.grouped_id = grouped_id
+        self.entities = entities
+        self.noforwards = noforwards
+        self.fwd_from = None
+        self.date = None
+        # The client a sent message came back from, like Message.client
+        self.client = None
+
+
+class FakeReplyHeader:
+    """Stand-in for the reply header of a Telethon message."""
+    
+    def __init__(self, reply_to_msg_id: int):
+        """
+        Initialize the FakeReplyHeader.
+        
+        Args:
+            reply_to_msg_id: The ID of the message being replied to
+        """
+        self.reply_to_msg_id = reply_to_msg_id
+
+
+class LatencyModel:
+    """Random latency of a fake API call."""
+    
+    def __init__(self, mean: float = 0.0, jitter: float = 0.0):
+        """
+        Initialize the LatencyModel.
+        
+        Args:
+            mean: Mean latency in seconds
+            jitter: Maximum deviation from the mean in seconds
+        """
+        self.mean = mean
+        self.jitter = jitter
+    
+    async def wait(self) -> None:
+        """Sleep for one sampled latency."""
+        delay = self.mean + random.uniform(-self.jitter, self.jitter) if self.jitter else self.mean
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FakeTelegramClient:
+    """
+    Local stand-in for TelegramClient with configurable latency and failures.
+    
+    Every call is counted, so benchmarks can report API calls per message.
+    Messages added with add_history are served by get_messages and iter_messages.
+    Like on Telegram, only messages sent by the client itself can be edited or deleted.
+    """
+    
+    def __init__(self, latency: Optional[Dict[str, LatencyModel]] = None, failure_rate: float = 0.0,
+                 flood_wait_every: int = 0, flood_wait_seconds: int = 1, usernames: Optional[Dict[int, str]] = None,
+                 message_ids: Optional[Iterator[int]] = None, authorized: bool = True):
+        """
+        Initialize the FakeTelegramClient.
+        
+        Args:
+            latency: Latency per method name, methods without an entry answer immediately
+            failure_rate: Probability of a send failing with a retryable ConnectionError
+            flood_wait_every: Raise a FloodWaitError on every n-th send, 0 to never raise one
+            flood_wait_seconds: Seconds requested by the injected FloodWaitErrors
+            usernames: Usernames returned by get_entity, users without one have none
+            message_ids: IDs for sent messages, shared by clients sending to the same chats
+            authorized: Whether the session is logged in
+        """
+        self._latency = latency or {}
+        self._failure_rate = failure_rate
+        self._flood_wait_every = flood_wait_every
+        self._flood_wait_seconds = flood_wait_seconds
+        self._usernames = usernames or {}
+        self._authorized = authorized
+        
+        self.calls: Dict[str, int] = {}
+        self.sent: List[Tuple[int, Any, Dict[str, Any]]] = []
+        self.handlers: List[Tuple[Any, Callable]] = []
+        self.send_listeners: List[Callable[[int, Any, Dict[str, Any]], None]] = []
+        self.flood_waits = 0
+        
+        self._history: Dict[Tuple[int, int], FakeMessage] = {}
+        self._message_ids = message_ids if message_ids is not None else itertools.count(1)
+        # Sent messages as (chat_id, message_id) pairs
+        self._authored: Set[Tuple[Any, int]] = set()
+        self._sends = 0
+        self._disconnected = asyncio.Event()
+    
+    def add_history(self, message: FakeMessage) -> None:
+        """
+        Make a message available to get_messages and iter_messages.
+        
+        Args:
+            message: The message to add
+        """
+        self._history[(message.chat_id, message.id)] = message
+    
+    def on(self, event: Any) -> Callable:
+        """Register an event handler, like TelegramClient.on."""
+        def decorator(callback: Callable) -> Callable:
+            self.handlers.append((event, callback))
+            return callback
+        return decorator
+    
+    def add_event_handler(self, callback: Callable, event: Any = None) -> None:
+        """Register an event handler, like TelegramClient.add_event_handler."""
+        self.handlers.append((event, callback))
+    
+    def remove_event_handler(self, callback: Callable, event: Any = None) -> int:
+        """Remove an event handler, like TelegramClient.remove_event_handler."""
+        before = len(self.handlers)
+        self.handlers = [(builder, handler) for builder, handler in self.handlers if handler is not callback]
+        return before - len(self.handlers)
+    
+    async def start(self, *args, **kwargs) -> 'FakeTelegramClient':
+        """Pretend to connect and log in."""
+        await self._call('start')
+        return self
+    
+    async def connect(self) -> None:
+        """Pretend to connect."""
+        await self._call('connect')
+    
+    async def is_user_authorized(self) -> bool:
+        """Return whether the session is logged in."""
+        await self._call('is_user_authorized')
+        return self._authorized
+    
+    async def run_until_disconnected(self) -> None:
+        """Wait until disconnect is called."""
+        await self._disconnected.wait()
+    
+    async def disconnect(self) -> None:
+        """Stop run_until_disconnected."""
+        self._disconnected.set()
+    
+    def is_connected(self) -> bool:
+        """Return whether the fake client is connected."""
+        return not self._disconnected.is_set()
+    
+    async def get_me(self) -> Any:
+        """Return the logged in user."""
+        await self._call('get_me')
+        return _FakeUser(0, None)
+    
+    async def get_entity(self, user_id: int) -> Any:
+        """Return a user-like object with the configured username."""
+        await self._call('get_entity')
+        return _FakeUser(user_id, self._usernames.get(user_id))
+    
+    async def get_input_entity(self, peer: Any) -> Any:
+        """Return the peer unchanged."""
+        await self._call('get_input_entity')
+        return peer
+    
+    async def get_dialogs(self, *args, **kwargs) -> List[Any]:
+        """Count a dialog listing. The fake client knows every chat already."""
+        await self._call('get_dialogs')
+        return []
+    
+    async def get_messages(self, chat_id: Any, ids: Any = None, **kwargs) -> Any:
+        """Return messages from the history by ID."""
+        await self._call('get_messages')
+        if isinstance(ids, list):
+            return [self._history.get((chat_id, message_id)) for message_id in ids]
+        return self._history.get((chat_id, ids))
+    
+    async def iter_messages(self, chat_id: Any, min_id: int = 0, reverse: bool = False, **kwargs):
+        """Yield the history of a chat after min_id, one call per 100 messages."""
+        messages = sorted(
+            (message for (history_chat_id, _), message in self._history.items()
+             if history_chat_id == chat_id and message.id > min_id),
+            key=lambda message: message.id,
+            reverse=not reverse
+        )
+        for index, message in enumerate(messages):
+            if index % 100 == 0:
+                await self._call('iter_messages')
+            yield message
+    
+    async def iter_download(self, media: Any, chunk_size: int = 128 * 1024, **kwargs):
+        """Yield fake media content in chunks."""
+        size = getattr(getattr(media, 'document', None), 'size', chunk_size) or chunk_size
+        while size > 0:
+            await self._call('iter_download')
+            yield b'\0' * min(chunk_size, size)
+            size -= chunk_size
+    
+    async def send_message(self, chat_id: Any, message: Any = '', **kwargs) -> FakeMessage:
+        """Record a sent message and return it with a new ID."""
+        return await self._send('send_message', chat_id, message, kwargs)
+    
+    async def send_file(self, chat_id: Any, file: Any, **kwargs) -> Any:
+        """Record a sent file or album and return the sent message(s)."""
+        if isinstance(file, list):
+            await self._before_send('send_file')
+            sent = [self._record(chat_id, kwargs.get('caption') if index == 0 else '', dict(kwargs, file=item))
+                    for index, item in enumerate(file)]
+            return sent
+        return await self._send('send_file', chat_id, kwargs.get('caption', ''), dict(kwargs, file=file))
+    
+    async def forward_messages(self, chat_id: Any, messages: Any, from_peer: Any = None, **kwargs) -> Any:
+        """Record forwarded message IDs and return the new messages."""
+        await self._before_send('forward_messages')
+        ids = messages if isinstance(messages, list) else [messages]
+        return [self._record(chat_id, '', dict(kwargs, forwarded_id=message_id, from_peer=from_peer))
+                for message_id in ids]
+    
+    async def edit_message(self, chat_id: Any, message: Any, text: Any = None, **kwargs) -> FakeMessage:
+        """Record an edit and return the edited message."""
+        await self._before_send('edit_message')
+        message_id = message if isinstance(message, int) else message.id
+        if (chat_id, message_id) not in self._authored:
+            raise MessageAuthorRequiredError(request=None)
+        return FakeMessage(message_id, chat_id, None, text or '')
+    
+    async def delete_messages(self, chat_id: Any, message_ids: Any, **kwargs) -> List[Any]:
+        """Record a deletion."""
+        await self._before_send('delete_messages')
+        message_ids = message_ids if isinstance(message_ids, list) else [message_ids]
+        if any((chat_id, message_id) not in self._authored for message_id in message_ids):
+            # The fake account isn't an admin of the chat
+            raise MessageDeleteForbiddenError(request=None)
+        self._authored.difference_update((chat_id, message_id) for message_id in message_ids)
+        return []
+    
+    async def _call(self, method: str) -> None:
+        """Count a call and wait for its latency."""
+        self.calls[method] = self.calls.get(method, 0) + 1
+        latency = self._latency.get(method)
+        if latency is not None:
+            await latency.wait()
+    
+    async def _before_send(self, method: str) -> None:
+        """Count a send and raise the configured injected errors."""
+        await self._call(method)
+        self._sends += 1
+        if self._flood_wait_every and self._sends % self._flood_wait_every == 0:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self._flood_wait_seconds)
+        if self._failure_rate and random.random() < self._failure_rate:
+            raise ConnectionError("Injected send failure")
+    
+    async def _send(self, method: str, chat_id: Any, text: Any, kwargs: Dict[str, Any]) -> FakeMessage:
+        """Perform a single fake send."""
+        await self._before_send(method)
+        return self._record(chat_id, text, kwargs)
+    
+    def _record(self, chat_id: Any, text: Any, kwargs: Dict[str, Any]) -> FakeMessage:
+        """Store a sent message and notify the send listeners."""
+        self.sent.append((chat_id, text, kwargs))
+        for listener in self.send_listeners:
+            listener(chat_id, text, kwargs)
+        message = FakeMessage(next(self._message_ids), chat_id, None, text or '',
+                              reply_to_msg_id=kwargs.get('reply_to'), media=kwargs.get('file'))
+        message.client = self
+        self._authored.add((chat_id, message.id))
+        return message
+
+
+class _FakeUser:
+    """Stand-in for a Telethon user."""
+    
+    def __init__(self, user_id: int, username: Optional[str]):
+        self.id = user_id
+        self.username = username
\ No newline at end of file
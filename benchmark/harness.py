@@ -0,0 +1,313 @@
+import asyncio
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from telethon import events
+
+from benchmark.fake_client import FakeTelegramClient
+from metrics import STAGE_LATENCY
+from benchmark.streams import Stream, DESTINATION_CHAT_ID, TRACKED_USERS
+
+
+# Source message links in forwarded text, e.g. https://t.me/c/1000000001/42
+LINK_PATTERN = re.compile(r't\.me/c/(\d+)/(\d+)')
+
+
+class BenchmarkResult:
+    """Measurements of one benchmark run."""
+    
+    def __init__(self, name: str, injected: int, forwarded: int, duration: float, latencies: List[float],
+                 api_calls: Dict[str, int], flood_waits: int, peak_rss_kb: int,
+                 peak_traced_kb: Optional[int], stages: Optional[Dict[str, Tuple[int, float]]] = None,
+                 account_sends: Optional[Dict[str, int]] = None, ready_seconds: Optional[float] = None,
+                 cpu_seconds: float = 0.0):
+        """
+        Initialize the BenchmarkResult.
+        
+        Args:
+            name: Name of the run
+            injected: Number of messages fed to the forwarder
+            forwarded: Number of source messages that reached a destination
+            duration: Seconds from the first injected message until the forwarder drained
+            latencies: Seconds from injection to the first send of each forwarded message
+            api_calls: Fake API calls by method name
+            flood_waits: Number of injected FloodWaitErrors
+            peak_rss_kb: Peak resident set size of the process in KiB
+            peak_traced_kb: Peak Python heap during the run in KiB, if traced
+            stages: Number of observations and total seconds per forwarding stage
+            account_sends: Sends per account, if the run used sender accounts
+            ready_seconds: Seconds from starting the forwarder until it handled events
+            cpu_seconds: CPU time of the process during the run, including background threads
+        """
+        self.name = name
+        self.injected = injected
+        self.forwarded = forwarded
+        self.duration = duration
+        self.latencies = sorted(latencies)
+        self.api_calls = api_calls
+        self.flood_waits = flood_waits
+        self.peak_rss_kb = peak_rss_kb
+        self.peak_traced_kb = peak_traced_kb
+        self.stages = stages or {}
+        self.account_sends = account_sends or {}
+        self.ready_seconds = ready_seconds
+        self.cpu_seconds = cpu_seconds
+    
+    @property
+    def throughput(self) -> float:
+        """Injected messages processed per second."""
+        return self.injected / self.duration if self.duration > 0 else 0.0
+    
+    @property
+    def calls_per_message(self) -> float:
+        """API calls per injected message, excluding connecting."""
+        calls = sum(count for method, count in self.api_calls.items() if method not in ('start', 'connect'))
+        return calls / self.injected if self.injected else 0.0
+    
+    def percentile(self, fraction: float) -> float:
+        """
+        Return a latency percentile.
+        
+        Args:
+            fraction: The percentile as a fraction, e.g. 0.99
+        
+        Returns:
+            The latency in seconds, or 0 if nothing was forwarded
+        """
+        if not self.latencies:
+            return 0.0
+        index = min(len(self.latencies) - 1, int(round(fraction * (len(self.latencies) - 1))))
+        return self.latencies[index]
+    
+    def format(self) -> str:
+        """Format the result as a human readable report."""
+        calls = ', '.join(f"{method}={count}" for method, count in sorted(self.api_calls.items()))
+        lines = [
+            f"== {self.name} ==",
+            f"messages:        {self.injected} injected, {self.forwarded} forwarded",
+            f"throughput:      {self.throughput:.1f} msg/s over {self.duration:.2f}s",
+            f"latency:         p50 {self.percentile(0.5) * 1000:.1f} ms, p99 {self.percentile(0.99) * 1000:.1f} ms",
+            f"api calls/msg:   {self.calls_per_message:.2f} ({calls})",
+            f"flood waits:     {self.flood_waits}",
+            f"ready after:     {(self.ready_seconds or 0) * 1000:.1f} ms",
+            f"cpu time:        {self.cpu_seconds * 1000 / max(self.injected, 1):.3f} ms/msg",
+            f"peak rss:        {self.peak_rss_kb / 1024:.1f} MiB",
+        ]
+        if self.peak_traced_kb is not None:
+            lines.append(f"peak heap:       {self.peak_traced_kb / 1024:.1f} MiB")
+        if self.account_sends:
+            sends = ', '.join(f"{name}={count}" for name, count in self.account_sends.items())
+            lines.append(f"sends/account:   {sends}")
+        for stage, (count, total) in sorted(self.stages.items()):
+            lines.append(f"stage {stage + ':':<18}{count} x {total / count * 1000:.2f} ms avg")
+        return '\n'.join(lines)
+
+
+def configure_environment(data_dir: str, overrides: Optional[Dict[str, str]] = None) -> None:
+    """
+    Point the forwarder configuration at the fake chats and a scratch data directory.
+    
+    Values from a local .env are overridden so runs are reproducible.
+    
+    Args:
+        data_dir: Directory for the files the forwarder writes
+        overrides: Additional environment variables, applied last
+    """
+    environment = {
+        'API_ID': '1',
+        'API_HASH': 'benchmark',
+        'PHONE_NUMBER': '+10000000000',
+        'SOURCE_CHAT_ID': '-1001000000001',
+        'DESTINATION_CHAT_ID': str(DESTINATION_CHAT_ID),
+        'TRACKED_USERS': ','.join(str(user_id) for user_id in TRACKED_USERS),
+        'ROUTES_FILE': '',
+        'STORAGE_PATH': os.path.join(data_dir, 'messages.db'),
+        'ENTITY_CACHE_PATH': os.path.join(data_dir, 'entity_cache.json'),
+        'STATE_SNAPSHOT_PATH': os.path.join(data_dir, 'state_snapshot.json'),
+        'BACKFILL_ENABLED': 'false',
+        'BACKFILL_CURSOR_PATH': os.path.join(data_dir, 'backfill_cursors.json'),
+        'MEDIA_TEMP_DIR': data_dir,
+        'OUTBOX_PATH': os.path.join(data_dir, 'outbox.jsonl'),
+        'RECORD_EVENTS_PATH': '',
+        'SEND_RATE_PER_CHAT': '1000000',
+        'SEND_BURST_PER_CHAT': '1000',
+        'SEND_GLOBAL_RATE': '1000000',
+        'METRICS_PORT': '',
+    }
+    environment.update(overrides or {})
+    os.environ.update(environment)
+
+
+def _link_chat_id(chat_id: int) -> str:
+    """Format a chat ID the way it appears in message links."""
+    text = str(chat_id)
+    return text[4:] if text.startswith('-100') else text
+
+
+def _source_keys(text: Any, kwargs: Dict[str, Any]) -> List[tuple]:
+    """
+    Find the source messages a send carries.
+    
+    Args:
+        text: The text or caption of the send
+        kwargs: The other arguments of the send
+    
+    Returns:
+        List of (link chat ID, message ID) pairs
+    """
+    if 'forwarded_id' in kwargs:
+        return [(_link_chat_id(kwargs.get('from_peer')), int(kwargs['forwarded_id']))]
+    
+    parts = [text] if isinstance(text, str) else []
+    entities = kwargs.get('formatting_entities') or []
+    if not entities and hasattr(kwargs.get('parse_mode'), 'parse') and isinstance(text, str):
+        entities = kwargs['parse_mode'].parse(text)[1]
+    parts.extend(getattr(entity, 'url', '') or '' for entity in entities)
+    return [(chat, int(message_id)) for part in parts for chat, message_id in LINK_PATTERN.findall(part)]
+
+
+async def run_benchmark(name: str, stream: Stream, client: FakeTelegramClient, speed: float = 1.0,
+                        trace_memory: bool = False, drain_timeout: float = 300,
+                        senders: Optional[List[FakeTelegramClient]] = None) -> BenchmarkResult:
+    """
+    Feed a stream to a forwarder using the fake client and measure it.
+    
+    The environment must be configured with configure_environment first.
+    
+    Args:
+        name: Name of the run, used in the report
+        stream: The messages to feed and their arrival times
+        client: The fake client the forwarder uses
+        speed: Replay speed, 2 feeds the stream twice as fast as recorded
+        trace_memory: Whether to trace the Python heap, which slows the run down
+        drain_timeout: Seconds to wait for the forwarder to drain after the last message
+        senders: Fake clients of additional sending accounts
+    
+    Returns:
+        The measurements of the run
+    """
+    # Imported here so the configuration module reads the benchmark environment
+    from config import TelegramConfig, ForwarderConfig
+    from telegram_forwarder import TelegramForwarder
+    
+    injected_at: Dict[tuple, float] = {}
+    latencies: Dict[tuple, float] = {}
+    
+    def on_send(chat_id: Any, text: Any, kwargs: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        for key in _source_keys(text, kwargs):
+            if key in injected_at and key not in latencies:
+                latencies[key] = now - injected_at[key]
+    
+    clients = [client] + list(senders or [])
+    for account_client in clients:
+        account_client.send_listeners.append(on_send)
+    # Stage metrics are process wide, so only count what this run adds
+    stages_before = STAGE_LATENCY.totals()
+    
+    if trace_memory:
+        tracemalloc.start()
+    
+    cpu_started_at = time.process_time()
+    sender_accounts = [(f"sender{index}", sender) for index, sender in enumerate(senders or [], 1)]
+    forwarder = TelegramForwarder(TelegramConfig(), ForwarderConfig(), client=client, senders=sender_accounts)
+    runner = asyncio.ensure_future(forwarder.start())
+    while not client.handlers:
+        if runner.done():
+            runner.result()
+        await asyncio.sleep(0.01)
+    # Only new messages are fed, MessageEdited builds on NewMessage so the type is compared exactly
+    handlers = [handler for builder, handler in client.handlers if type(builder) is events.NewMessage]
+    
+    # Like Telethon, every update is handled in its own task
+    tasks = []
+    started_at = time.perf_counter()
+    for offset, message in stream:
+        delay = started_at + offset / speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        client.add_history(message)
+        injected_at[(_link_chat_id(message.chat_id), message.id)] = time.perf_counter()
+        event = SimpleNamespace(message=message, chat_id=message.chat_id)
+        tasks.extend(asyncio.ensure_future(handler(event)) for handler in handlers)
+    
+    await asyncio.gather(*tasks)
+    await asyncio.wait_for(forwarder.stop(), drain_timeout)
+    await runner
+    duration = time.perf_counter() - started_at
+    cpu_seconds = time.process_time() - cpu_started_at
+    
+    peak_traced_kb = None
+    if trace_memory:
+        peak_traced_kb = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_kb = peak_rss // 1024 if sys.platform == 'darwin' else peak_rss
+    
+    return BenchmarkResult(
+        name,
+        injected=len(stream),
+        forwarded=len(latencies),
+        duration=duration,
+        latencies=list(latencies.values()),
+        api_calls=_sum_calls(clients),
+        flood_waits=sum(account_client.flood_waits for account_client in clients),
+        peak_rss_kb=peak_rss_kb,
+        peak_traced_kb=peak_traced_kb,
+        stages=_stage_totals_since(stages_before),
+        account_sends=(
+            {name: len(account_client.sent) for name, account_client in [('primary', client)] + sender_accounts}
+            if sender_accounts else None
+        ),
+        ready_seconds=forwarder.ready_seconds,
+        cpu_seconds=cpu_seconds
+    )
+
+
+def _sum_calls(clients: List[FakeTelegramClient]) -> Dict[str, int]:
+    """
+    Add up the API calls of several fake clients.
+    
+    Args:
+        clients: The clients
+    
+    Returns:
+        Calls by method name across all clients
+    """
+    calls: Dict[str, int] = {}
+    for account_client in clients:
+        for method, count in account_client.calls.items():
+            calls[method] = calls.get(method, 0) + count
+    return calls
+
+
+def _stage_totals_since(before: Dict[Tuple[str, ...], Tuple[int, float]]) -> Dict[str, Tuple[int, float]]:
+    """
+    Get the stage latency observations made since an earlier snapshot.
+    
+    Args:
+        before: Earlier result of STAGE_LATENCY.totals()
+    
+    Returns:
+        Dictionary of stage name to (count, total seconds)
+    """
+    stages = {}
+    for key, (count, total) in STAGE_LATENCY.totals().items():
+        previous_count, previous_total = before.get(key, (0, 0.0))
+        if count > previous_count:
+            stages[key[0]] = (count - previous_count, total - previous_total)
+    return stages
+
+
+def scratch_directory() -> tempfile.TemporaryDirectory:
+    """Return a temporary directory for the files written during a run."""
+    return tempfile.TemporaryDirectory(prefix='forwarder-benchmark-')
\ No newline at end of file
@@ -0,0 +1,258 @@
+import json
+import random
+from typing import Dict, List, Optional, Tuple
+from telethon.tl.types import Document, MessageMediaDocument
+
+from benchmark.fake_client import FakeMessage
+
+
+# A stream is a list of (seconds since the start, message) pairs in arrival order
+Stream = List[Tuple[float, FakeMessage]]
+
+SOURCE_CHAT_ID = -1001000000001
+DESTINATION_CHAT_ID = -1001000000002
+TRACKED_USERS = [1001, 1002, 1003, 1004]
+UNTRACKED_USERS = [2001, 2002]
+
+
+def make_document(document_id: int, size: int = 256 * 1024) -> MessageMediaDocument:
+    """
+    Create document media as Telethon would deliver it.
+    
+    Args:
+        document_id: The ID of the document
+        size: Size of the document in bytes
+    
+    Returns:
+        The document media
+    """
+    document = Document(
+        id=document_id,
+        access_hash=document_id * 31,
+        file_reference=b'',
+        date=None,
+        mime_type='application/octet-stream',
+        size=size,
+        dc_id=2,
+        attributes=[]
+    )
+    return MessageMediaDocument(document=document)
+
+
+def _random_text(length: int) -> str:
+    """Return filler text of roughly the given length."""
+    words = ['deploy', 'latency', 'queue', 'message', 'forward', 'update', 'release', 'alert', 'check']
+    text = ''
+    while len(text) < length:
+        text += random.choice(words) + ' '
+    return text[:length].strip() or 'ok'
+
+
+def _sender(tracked_ratio: float) -> int:
+    """Pick a tracked sender with the given probability, otherwise an untracked one."""
+    return random.choice(TRACKED_USERS) if random.random() < tracked_ratio else random.choice(UNTRACKED_USERS)
+
+
+def plain_stream(count: int, rate: float, tracked_ratio: float = 0.8) -> Stream:
+    """
+    Create a stream of plain text messages at a steady rate.
+    
+    Args:
+        count: Number of messages
+        rate: Messages per second
+        tracked_ratio: Share of messages sent by tracked users
+    
+    Returns:
+        The stream
+    """
+    return [
+        (index / rate, FakeMessage(index + 1, SOURCE_CHAT_ID, _sender(tracked_ratio), _random_text(random.randint(5, 300))))
+        for index in range(count)
+    ]
+
+
+def reply_heavy_stream(count: int, rate: float, reply_ratio: float = 0.6, tracked_ratio: float = 0.8) -> Stream:
+    """
+    Create a stream where most messages reply to a recent earlier message.
+    
+    Args:
+        count: Number of messages
+        rate: Messages per second
+        reply_ratio: Share of messages that are replies
+        tracked_ratio: Share of messages sent by tracked users
+    
+    Returns:
+        The stream
+    """
+    stream: Stream = []
+    for index in range(count):
+        message_id = index + 1
+        reply_to = None
+        if message_id > 1 and random.random() < reply_ratio:
+            reply_to = random.randint(max(1, message_id - 50), message_id - 1)
+        stream.append((index / rate, FakeMessage(message_id, SOURCE_CHAT_ID, _sender(tracked_ratio),
+                                                 _random_text(random.randint(5, 200)), reply_to_msg_id=reply_to)))
+    return stream
+
+
+def media_heavy_stream(count: int, rate: float, media_ratio: float = 0.5, repost_ratio: float = 0.3,
+                       tracked_ratio: float = 0.8) -> Stream:
+    """
+    Create a stream where many messages carry documents, some of them reposted.
+    
+    Args:
+        count: Number of messages
+        rate: Messages per second
+        media_ratio: Share of messages with media
+        repost_ratio: Share of media messages reusing a document posted earlier
+        tracked_ratio: Share of messages sent by tracked users
+    
+    Returns:
+        The stream
+    """
+    stream: Stream = []
+    documents: List[int] = []
+    for index in range(count):
+        media = None
+        if random.random() < media_ratio:
+            if documents and random.random() < repost_ratio:
+                document_id = random.choice(documents)
+            else:
+                document_id = 500000 + index
+                documents.append(document_id)
+            media = make_document(document_id, random.randint(50, 5000) * 1024)
+        stream.append((index / rate, FakeMessage(index + 1, SOURCE_CHAT_ID, _sender(tracked_ratio),
+                                                 _random_text(random.randint(0, 100)), media=media)))
+    return stream
+
+
+def repost_stream(count: int, rate: float, repost_ratio: float = 0.3, tracked_ratio: float = 0.8) -> Stream:
+    """
+    Create a stream where senders repeat messages they posted earlier, as when crossposting.
+    
+    Args:
+        count: Number of messages
+        rate: Messages per second
+        repost_ratio: Share of messages repeating an earlier message of the same sender
+        tracked_ratio: Share of messages sent by tracked users
+    
+    Returns:
+        The stream
+    """
+    stream: Stream = []
+    texts: Dict[int, List[str]] = {}
+    for index in range(count):
+        sender_id = _sender(tracked_ratio)
+        posted = texts.setdefault(sender_id, [])
+        if posted and random.random() < repost_ratio:
+            text = random.choice(posted)
+        else:
+            text = _random_text(random.randint(5, 300))
+            posted.append(text)
+        stream.append((index / rate, FakeMessage(index + 1, SOURCE_CHAT_ID, sender_id, text)))
+    return stream
+
+
+def bursty_stream(count: int, rate: float, burst_size: int = 50, burst_factor: float = 20,
+                  tracked_ratio: float = 0.8) -> Stream:
+    """
+    Create a stream of bursts sent much faster than the average rate, separated by idle gaps.
+    
+    Args:
+        count: Number of messages
+        rate: Average messages per second
+        burst_size: Number of messages per burst
+        burst_factor: How many times faster than the average rate a burst arrives
+        tracked_ratio: Share of messages sent by tracked users
+    
+    Returns:
+        The stream
+    """
+    stream: Stream = []
+    burst_duration = burst_size / (rate * burst_factor)
+    period = burst_size / rate
+    for index in range(count):
+        burst, position = divmod(index, burst_size)
+        offset = burst * period + position * burst_duration / burst_size
+        stream.append((offset, FakeMessage(index + 1, SOURCE_CHAT_ID, _sender(tracked_ratio),
+                                           _random_text(random.randint(5, 80)))))
+    return stream
+
+
+def album_stream(count: int, rate: float, album_ratio: float = 0.3, tracked_ratio: float = 0.8) -> Stream:
+    """
+    Create a stream where some messages are albums of 2 to 10 documents arriving back to back.
+    
+    Args:
+        count: Number of messages
+        rate: Messages per second
+        album_ratio: Share of albums among the posts
+        tracked_ratio: Share of posts by tracked users
+    
+    Returns:
+        The stream
+    """
+    stream: Stream = []
+    offset = 0.0
+    while len(stream) < count:
+        sender_id = _sender(tracked_ratio)
+        message_id = len(stream) + 1
+        if random.random() < album_ratio:
+            size = min(random.randint(2, 10), count - len(stream))
+            grouped_id = 700000 + message_id
+            for index in range(size):
+                # Parts of an album arrive a few milliseconds apart, the caption on the first
+                stream.append((offset + index * 0.002, FakeMessage(
+                    message_id + index, SOURCE_CHAT_ID, sender_id,
+                    _random_text(random.randint(5, 100)) if index == 0 else '',
+                    media=make_document(600000 + message_id + index), grouped_id=grouped_id
+                )))
+        else:
+            stream.append((offset, FakeMessage(message_id, SOURCE_CHAT_ID, sender_id, _random_text(random.randint(5, 200)))))
+        offset = len(stream) / rate
+    return stream
+
+
+def load_recording(path: str, chat_id: Optional[int] = None) -> Stream:
+    """
+    Load a stream recorded by EventRecorder.
+    
+    Text is replaced with filler of the recorded length, and media with fake documents
+    that keep the recorded media IDs, so reposts are still recognised.
+    
+    Args:
+        path: Path of the recording
+        chat_id: Only load messages from this chat, or None for all chats
+    
+    Returns:
+        The stream
+    """
+    stream: Stream = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            event = json.loads(line)
+            if chat_id is not None and event['chat_id'] != chat_id:
+                continue
+            
+            media = None
+            if event.get('media'):
+                media_id = event['media'].get('id') or (900000000 + event['id'])
+                media = make_document(media_id, event['media'].get('size') or 1024)
+            
+            message = FakeMessage(event['id'], event['chat_id'], event['sender_id'],
+                                  _random_text(event.get('text_length', 0)) if event.get('text_length') else '',
+                                  reply_to_msg_id=event.get('reply_to'), media=media,
+                                  grouped_id=event.get('grouped_id'))
+            stream.append((event['t'], message))
+    
+    return stream
+
+
+STREAMS = {
+    'plain': plain_stream,
+    'reply-heavy': reply_heavy_stream,
+    'media-heavy': media_heavy_stream,
+    'bursty': bursty_stream,
+    'reposts': repost_stream,
+    'albums': album_stream,
+}
\ No newline at end of file
@@ -0,0 +1,373 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from telethon import TelegramClient
+from loguru import logger
+
+from metrics import ACCOUNT_BUSY_SECONDS, ACCOUNT_FLOOD_WAITS, ACCOUNT_REQUESTS
+
+
+# Ways of spreading sends over the accounts of a pool
+STRATEGY_HASH = 'hash'
+STRATEGY_LEAST_LOADED = 'least_loaded'
+STRATEGIES = (STRATEGY_HASH, STRATEGY_LEAST_LOADED)
+
+# Name of the listening account in the pool
+PRIMARY_ACCOUNT = 'primary'
+
+
+class SenderAccount:
+    """One Telegram account of a send pool and its usage."""
+    
+    def __init__(self, name: str, client: TelegramClient):
+        """
+        Initialize the SenderAccount.
+        
+        Args:
+            name: Name of the account, used in logs and metrics
+            client: The client logged in to the account
+        """
+        self.name = name
+        self.client = client
+        self.in_flight = 0
+        self.requests = 0
+        self.flood_waits = 0
+        self.busy_seconds = 0.0
+        # Chats the account was checked to be able to send to, and the ones it can't because
+        # it isn't a member or can't resolve them
+        self.available_chats: Set[int] = set()
+        self.unavailable_chats: Set[int] = set()
+        # End of the FloodWait per chat, in time.monotonic() seconds
+        self._paused_until: Dict[int, float] = {}
+    
+    def pause_remaining(self, chat_id: int) -> float:
+        """
+        Get the time left of a FloodWait for a chat.
+        
+        Args:
+            chat_id: The ID of the chat
+        
+        Returns:
+            Seconds until the account may send to the chat again, 0 if it may now
+        """
+        paused_until = self._paused_until.get(chat_id)
+        if paused_until is None:
+            return 0.0
+        remaining = paused_until - time.monotonic()
+        if remaining <= 0:
+            del self._paused_until[chat_id]
+            return 0.0
+        return remaining
+    
+    def pause(self, chat_id: int, seconds: float) -> None:
+        """
+        Record a FloodWait for a chat.
+        
+        Args:
+            chat_id: The ID of the chat
+            seconds: Seconds the account has to wait
+        """
+        self._paused_until[chat_id] = max(self._paused_until.get(chat_id, 0.0), time.monotonic() + seconds)
+
+
+class ClientPool:
+    """
+    Accounts that outbound requests are spread over.
+    
+    The listening account is the primary and always part of the pool. Requests that
+    depend on the primary's view of Telegram, such as media references or forwards
+    from source chats, are pinned to it. Other requests go to one of the sender
+    accounts, either the same one for every request to a chat (consistent hashing)
+    or the least busy one. An account in a FloodWait for a chat is passed over
+    while another one can send. Until the sender accounts are logged in, and for chats
+    a sender account wasn't checked for yet, the primary sends. Requests that only the
+    author of a message may make, such as edits, are sent by the account named for them.
+    """
+    
+    def __init__(self, primary: TelegramClient, senders: Sequence[Tuple[str, TelegramClient]] = (),
+                 strategy: str = STRATEGY_HASH, include_primary: bool = True):
+        """
+        Initialize the ClientPool.
+        
+        Args:
+            primary: The client of the listening account
+            senders: Names and clients of additional sending accounts
+            strategy: STRATEGY_HASH to keep each chat on one account, STRATEGY_LEAST_LOADED to use the least busy one
+            include_primary: Whether the primary also takes requests that aren't pinned to it
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown send pool strategy '{strategy}'")
+        
+        self._strategy = strategy
+        self._primary = SenderAccount(PRIMARY_ACCOUNT, primary)
+        self._senders = [SenderAccount(name, client) for name, client in senders]
+        self._accounts = [self._primary] + self._senders
+        self._accounts_by_name = {account.name: account for account in self._accounts}
+        # Without sender accounts the primary sends everything
+        self._candidates = self._accounts if include_primary or not self._senders else self._senders
+        self._started_at = time.monotonic()
+        self._senders_started = False
+        
+        # Preference order of the candidates per chat, stable while the pool doesn't change
+        self._rankings: Dict[int, List[SenderAccount]] = {}
+    
+    @property
+    def primary(self) -> SenderAccount:
+        """
+        Get the listening account.
+        
+        Returns:
+            The primary account
+        """
+        return self._primary
+    
+    @property
+    def accounts(self) -> List[SenderAccount]:
+        """
+        Get every account of the pool.
+        
+        Returns:
+            The primary followed by the sender accounts
+        """
+        return list(self._accounts)
+    
+    async def start(self, chat_ids: Iterable[int]) -> None:
+        """
+        Connect the sender accounts and check which destination chats each can send to.
+        
+        Accounts whose session isn't logged in are left out of the pool, since logging
+        in asks for a code on the terminal and would block the forwarder.
+        
+        Args:
+            chat_ids: IDs of the chats requests are sent to
+        """
+        for account in list(self._senders):
+            await account.client.connect()
+            if not await account.client.is_user_authorized():
+                logger.error(f"Sender account {account.name} isn't logged in, leaving it out of the send pool. "
+                             f"Log it in with: python main.py --login {account.name}")
+                await account.client.disconnect()
+                self._remove(account)
+        self._senders_started = True
+        self._rankings.clear()
+        await self.prepare(chat_ids)
+    
+    async def prepare(self, chat_ids: Iterable[int]) -> None:
+        """
+        Check which of the given chats each sender account can send to.
+        
+        Telethon resolves chats from the session's own entity cache, so the dialogs of
+        an account are loaded once if a chat is missing from it. Chats an account was
+        found able to send to before, e.g. by the last run, aren't checked again.
+        
+        Args:
+            chat_ids: IDs of the chats requests are sent to
+        """
+        chat_ids = list(chat_ids)
+        for account in self._senders:
+            dialogs_loaded = False
+            for chat_id in chat_ids:
+                if chat_id in account.available_chats:
+                    continue
+                try:
+                    await account.client.get_input_entity(chat_id)
+                    self._mark_available(account, chat_id)
+                    continue
+                except ValueError:
+                    pass
+                
+                try:
+                    if not dialogs_loaded:
+                        await account.client.get_dialogs()
+                        dialogs_loaded = True
+                    await account.client.get_input_entity(chat_id)
+                    self._mark_available(account, chat_id)
+                except Exception as e:
+                    account.unavailable_chats.add(chat_id)
+                    logger.warning(f"Sender account {account.name} can't send to chat {chat_id}: {e}")
+            logger.info(f"Sender account {account.name} ready for "
+                        f"{len(account.available_chats.intersection(chat_ids))} of {len(chat_ids)} chats")
+        self._rankings.clear()
+    
+    def export_state(self) -> Dict[str, Dict[str, List[int]]]:
+        """
+        Get the chats each sender account was checked for, to skip the checks after a restart.
+        
+        Returns:
+            Dictionary of account name to its available and unavailable chat IDs
+        """
+        return {
+            account.name: {
+                'available': sorted(account.available_chats),
+                'unavailable': sorted(account.unavailable_chats),
+            }
+            for account in self._senders
+        }
+    
+    def import_state(self, state: Optional[Dict[str, Any]]) -> None:
+        """
+        Restore the chats checked by the last run.
+        
+        Chats an account couldn't send to are checked again by the next prepare,
+        in case it has joined them since.
+        
+        Args:
+            state: Result of export_state saved by the last run, None if there is none
+        """
+        for account in self._senders:
+            account_state = (state or {}).get(account.name)
+            if account_state is not None:
+                account.available_chats.update(account_state.get('available', []))
+        self._rankings.clear()
+    
+    async def stop(self) -> None:
+        """Disconnect the sender accounts. The primary is disconnected by its owner."""
+        for account in self._senders:
+            await account.client.disconnect()
+        logger.info(f"Send pool stats: {self.stats}")
+    
+    def account_of(self, client: Any) -> SenderAccount:
+        """
+        Find the account of a client, e.g. the one a sent message came back from.
+        
+        Args:
+            client: The client of the account
+        
+        Returns:
+            The account using the client, the primary if no account does
+        """
+        return next((account for account in self._accounts if account.client is client), self._primary)
+    
+    def select(self, chat_id: int, pinned: bool = False, sender: Optional[str] = None) -> SenderAccount:
+        """
+        Choose the account a request to a chat is sent with.
+        
+        Args:
+            chat_id: The ID of the chat the request is sent to
+            pinned: Whether the request must be sent by the primary
+            sender: Name of the account the request must be sent by, e.g. the author of a message it edits
+        
+        Returns:
+            The account to use
+        """
+        if sender is not None:
+            account = self._accounts_by_name.get(sender)
+            if account is not None:
+                return account
+            # The account was removed from the pool, the primary may still have the rights to act
+            logger.warning(f"Sender account {sender} isn't in the pool anymore, using the primary")
+            return self._primary
+        if pinned or not self._senders_started:
+            return self._primary
+        
+        ranking = self._rankings.get(chat_id)
+        if ranking is None:
+            ranking = self._rankings[chat_id] = self._rank(chat_id)
+        if not ranking:
+            return self._primary
+        
+        available = [account for account in ranking if account.pause_remaining(chat_id) == 0]
+        if not available:
+            # Everyone is waiting, so take the account that is free again first
+            return min(ranking, key=lambda account: account.pause_remaining(chat_id))
+        if self._strategy == STRATEGY_HASH:
+            return available[0]
+        return min(available, key=lambda account: (account.in_flight, account.requests))
+    
+    def report_flood_wait(self, account: SenderAccount, chat_id: int, seconds: float) -> None:
+        """
+        Record a FloodWait so the next requests to the chat prefer other accounts.
+        
+        Args:
+            account: The account that received the FloodWait
+            chat_id: The ID of the chat the request was sent to
+            seconds: Seconds the account has to wait
+        """
+        account.pause(chat_id, seconds)
+        account.flood_waits += 1
+        ACCOUNT_FLOOD_WAITS.inc(account=account.name)
+    
+    @contextmanager
+    def track(self, account: SenderAccount) -> Iterator[None]:
+        """
+        Count a request of an account and the time it took.
+        
+        Args:
+            account: The account sending the request
+        """
+        account.in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            account.in_flight -= 1
+            account.requests += 1
+            account.busy_seconds += elapsed
+            ACCOUNT_REQUESTS.inc(account=account.name)
+            ACCOUNT_BUSY_SECONDS.inc(elapsed, account=account.name)
+    
+    @property
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the usage of every account.
+        
+        Returns:
+            Dictionary of account name to requests, FloodWaits and the share of time spent in requests
+        """
+        elapsed = max(time.monotonic() - self._started_at, 1e-9)
+        return {
+            account.name: {
+                'requests': account.requests,
+                'flood_waits': account.flood_waits,
+                'utilization': round(account.busy_seconds / elapsed, 3),
+            }
+            for account in self._accounts
+        }
+    
+    def _remove(self, account: SenderAccount) -> None:
+        """
+        Take a sender account out of the pool.
+        
+        Args:
+            account: The account
+        """
+        # The candidates are the list of all accounts or of the senders, so they lose it too
+        self._senders.remove(account)
+        self._accounts.remove(account)
+        del self._accounts_by_name[account.name]
+        self._rankings.clear()
+    
+    @staticmethod
+    def _mark_available(account: SenderAccount, chat_id: int) -> None:
+        """
+        Record that an account can send to a chat.
+        
+        Args:
+            account: The account
+            chat_id: The ID of the chat
+        """
+        account.available_chats.add(chat_id)
+        account.unavailable_chats.discard(chat_id)
+    
+    def _rank(self, chat_id: int) -> List[SenderAccount]:
+        """
+        Order the candidate accounts able to send to a chat by rendezvous hashing.
+        
+        Adding or removing an account only moves the chats that rank it first.
+        
+        Args:
+            chat_id: The ID of the chat
+        
+        Returns:
+            The accounts in order of preference
+        """
+        def score(account: SenderAccount) -> bytes:
+            return hashlib.blake2b(f"{account.name}:{chat_id}".encode(), digest_size=8).digest()
+        
+        candidates = [
+            account for account in self._candidates
+            if account is self._primary or chat_id in account.available_chats
+        ]
+        return sorted(candidates, key=score, reverse=True)
\ No newline at end of file
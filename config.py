@@ -1,9 +1,16 @@
 import os
-from dotenv import load_dotenv
-from typing import List
+import json
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+from typing import Any, Dict, List, Optional, Set
+
+from filter_engine import MessageFilter
+from message_formatter import MessageFormatter, DEFAULT_TEMPLATE
 
 # Load environment variables from .env file
+_environment_before_dotenv = set(os.environ)
 load_dotenv()
+# Variables set from the .env file rather than the process environment, so a reload can unset the removed ones
+_dotenv_keys: Set[str] = set(dotenv_values(find_dotenv())) - _environment_before_dotenv
 
 class TelegramConfig:
     """Configuration for Telegram API authentication."""
@@ -24,23 +31,144 @@ class TelegramConfig:
             raise ValueError("API_ID must be an integer")
 
 
+class RouteConfig:
+    """Configuration for a single forwarding route."""
+    
+    def __init__(self, name: str, source_chat_ids: List[int], destination_chat_ids: List[int],
+                 tracked_users: List[int], message_filter: Optional[MessageFilter] = None,
+                 coalesce_window: Optional[float] = None, coalesce_max_messages: Optional[int] = None,
+                 native_forward: Optional[bool] = None):
+        """
+        Initialize the RouteConfig.
+        
+        Args:
+            name: Name of the route, used in logs
+            source_chat_ids: IDs of the chats to monitor
+            destination_chat_ids: IDs of the chats to forward messages to
+            tracked_users: IDs of the users whose messages are forwarded
+            message_filter: Content rules messages must pass, or None to forward everything from tracked users
+            coalesce_window: Seconds to merge bursts of text messages of a sender, None for COALESCE_WINDOW
+            coalesce_max_messages: Maximum number of merged messages, None for COALESCE_MAX_MESSAGES
+            native_forward: Whether to forward messages as they are instead of formatted copies, None for NATIVE_FORWARD
+        """
+        self.name = name
+        self.source_chat_ids = source_chat_ids
+        self.destination_chat_ids = destination_chat_ids
+        self.tracked_users = tracked_users
+        self.message_filter = message_filter
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_messages = coalesce_max_messages
+        self.native_forward = native_forward
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], default_tracked_users: List[int]) -> 'RouteConfig':
+        """
+        Create a route from an entry of the routes file.
+        
+        Args:
+            data: The route entry
+            default_tracked_users: Users to track if the entry doesn't list any
+            
+        Returns:
+            The parsed route
+        """
+        name = str(data.get('name', 'unnamed'))
+        try:
+            source_chat_ids = [int(chat_id) for chat_id in data.get('sources', [])]
+            destination_chat_ids = [int(chat_id) for chat_id in data.get('destinations', [])]
+            tracked_users = [int(user_id) for user_id in data.get('tracked_users', default_tracked_users)]
+        except (TypeError, ValueError):
+            raise ValueError(f"Route '{name}': chat IDs and user IDs must be integers")
+        
+        if not source_chat_ids or not destination_chat_ids:
+            raise ValueError(f"Route '{name}' must have at least one source and one destination")
+        
+        # Compile the content rules once, so matching a message doesn't depend on how many there are
+        message_filter = None
+        if data.get('filters'):
+            try:
+                message_filter = MessageFilter.from_dict(data['filters'])
+            except ValueError as e:
+                raise ValueError(f"Route '{name}': {e}")
+        
+        coalesce = data.get('coalesce') or {}
+        try:
+            coalesce_window = float(coalesce['window']) if 'window' in coalesce else None
+            coalesce_max_messages = int(coalesce['max_messages']) if 'max_messages' in coalesce else None
+        except (TypeError, ValueError):
+            raise ValueError(f"Route '{name}': coalesce window and max_messages must be numbers")
+        
+        native_forward = data.get('native_forward')
+        if native_forward is not None and not isinstance(native_forward, bool):
+            raise ValueError(f"Route '{name}': native_forward must be true or false")
+        
+        return cls(name, source_chat_ids, destination_chat_ids, tracked_users, message_filter,
+                   coalesce_window, coalesce_max_messages, native_forward)
+
+
+def load_routes(path: str, default_tracked_users: List[int]) -> List[RouteConfig]:
+    """
+    Load forwarding routes from a JSON file.
+    
+    Args:
+        path: Path to the routes file
+        default_tracked_users: Users to track for routes that don't list any
+        
+    Returns:
+        List of parsed routes
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Could not read ROUTES_FILE {path}: {e}")
+    
+    routes = [RouteConfig.from_dict(entry, default_tracked_users) for entry in data.get('routes', [])]
+    if not routes:
+        raise ValueError(f"ROUTES_FILE {path} must define at least one route")
+    
+    return routes
+
+
+def reload_forwarder_config() -> 'ForwarderConfig':
+    """
+    Read the .env file again and parse the forwarder configuration from it.
+    
+    Values from the .env file replace the ones loaded before. Variables that were set
+    from the file and have been removed from it are unset, so their defaults apply again.
+    
+    Returns:
+        The new configuration
+    """
+    values = {key: value for key, value in dotenv_values(find_dotenv()).items() if value is not None}
+    for key in _dotenv_keys - set(values):
+        os.environ.pop(key, None)
+    os.environ.update(values)
+    _dotenv_keys.clear()
+    _dotenv_keys.update(values)
+    return ForwarderConfig()
+
+
 class ForwarderConfig:
     """Configuration for message forwarding functionality."""
     
     def __init__(self):
         self.source_chat_id = os.getenv('SOURCE_CHAT_ID')
         self.destination_chat_id = os.getenv('DESTINATION_CHAT_ID')
+        self.routes_file = os.getenv('ROUTES_FILE')
         tracked_users = os.getenv('TRACKED_USERS', '')
         enable_message_links = os.getenv('ENABLE_MESSAGE_LINKS', 'true').lower()
         
         # Validate required fields
-        if not all([self.source_chat_id, self.destination_chat_id]):
-            raise ValueError("SOURCE_CHAT_ID and DESTINATION_CHAT_ID must be provided")
+        if not self.routes_file and not all([self.source_chat_id, self.destination_chat_id]):
+            raise ValueError("SOURCE_CHAT_ID and DESTINATION_CHAT_ID must be provided unless ROUTES_FILE is set")
         
         # Convert chat IDs to integer
         try:
-            self.source_chat_id = int(self.source_chat_id)
-            self.destination_chat_id = int(self.destination_chat_id)
+            if self.source_chat_id:
+                self.source_chat_id = int(self.source_chat_id)
+            if self.destination_chat_id:
+                self.destination_chat_id = int(self.destination_chat_id)
         except ValueError:
             raise ValueError("Chat IDs must be integers")
         
@@ -52,5 +180,166 @@ class ForwarderConfig:
             except ValueError:
                 raise ValueError("TRACKED_USERS must be a comma-separated list of integers")
         
+        # Build the routes, either from the routes file or from the single source/destination pair
+        if self.routes_file:
+            self.routes = load_routes(self.routes_file, self.tracked_users)
+        else:
+            self.routes = [RouteConfig('default', [self.source_chat_id], [self.destination_chat_id], self.tracked_users)]
+        
+        # Users tracked by any route
+        self.tracked_users = sorted({user_id for route in self.routes for user_id in route.tracked_users})
+        
         # Parse feature toggles
-        self.enable_message_links = enable_message_links in ('true', 'yes', '1', 'on') 
\ No newline at end of file
+        self.enable_message_links = enable_message_links in ('true', 'yes', '1', 'on')
+        
+        # Compile the output format once for all messages
+        self.message_template = os.getenv('MESSAGE_TEMPLATE') or DEFAULT_TEMPLATE
+        self.message_link_text = os.getenv('MESSAGE_LINK_TEXT') or 'to_chat'
+        self.message_formatter = MessageFormatter(self.message_template, self.message_link_text)
+        
+        # Parse storage settings
+        self.storage_backend = os.getenv('STORAGE_BACKEND', 'memory').lower()
+        self.storage_path = os.getenv('STORAGE_PATH', 'data/messages.db')
+        if self.storage_backend not in ('memory', 'sqlite'):
+            raise ValueError("STORAGE_BACKEND must be either 'memory' or 'sqlite'")
+        
+        try:
+            self.storage_flush_interval = float(os.getenv('STORAGE_FLUSH_INTERVAL', '0.5'))
+            self.storage_cache_size = int(os.getenv('STORAGE_CACHE_SIZE', '10000'))
+            self.storage_mapping_horizon = int(os.getenv('STORAGE_MAPPING_HORIZON', '20000'))
+        except ValueError:
+            raise ValueError("STORAGE_FLUSH_INTERVAL must be a number, "
+                             "STORAGE_CACHE_SIZE and STORAGE_MAPPING_HORIZON must be integers")
+        
+        # Parse entity cache settings
+        self.entity_cache_path = os.getenv('ENTITY_CACHE_PATH', 'data/entity_cache.json')
+        try:
+            self.entity_cache_ttl = float(os.getenv('ENTITY_CACHE_TTL', '3600'))
+            self.entity_cache_negative_ttl = float(os.getenv('ENTITY_CACHE_NEGATIVE_TTL', '300'))
+        except ValueError:
+            raise ValueError("ENTITY_CACHE_TTL and ENTITY_CACHE_NEGATIVE_TTL must be numbers")
+        
+        # State restored on startup, empty to always start cold
+        self.state_snapshot_path = os.getenv('STATE_SNAPSHOT_PATH', 'data/state_snapshot.json')
+        
+        # Parse processing pipeline settings
+        try:
+            self.pipeline_workers = int(os.getenv('PIPELINE_WORKERS', '4'))
+            self.pipeline_queue_size = int(os.getenv('PIPELINE_QUEUE_SIZE', '1000'))
+        except ValueError:
+            raise ValueError("PIPELINE_WORKERS and PIPELINE_QUEUE_SIZE must be integers")
+        
+        if self.pipeline_workers < 1:
+            raise ValueError("PIPELINE_WORKERS must be at least 1")
+        
+        # Parse send rate limits
+        try:
+            self.send_rate_per_chat = float(os.getenv('SEND_RATE_PER_CHAT', '20'))
+            self.send_burst_per_chat = int(os.getenv('SEND_BURST_PER_CHAT', '5'))
+            self.send_global_rate = float(os.getenv('SEND_GLOBAL_RATE', '30'))
+            self.send_max_retries = int(os.getenv('SEND_MAX_RETRIES', '5'))
+        except ValueError:
+            raise ValueError("SEND_RATE_PER_CHAT and SEND_GLOBAL_RATE must be numbers, "
+                             "SEND_BURST_PER_CHAT and SEND_MAX_RETRIES must be integers")
+        
+        # Parse reply resolution settings
+        try:
+            self.reply_cache_size = int(os.getenv('REPLY_CACHE_SIZE', '5000'))
+            self.reply_fetch_window = float(os.getenv('REPLY_FETCH_WINDOW', '0.05'))
+        except ValueError:
+            raise ValueError("REPLY_CACHE_SIZE must be an integer and REPLY_FETCH_WINDOW must be a number")
+        
+        # Parse media cache settings
+        self.media_temp_dir = os.getenv('MEDIA_TEMP_DIR') or None
+        try:
+            self.media_cache_max_mb = int(os.getenv('MEDIA_CACHE_MAX_MB', '512'))
+            self.media_chunk_size_kb = int(os.getenv('MEDIA_CHUNK_SIZE_KB', '512'))
+        except ValueError:
+            raise ValueError("MEDIA_CACHE_MAX_MB and MEDIA_CHUNK_SIZE_KB must be integers")
+        
+        # Parse backfill settings
+        self.backfill_enabled = os.getenv('BACKFILL_ENABLED', 'true').lower() in ('true', 'yes', '1', 'on')
+        self.backfill_cursor_path = os.getenv('BACKFILL_CURSOR_PATH', 'data/backfill_cursors.json')
+        
+        # Parse event recording settings
+        self.record_events_path = os.getenv('RECORD_EVENTS_PATH') or None
+        
+        # Parse metrics settings
+        try:
+            self.metrics_port = int(os.getenv('METRICS_PORT') or '0')
+        except ValueError:
+            raise ValueError("METRICS_PORT must be an integer")
+        self.metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        
+        # Parse outbox settings
+        self.outbox_enabled = os.getenv('OUTBOX_ENABLED', 'true').lower() in ('true', 'yes', '1', 'on')
+        self.outbox_path = os.getenv('OUTBOX_PATH', 'data/outbox.jsonl')
+        try:
+            self.outbox_sync_interval = float(os.getenv('OUTBOX_SYNC_INTERVAL', '0.1'))
+        except ValueError:
+            raise ValueError("OUTBOX_SYNC_INTERVAL must be a number")
+        
+        # Parse coalescing defaults for routes that don't set their own
+        try:
+            self.coalesce_window = float(os.getenv('COALESCE_WINDOW', '0'))
+            self.coalesce_max_messages = int(os.getenv('COALESCE_MAX_MESSAGES', '10'))
+        except ValueError:
+            raise ValueError("COALESCE_WINDOW must be a number and COALESCE_MAX_MESSAGES an integer")
+        
+        try:
+            self.album_window = float(os.getenv('ALBUM_WINDOW', '0.5'))
+        except ValueError:
+            raise ValueError("ALBUM_WINDOW must be a number")
+        
+        # Parse native forwarding settings
+        self.native_forward = os.getenv('NATIVE_FORWARD', 'false').lower() in ('true', 'yes', '1', 'on')
+        try:
+            self.native_forward_window = float(os.getenv('NATIVE_FORWARD_WINDOW', '0.5'))
+        except ValueError:
+            raise ValueError("NATIVE_FORWARD_WINDOW must be a number")
+        
+        # Parse send pool settings
+        self.sender_sessions = [name.strip() for name in os.getenv('SENDER_SESSIONS', '').split(',') if name.strip()]
+        self.send_pool_strategy = os.getenv('SEND_POOL_STRATEGY', 'hash').lower()
+        if self.send_pool_strategy not in ('hash', 'least_loaded'):
+            raise ValueError("SEND_POOL_STRATEGY must be either 'hash' or 'least_loaded'")
+        self.send_pool_include_listener = (
+            os.getenv('SEND_POOL_INCLUDE_LISTENER', 'true').lower() in ('true', 'yes', '1', 'on')
+        )
+        
+        # Parse edit and deletion propagation settings
+        self.propagate_edits = os.getenv('PROPAGATE_EDITS', 'true').lower() in ('true', 'yes', '1', 'on')
+        self.propagate_deletes = os.getenv('PROPAGATE_DELETES', 'true').lower() in ('true', 'yes', '1', 'on')
+        try:
+            self.edit_debounce = float(os.getenv('EDIT_DEBOUNCE', '2'))
+        except ValueError:
+            raise ValueError("EDIT_DEBOUNCE must be a number")
+        
+        # Parse content deduplication settings
+        self.content_dedup = os.getenv('CONTENT_DEDUP', 'false').lower() in ('true', 'yes', '1', 'on')
+        try:
+            self.content_dedup_window = float(os.getenv('CONTENT_DEDUP_WINDOW', '3600'))
+            self.content_dedup_max_entries = int(os.getenv('CONTENT_DEDUP_MAX_ENTRIES', '100000'))
+        except ValueError:
+            raise ValueError("CONTENT_DEDUP_WINDOW must be a number and CONTENT_DEDUP_MAX_ENTRIES an integer")
+        
+        # Parse runtime control settings
+        try:
+            self.config_watch_interval = float(os.getenv('CONFIG_WATCH_INTERVAL', '0'))
+            self.control_chat_id = int(os.getenv('CONTROL_CHAT_ID') or '0') or None
+            self.admin_user_ids = [
+                int(user_id.strip()) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()
+            ]
+        except ValueError:
+            raise ValueError("CONFIG_WATCH_INTERVAL must be a number, CONTROL_CHAT_ID an integer "
+                             "and ADMIN_USER_IDS a comma-separated list of integers")
+    
+    @property
+    def source_paths(self) -> List[str]:
+        """
+        Get the files the configuration is read from.
+        
+        Returns:
+            Paths of the .env file and the routes file, where they are used
+        """
+        return [path for path in (find_dotenv(), self.routes_file) if path]
\ No newline at end of file
@@ -0,0 +1,316 @@
+import asyncio
+import hashlib
+import math
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from telethon.tl.types import Message, MessageMediaDocument, MessageMediaPhoto
+from loguru import logger
+
+
+class BloomFilter:
+    """
+    Fixed-size set of fingerprints that can answer "definitely not added" without storing them.
+    
+    Membership tests may return false positives at roughly the configured rate, never false negatives.
+    """
+    
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Initialize the BloomFilter.
+        
+        Args:
+            capacity: Number of fingerprints the filter is sized for
+            error_rate: False positive rate at full capacity
+        """
+        capacity = max(capacity, 1)
+        self._size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) >> 3)
+        self.count = 0
+    
+    def add(self, fingerprint: bytes) -> None:
+        """
+        Add a fingerprint.
+        
+        Args:
+            fingerprint: A digest of at least 16 bytes
+        """
+        for position in self._positions(fingerprint):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, fingerprint: bytes) -> bool:
+        """
+        Check if a fingerprint may have been added.
+        
+        Args:
+            fingerprint: A digest of at least 16 bytes
+        
+        Returns:
+            False if the fingerprint was never added, True if it probably was
+        """
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint))
+    
+    def _positions(self, fingerprint: bytes) -> Iterator[int]:
+        """
+        Derive the bit positions of a fingerprint by double hashing its two halves.
+        
+        Args:
+            fingerprint: A digest of at least 16 bytes
+        
+        Returns:
+            Iterator over the bit positions
+        """
+        first = int.from_bytes(fingerprint[:8], 'little')
+        second = int.from_bytes(fingerprint[8:16], 'little') | 1
+        return ((first + index * second) % self._size for index in range(self._hashes))
+
+
+class ContentClaim:
+    """The first message with some content in a destination, which later copies of the content map to."""
+    
+    __slots__ = ('source_chat_id', 'source_message_id', 'expires_at', '_settled')
+    
+    def __init__(self, source_chat_id: int, source_message_id: int, expires_at: float):
+        """
+        Initialize the ContentClaim.
+        
+        Args:
+            source_chat_id: The ID of the chat the first message was sent in
+            source_message_id: The ID of the first message
+            expires_at: time.monotonic() after which the content counts as new again
+        """
+        self.source_chat_id = source_chat_id
+        self.source_message_id = source_message_id
+        self.expires_at = expires_at
+        self._settled = asyncio.Event()
+    
+    @property
+    def settled(self) -> bool:
+        """
+        Check if forwarding the first message has finished.
+        
+        Returns:
+            True once the first message was sent or failed, False while it is buffered or being sent
+        """
+        return self._settled.is_set()
+    
+    def settle(self) -> None:
+        """Mark forwarding the first message as finished, successful or not."""
+        self._settled.set()
+    
+    async def wait(self) -> None:
+        """Wait until forwarding the first message has finished."""
+        await self._settled.wait()
+
+
+class ContentIndex:
+    """
+    Recently forwarded content per destination, to catch crossposts and reposts of the same message.
+    
+    Content is identified by a digest of the sender, the normalized text and the ID of the
+    photo or document. Digests are kept in an exact index for a time window and up to a
+    maximum number of entries. Two Bloom filters in front of it, rotated every window or
+    when full, answer most lookups of new content without touching the index.
+    """
+    
+    def __init__(self, window: float = 3600.0, max_entries: int = 100000, error_rate: float = 0.01):
+        """
+        Initialize the ContentIndex.
+        
+        Args:
+            window: Seconds a message's content is remembered
+            max_entries: Maximum number of remembered contents, the oldest are dropped first
+            error_rate: False positive rate of each Bloom filter at full capacity
+        """
+        self._window = window
+        self._max_entries = max_entries
+        self._error_rate = error_rate
+        
+        # Claims in the order they were made, which is also the order they expire in
+        self._claims: "OrderedDict[Tuple[int, bytes], ContentClaim]" = OrderedDict()
+        
+        # Everything claimed since the last rotation is in the current filter and everything
+        # claimed in the rotation before in the previous one, which together cover the index
+        self._current = BloomFilter(max_entries, error_rate)
+        self._previous = BloomFilter(1, error_rate)
+        self._rotated_at = time.monotonic()
+        
+        self._checked = 0
+        self._filtered = 0
+        self._false_positives = 0
+        self._duplicates = 0
+    
+    @staticmethod
+    def fingerprint(message: Message) -> Optional[bytes]:
+        """
+        Compute the content digest of a message.
+        
+        Replies aren't fingerprinted, because the same text answering another message is new content.
+        
+        Args:
+            message: The message to fingerprint
+        
+        Returns:
+            A 16-byte digest, None if the message has no text or media to compare
+        """
+        if message.reply_to is not None:
+            return None
+        
+        # Differences in case, width and spacing don't make a repost new content
+        text = ' '.join(unicodedata.normalize('NFKC', message.message or '').casefold().split())
+        media = message.media
+        if isinstance(media, MessageMediaPhoto) and media.photo is not None:
+            media_id = f"photo:{media.photo.id}"
+        elif isinstance(media, MessageMediaDocument) and media.document is not None:
+            media_id = f"document:{media.document.id}"
+        elif media is not None:
+            # Polls, locations and the like have no stable ID to compare
+            return None
+        else:
+            media_id = ''
+        if not text and not media_id:
+            return None
+        
+        return hashlib.blake2b(f"{message.sender_id}\x00{media_id}\x00{text}".encode(), digest_size=16).digest()
+    
+    def claim(self, destination_chat_id: int, fingerprint: bytes, source_chat_id: int,
+              source_message_id: int) -> Tuple[ContentClaim, bool]:
+        """
+        Look up content in a destination, claiming it for the given message if it is new.
+        
+        Args:
+            destination_chat_id: The ID of the destination chat
+            fingerprint: The content digest of the message
+            source_chat_id: The ID of the chat the message was sent in
+            source_message_id: The ID of the message
+        
+        Returns:
+            The claim and True if the content is new, or the earlier message's claim and False if it is a duplicate
+        """
+        now = time.monotonic()
+        self._expire(now)
+        self._checked += 1
+        
+        key = (destination_chat_id, fingerprint)
+        digest = self._filter_digest(key)
+        if digest in self._current or digest in self._previous:
+            existing = self._claims.get(key)
+            if existing is None:
+                self._false_positives += 1
+            elif (existing.source_chat_id, existing.source_message_id) == (source_chat_id, source_message_id):
+                # The same message seen again, e.g. replayed from the outbox
+                return existing, True
+            else:
+                self._duplicates += 1
+                return existing, False
+        else:
+            self._filtered += 1
+        
+        claim = ContentClaim(source_chat_id, source_message_id, now + self._window)
+        self._remember(key, claim, now)
+        return claim, True
+    
+    def export_state(self) -> List[list]:
+        """
+        Get the remembered contents whose first message was forwarded, to restore them after a restart.
+        
+        Returns:
+            [destination_chat_id, fingerprint, source_chat_id, source_message_id, wall-clock expiry] lists
+        """
+        offset = time.time() - time.monotonic()
+        return [
+            [destination_chat_id, fingerprint.hex(), claim.source_chat_id, claim.source_message_id,
+             claim.expires_at + offset]
+            for (destination_chat_id, fingerprint), claim in self._claims.items()
+            if claim.settled
+        ]
+    
+    def import_state(self, state: Optional[List[list]]) -> None:
+        """
+        Restore contents saved with export_state, skipping the ones that have expired.
+        
+        Args:
+            state: The saved contents, None if there are none
+        """
+        now = time.monotonic()
+        offset = time.time() - now
+        restored = 0
+        for destination_chat_id, fingerprint, source_chat_id, source_message_id, expires_at in state or []:
+            expires_at -= offset
+            if expires_at <= now:
+                continue
+            claim = ContentClaim(source_chat_id, source_message_id, expires_at)
+            claim.settle()
+            self._remember((destination_chat_id, bytes.fromhex(fingerprint)), claim, now)
+            restored += 1
+        if restored:
+            logger.info(f"Restored {restored} recently forwarded contents")
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the lookup counters.
+        
+        Returns:
+            Dictionary with lookups, those answered by the Bloom filters alone, their false positives,
+            duplicates found and remembered contents
+        """
+        return {
+            'checked': self._checked,
+            'filtered': self._filtered,
+            'false_positives': self._false_positives,
+            'duplicates': self._duplicates,
+            'size': len(self._claims),
+        }
+    
+    def _remember(self, key: Tuple[int, bytes], claim: ContentClaim, now: float) -> None:
+        """
+        Add a claim to the exact index and the current Bloom filter.
+        
+        Args:
+            key: The (destination_chat_id, fingerprint) pair
+            claim: The claim of the content
+            now: The current time.monotonic()
+        """
+        self._claims[key] = claim
+        self._claims.move_to_end(key)
+        if len(self._claims) > self._max_entries:
+            self._claims.popitem(last=False)
+        
+        if self._current.count >= self._max_entries or now - self._rotated_at >= self._window:
+            self._previous, self._current = self._current, BloomFilter(self._max_entries, self._error_rate)
+            self._rotated_at = now
+        self._current.add(self._filter_digest(key))
+    
+    @staticmethod
+    def _filter_digest(key: Tuple[int, bytes]) -> bytes:
+        """
+        Get the Bloom filter entry of a content in a destination.
+        
+        The filters are shared by all destinations, so they hold the content digest salted with the destination.
+        
+        Args:
+            key: The (destination_chat_id, fingerprint) pair
+        
+        Returns:
+            A 16-byte digest
+        """
+        destination_chat_id, fingerprint = key
+        return hashlib.blake2b(fingerprint, digest_size=16,
+                               salt=destination_chat_id.to_bytes(16, 'little', signed=True)).digest()
+    
+    def _expire(self, now: float) -> None:
+        """
+        Drop the claims whose window has passed.
+        
+        Args:
+            now: The current time.monotonic()
+        """
+        while self._claims:
+            key, claim = next(iter(self._claims.items()))
+            if claim.expires_at > now:
+                break
+            del self._claims[key]
\ No newline at end of file
@@ -0,0 +1,118 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+from loguru import logger
+
+
+class Debouncer:
+    """
+    Collapses repeated submissions for the same key into one call with the latest value.
+    
+    The first submission for a key starts a timer. Submissions arriving before it
+    fires replace the value, and the callback runs once with the newest one. Because
+    the timer isn't restarted, a key updated continuously is still handled once per delay.
+    """
+    
+    def __init__(self, callback: Callable[[Any], Awaitable[None]], delay: float = 2.0):
+        """
+        Initialize the Debouncer.
+        
+        Args:
+            callback: Coroutine function called with the latest value of a key
+            delay: Seconds to wait after the first submission for a key before calling back
+        """
+        self._callback = callback
+        self._delay = delay
+        
+        # Latest value and timer per key waiting for its call
+        self._values: Dict[Hashable, Any] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        # Callbacks in progress, so flush can wait for them
+        self._running: Set[asyncio.Task] = set()
+        
+        self._submitted = 0
+        self._calls = 0
+    
+    def submit(self, key: Hashable, value: Any) -> None:
+        """
+        Schedule a call for a key, replacing a value still waiting for it.
+        
+        Args:
+            key: What the value belongs to, e.g. (chat_id, message_id)
+            value: The value to call back with
+        """
+        self._submitted += 1
+        self._values[key] = value
+        if key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self._delay, self._fire, key)
+    
+    def cancel(self, key: Hashable) -> None:
+        """
+        Drop a waiting value without calling back, e.g. because its message was deleted.
+        
+        Args:
+            key: The key to drop
+        """
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        self._values.pop(key, None)
+    
+    async def flush(self) -> None:
+        """Call back for every waiting key now and wait for all calls in progress."""
+        for key in list(self._timers):
+            self._timers.pop(key).cancel()
+            self._start(key)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the debouncing counters.
+        
+        Returns:
+            Dictionary with the number of submissions, the calls they were collapsed into and waiting keys
+        """
+        return {'submitted': self._submitted, 'calls': self._calls, 'waiting': len(self._timers)}
+    
+    def _fire(self, key: Hashable) -> None:
+        """
+        Handle the end of a key's delay.
+        
+        Args:
+            key: The key whose timer fired
+        """
+        self._timers.pop(key, None)
+        self._start(key)
+    
+    def _start(self, key: Hashable) -> Optional[asyncio.Task]:
+        """
+        Start the callback for a key with its latest value.
+        
+        Args:
+            key: The key to call back for
+        
+        Returns:
+            The task running the callback, None if the key has no value
+        """
+        if key not in self._values:
+            return None
+        value = self._values.pop(key)
+        self._calls += 1
+        task = asyncio.ensure_future(self._run(key, value))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        return task
+    
+    async def _run(self, key: Hashable, value: Any) -> None:
+        """
+        Call back, logging instead of raising errors.
+        
+        Args:
+            key: The key being called back for
+            value: The latest value of the key
+        """
+        try:
+            await self._callback(value)
+        except Exception as e:
+            logger.error(f"Error handling debounced update for {key}: {e}")
\ No newline at end of file
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from telethon import TelegramClient
+from loguru import logger
+
+from single_flight import SingleFlight
+
+
+class EntityCache:
+    """Cache of user entities with TTL, negative caching and coalesced lookups."""
+    
+    def __init__(self, client: TelegramClient, ttl: float = 3600, negative_ttl: float = 300,
+                 path: Optional[str] = None):
+        """
+        Initialize the EntityCache.
+        
+        Args:
+            client: An authenticated TelegramClient instance
+            ttl: Seconds a resolved entity stays valid
+            negative_ttl: Seconds a failed lookup is remembered before retrying
+            path: Path of the JSON file the cache is persisted to, or None to keep it in memory only
+        """
+        self._client = client
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._path = path
+        self._single_flight = SingleFlight()
+        
+        # Map of user IDs to (found, username, expires_at)
+        # Wall-clock expiry times are used so entries stay valid across restarts
+        self._entries: Dict[int, Tuple[bool, Optional[str], float]] = {}
+        
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+    
+    async def get_username(self, user_id: int) -> Optional[str]:
+        """
+        Get a user's username, resolving the entity only if it is not cached.
+        
+        Args:
+            user_id: The user ID to look up
+        
+        Returns:
+            The username if the user has one, None if it has none or the lookup failed
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[2] > time.time():
+            self._hits += 1
+            return entry[1]
+        
+        self._misses += 1
+        if self._single_flight.is_in_flight(user_id):
+            self._coalesced += 1
+        
+        return await self._single_flight.run(user_id, lambda: self._resolve(user_id))
+    
+    async def prewarm(self, user_ids: Iterable[int]) -> None:
+        """
+        Resolve every given user that is not already cached.
+        
+        Args:
+            user_ids: The user IDs to resolve
+        """
+        now = time.time()
+        missing = [user_id for user_id in user_ids
+                   if user_id not in self._entries or self._entries[user_id][2] <= now]
+        if not missing:
+            return
+        
+        logger.info(f"Prewarming entity cache for {len(missing)} users")
+        await asyncio.gather(*(self.get_username(user_id) for user_id in missing))
+    
+    def load(self) -> None:
+        """Load persisted entries from disk, skipping the ones that have expired."""
+        if not self._path or not os.path.exists(self._path):
+            return
+        
+        try:
+            with open(self._path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading entity cache: {e}")
+            return
+        
+        now = time.time()
+        for user_id, (found, username, expires_at) in data.items():
+            if expires_at > now:
+                self._entries[int(user_id)] = (found, username, expires_at)
+        
+        logger.info(f"Loaded {len(self._entries)} entries into entity cache")
+    
+    def save(self) -> None:
+        """Persist the current entries to disk."""
+        if not self._path:
+            return
+        
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        data = {str(user_id): list(entry) for user_id, entry in self._entries.items()}
+        temp_path = f"{self._path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(temp_path, self._path)
+        except OSError as e:
+            logger.error(f"Error saving entity cache: {e}")
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache hit/miss counters.
+        
+        Returns:
+            Dictionary with hits, misses, coalesced lookups and the number of cached entries
+        """
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'coalesced': self._coalesced,
+            'size': len(self._entries),
+        }
+    
+    async def _resolve(self, user_id: int) -> Optional[str]:
+        """
+        Fetch a user entity from Telegram and cache the result.
+        
+        Args:
+            user_id: The user ID to resolve
+        
+        Returns:
+            The username if the user has one, None otherwise
+        """
+        try:
+            user = await self._client.get_entity(user_id)
+        except Exception as e:
+            logger.error(f"Error getting user entity: {e}")
+            self._entries[user_id] = (False, None, time.time() + self._negative_ttl)
+            return None
+        
+        username = getattr(user, 'username', None)
+        if username is not None and not username.strip():
+            username = None
+        
+        self._entries[user_id] = (True, username, time.time() + self._ttl)
+        return username
\ No newline at end of file
@@ -0,0 +1,72 @@
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+from telethon.tl.types import Message, MessageMediaDocument, MessageMediaPhoto
+from loguru import logger
+
+
+class EventRecorder:
+    """
+    Records a summary of incoming messages to a JSON lines file for offline replay.
+    
+    Only the shape of the traffic is recorded: IDs, timing, reply and album links,
+    text length and media type. Message text and media content are not stored.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Initialize the EventRecorder.
+        
+        Args:
+            path: Path of the file the events are appended to
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._file = open(path, 'a', encoding='utf-8')
+        self._started_at = time.monotonic()
+        logger.info(f"Recording incoming messages to {path}")
+    
+    def record(self, message: Message) -> None:
+        """
+        Append a message to the recording.
+        
+        Args:
+            message: The incoming message
+        """
+        event: Dict[str, Any] = {
+            't': round(time.monotonic() - self._started_at, 4),
+            'chat_id': message.chat_id,
+            'id': message.id,
+            'sender_id': message.sender_id,
+            'text_length': len(message.text or ''),
+            'reply_to': message.reply_to.reply_to_msg_id if message.reply_to is not None else None,
+            'grouped_id': message.grouped_id,
+            'media': self._describe_media(message.media),
+        }
+        self._file.write(json.dumps(event) + '\n')
+    
+    def close(self) -> None:
+        """Flush and close the recording."""
+        self._file.close()
+    
+    @staticmethod
+    def _describe_media(media: Any) -> Optional[Dict[str, Any]]:
+        """
+        Describe a message's media without its content.
+        
+        Args:
+            media: The media of the message
+        
+        Returns:
+            Dictionary with the media type, ID and size, or None if there is no media
+        """
+        if media is None:
+            return None
+        if isinstance(media, MessageMediaDocument) and media.document is not None:
+            return {'type': 'document', 'id': media.document.id, 'size': media.document.size}
+        if isinstance(media, MessageMediaPhoto) and media.photo is not None:
+            return {'type': 'photo', 'id': media.photo.id, 'size': 0}
+        return {'type': type(media).__name__, 'id': None, 'size': 0}
\ No newline at end of file
@@ -0,0 +1,252 @@
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+from telethon.tl.types import (
+    Message, MessageMediaPhoto, MessageMediaDocument, MessageMediaWebPage, MessageMediaPoll,
+    DocumentAttributeSticker, DocumentAttributeAnimated, DocumentAttributeVideo, DocumentAttributeAudio
+)
+
+
+# Media types filters can refer to; 'none' is a message without media
+MEDIA_TYPES = ('none', 'photo', 'video', 'video_note', 'gif', 'sticker', 'voice', 'audio', 'document',
+               'webpage', 'poll', 'other')
+
+
+def media_type(message: Message) -> str:
+    """
+    Classify the media of a message.
+    
+    Args:
+        message: The message to classify
+    
+    Returns:
+        One of MEDIA_TYPES
+    """
+    media = message.media
+    if media is None:
+        return 'none'
+    if isinstance(media, MessageMediaPhoto):
+        return 'photo'
+    if isinstance(media, MessageMediaWebPage):
+        return 'webpage'
+    if isinstance(media, MessageMediaPoll):
+        return 'poll'
+    if isinstance(media, MessageMediaDocument):
+        attributes = getattr(media.document, 'attributes', None) or []
+        if any(isinstance(attribute, DocumentAttributeSticker) for attribute in attributes):
+            return 'sticker'
+        if any(isinstance(attribute, DocumentAttributeAnimated) for attribute in attributes):
+            return 'gif'
+        for attribute in attributes:
+            if isinstance(attribute, DocumentAttributeVideo):
+                return 'video_note' if attribute.round_message else 'video'
+            if isinstance(attribute, DocumentAttributeAudio):
+                return 'voice' if attribute.voice else 'audio'
+        return 'document'
+    return 'other'
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton matching any of a set of keywords in one pass over the text.
+    
+    Matching is case-insensitive and its cost depends on the length of the text,
+    not on the number of keywords.
+    """
+    
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Build the automaton.
+        
+        Args:
+            keywords: The keywords to match, empty ones are ignored
+        """
+        # Trie of states: transitions by character, fallback state, and whether a keyword ends here
+        self._transitions: List[Dict[str, int]] = [{}]
+        self._fallbacks: List[int] = [0]
+        self._accepting: List[bool] = [False]
+        self._keyword_count = 0
+        
+        for keyword in keywords:
+            keyword = keyword.casefold()
+            if not keyword:
+                continue
+            state = 0
+            for character in keyword:
+                next_state = self._transitions[state].get(character)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions[state][character] = next_state
+                    self._transitions.append({})
+                    self._fallbacks.append(0)
+                    self._accepting.append(False)
+                state = next_state
+            self._accepting[state] = True
+            self._keyword_count += 1
+        
+        # Breadth-first pass linking every state to its longest proper suffix in the trie
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._transitions[state].items():
+                fallback = self._fallbacks[state]
+                while fallback and character not in self._transitions[fallback]:
+                    fallback = self._fallbacks[fallback]
+                target = self._transitions[fallback].get(character, 0)
+                self._fallbacks[next_state] = target if target != next_state else 0
+                # A state also accepts if any of its suffixes ends a keyword
+                self._accepting[next_state] = self._accepting[next_state] or self._accepting[self._fallbacks[next_state]]
+                queue.append(next_state)
+    
+    def __len__(self) -> int:
+        """Return the number of keywords."""
+        return self._keyword_count
+    
+    def search(self, text: str) -> bool:
+        """
+        Check if the text contains any keyword.
+        
+        Args:
+            text: The text to scan, already case-folded
+        
+        Returns:
+            True if a keyword occurs in the text, False otherwise
+        """
+        transitions = self._transitions
+        fallbacks = self._fallbacks
+        accepting = self._accepting
+        state = 0
+        for character in text:
+            while state and character not in transitions[state]:
+                state = fallbacks[state]
+            state = transitions[state].get(character, 0)
+            if accepting[state]:
+                return True
+        return False
+
+
+def _compile_patterns(patterns: List[str], field: str) -> Optional['re.Pattern']:
+    """
+    Combine regular expressions into one case-insensitive pattern.
+    
+    Args:
+        patterns: The regular expressions
+        field: Name of the filter field, used in errors
+    
+    Returns:
+        The combined pattern, or None if there are no patterns
+    """
+    if not patterns:
+        return None
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression in {field}: {pattern!r} ({e})")
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), re.IGNORECASE)
+
+
+class MessageFilter:
+    """
+    Precompiled content rules of a route.
+    
+    Cheap checks on message flags and media type run first; the text is only
+    scanned when those pass, once for all keywords and once for all patterns.
+    """
+    
+    def __init__(self, media_types: Optional[List[str]] = None, keywords: Optional[List[str]] = None,
+                 exclude_keywords: Optional[List[str]] = None, patterns: Optional[List[str]] = None,
+                 exclude_patterns: Optional[List[str]] = None, replies_only: bool = False,
+                 forwarded_only: bool = False):
+        """
+        Compile the rules.
+        
+        Args:
+            media_types: Media types to forward, or None for all
+            keywords: Forward only messages containing one of these keywords or matching a pattern
+            exclude_keywords: Never forward messages containing one of these keywords
+            patterns: Forward only messages matching one of these regular expressions or containing a keyword
+            exclude_patterns: Never forward messages matching one of these regular expressions
+            replies_only: Forward only replies
+            forwarded_only: Forward only messages forwarded from elsewhere
+        """
+        unknown = sorted(set(media_types or []) - set(MEDIA_TYPES))
+        if unknown:
+            raise ValueError(f"Unknown media types {unknown}, expected some of {list(MEDIA_TYPES)}")
+        
+        self._media_types = frozenset(media_types) if media_types else None
+        self._replies_only = replies_only
+        self._forwarded_only = forwarded_only
+        self._keywords = KeywordMatcher(keywords) if keywords else None
+        self._exclude_keywords = KeywordMatcher(exclude_keywords) if exclude_keywords else None
+        self._patterns = _compile_patterns(patterns or [], 'patterns')
+        self._exclude_patterns = _compile_patterns(exclude_patterns or [], 'exclude_patterns')
+        self._requires_match = self._keywords is not None or self._patterns is not None
+        self._scans_text = self._requires_match or self._exclude_keywords is not None or self._exclude_patterns is not None
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MessageFilter':
+        """
+        Create a filter from the 'filters' entry of a route.
+        
+        Args:
+            data: The filters entry
+        
+        Returns:
+            The compiled filter
+        """
+        if not isinstance(data, dict):
+            raise ValueError("filters must be an object")
+        
+        unknown = sorted(set(data) - {'media_types', 'keywords', 'exclude_keywords', 'patterns',
+                                      'exclude_patterns', 'replies_only', 'forwarded_only'})
+        if unknown:
+            raise ValueError(f"Unknown filter settings {unknown}")
+        
+        def string_list(field: str) -> List[str]:
+            value = data.get(field, [])
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ValueError(f"{field} must be a list of strings")
+            return value
+        
+        return cls(
+            media_types=string_list('media_types'),
+            keywords=string_list('keywords'),
+            exclude_keywords=string_list('exclude_keywords'),
+            patterns=string_list('patterns'),
+            exclude_patterns=string_list('exclude_patterns'),
+            replies_only=bool(data.get('replies_only', False)),
+            forwarded_only=bool(data.get('forwarded_only', False))
+        )
+    
+    def rejection_reason(self, message: Message) -> Optional[str]:
+        """
+        Check a message against the rules.
+        
+        Args:
+            message: The message to check
+        
+        Returns:
+            The name of the rule that rejects the message, or None if it should be forwarded
+        """
+        if self._replies_only and message.reply_to is None:
+            return 'replies_only'
+        if self._forwarded_only and getattr(message, 'fwd_from', None) is None:
+            return 'forwarded_only'
+        if self._media_types is not None and media_type(message) not in self._media_types:
+            return 'media_type'
+        
+        if not self._scans_text:
+            return None
+        
+        text = (message.raw_text or '').casefold()
+        if self._exclude_keywords is not None and self._exclude_keywords.search(text):
+            return 'exclude_keywords'
+        if self._exclude_patterns is not None and self._exclude_patterns.search(text):
+            return 'exclude_patterns'
+        if self._requires_match and not (
+            (self._keywords is not None and self._keywords.search(text))
+            or (self._patterns is not None and self._patterns.search(text))
+        ):
+            return 'keywords'
+        return None
\ No newline at end of file
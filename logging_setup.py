@@ -0,0 +1,130 @@
+import sys
+import time
+from collections import Counter
+from typing import Any
+from loguru import logger
+
+
+# Ways of writing the log, selected with --log-mode
+LOG_MODE_SYNC = 'sync'
+LOG_MODE_FAST = 'fast'
+LOG_MODES = (LOG_MODE_SYNC, LOG_MODE_FAST)
+
+CONSOLE_FORMAT = ("<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+                  "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+
+
+class MessageLog:
+    """
+    Log lines written for every message, logged one by one or counted into periodic summaries.
+    
+    In sampled mode each line is logged at DEBUG, which costs nothing when no sink takes
+    DEBUG because the arguments are only formatted for an enabled level, and an INFO
+    summary of how often each kind of line occurred is logged by calling summarize, which
+    the forwarder does every interval.
+    """
+    
+    def __init__(self):
+        """Initialize the MessageLog, logging every line until configured otherwise."""
+        self._sampled = False
+        self._interval = 10.0
+        self._counts: Counter = Counter()
+        self._summarized_at = time.monotonic()
+        # Attribute the lines to the code calling event, not to this class
+        self._logger = logger.opt(depth=1)
+    
+    def configure(self, sampled: bool, interval: float = 10.0) -> None:
+        """
+        Choose how per-message lines are logged.
+        
+        Args:
+            sampled: Whether to count lines into summaries instead of logging each at INFO
+            interval: Seconds between summaries
+        """
+        self.summarize()
+        self._sampled = sampled
+        self._interval = interval
+    
+    @property
+    def sampled(self) -> bool:
+        """
+        Check if lines are counted into summaries.
+        
+        Returns:
+            True if lines are summarized, False if each is logged at INFO
+        """
+        return self._sampled
+    
+    @property
+    def interval(self) -> float:
+        """
+        Get the time between summaries.
+        
+        Returns:
+            Seconds between summaries
+        """
+        return self._interval
+    
+    def event(self, name: str, message: str, *args: Any) -> None:
+        """
+        Log a per-message line.
+        
+        Args:
+            name: What the line reports, used as its label in summaries, e.g. 'sent'
+            message: The line with {} placeholders for the arguments
+            *args: Arguments formatted into the line only if it is logged
+        """
+        if not self._sampled:
+            self._logger.info(message, *args)
+            return
+        
+        self._logger.debug(message, *args)
+        self._counts[name] += 1
+    
+    def summarize(self) -> None:
+        """Log the lines counted since the last summary."""
+        now = time.monotonic()
+        if self._counts:
+            counts = ', '.join(f"{count} {name}" for name, count in self._counts.most_common())
+            logger.info(f"Last {now - self._summarized_at:.0f}s: {counts}")
+            self._counts.clear()
+        self._summarized_at = now
+
+
+# Shared by every component that logs per message
+MESSAGE_LOG = MessageLog()
+
+
+def setup_logging(mode: str = LOG_MODE_SYNC, path: str = "logs/forwarder.log", console: bool = True,
+                  summary_interval: float = 10.0) -> None:
+    """
+    Configure the log sinks.
+    
+    In sync mode both sinks are written from the event loop and the file gets every DEBUG line.
+    In fast mode sink writes, rotation and compression happen on a background thread, the file
+    gets INFO and above, and per-message lines are summarized every summary_interval seconds.
+    
+    Args:
+        mode: LOG_MODE_SYNC or LOG_MODE_FAST
+        path: Path of the rotating log file
+        console: Whether to also log to stderr
+        summary_interval: Seconds between summaries of per-message lines in fast mode
+    """
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode '{mode}'")
+    fast = mode == LOG_MODE_FAST
+    
+    logger.remove()  # Remove default handler
+    if console:
+        logger.add(sys.stderr, format=CONSOLE_FORMAT, level="INFO", enqueue=fast)
+    logger.add(
+        path,
+        rotation="10 MB",
+        retention="1 week",
+        compression="zip",
+        level="INFO" if fast else "DEBUG",
+        format=FILE_FORMAT,
+        enqueue=fast
+    )
+    MESSAGE_LOG.configure(sampled=fast, interval=summary_interval)
\ No newline at end of file
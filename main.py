@@ -3,46 +3,50 @@ import signal
 import sys
 import argparse
 from loguru import logger
+from telethon import TelegramClient
 
 from config import TelegramConfig, ForwarderConfig
 from telegram_forwarder import TelegramForwarder
-
-
-def setup_logging():
-    """Configure logging settings."""
-    logger.remove()  # Remove default handler
-    logger.add(
-        sys.stderr,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        level="INFO"
-    )
-    logger.add(
-        "logs/forwarder.log",
-        rotation="10 MB",
-        retention="1 week",
-        compression="zip",
-        level="DEBUG",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
-    )
+from logging_setup import LOG_MODES, LOG_MODE_SYNC, setup_logging
 
 
 def parse_arguments():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(description="Telegram Message Forwarding System")
     
-    # Add any new command-line arguments here if needed in the future
+    parser.add_argument(
+        "--backfill-from",
+        type=int,
+        metavar="MESSAGE_ID",
+        help="Forward tracked messages starting from this message ID in every source chat before listening for new ones"
+    )
+    parser.add_argument(
+        "--log-mode",
+        choices=LOG_MODES,
+        default=LOG_MODE_SYNC,
+        help="'sync' writes every line from the event loop, 'fast' writes on a background thread "
+             "and summarizes per-message lines periodically"
+    )
+    parser.add_argument(
+        "--login",
+        metavar="SESSION",
+        help="Log in the account of a session from SENDER_SESSIONS interactively and exit"
+    )
     
     return parser.parse_args()
 
 
 async def main():
     """Main entry point for the application."""
-    setup_logging()
+    # Parse command-line arguments
+    args = parse_arguments()
+    setup_logging(args.log_mode)
+    
+    if args.login:
+        await login(args.login)
+        return
     
     try:
-        # Parse command-line arguments
-        args = parse_arguments()
-        
         # Load configuration
         telegram_config = TelegramConfig()
         forwarder_config = ForwarderConfig()
@@ -51,12 +55,15 @@ async def main():
         logger.info("Message links are now always included in the message format")
         
         # Create and start forwarder
-        forwarder = TelegramForwarder(telegram_config, forwarder_config)
+        forwarder = TelegramForwarder(telegram_config, forwarder_config, backfill_from=args.backfill_from)
         
         # Handle shutdown signals
         loop = asyncio.get_event_loop()
         for sig in (signal.SIGINT, signal.SIGTERM):
             loop.add_signal_handler(sig, lambda: asyncio.create_task(shutdown(forwarder)))
+        # Reload routes and tracked users on SIGHUP, where the platform has it
+        if hasattr(signal, 'SIGHUP'):
+            loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.create_task(forwarder.reload()))
         
         await forwarder.start()
         
@@ -65,6 +72,21 @@ async def main():
         sys.exit(1)
 
 
+async def login(session: str):
+    """
+    Log in the account of a session, asking for its phone number and code on the terminal.
+    
+    Args:
+        session: Name of the session
+    """
+    telegram_config = TelegramConfig()
+    client = TelegramClient(session, telegram_config.api_id, telegram_config.api_hash)
+    await client.start()
+    me = await client.get_me()
+    logger.info(f"Session {session} is logged in as user {me.id}")
+    await client.disconnect()
+
+
 async def shutdown(forwarder: TelegramForwarder):
     """Gracefully shut down the application."""
     logger.info("Shutting down...")
@@ -75,6 +97,8 @@ async def shutdown(forwarder: TelegramForwarder):
         task.cancel()
     
     await asyncio.gather(*tasks, return_exceptions=True)
+    # Let a background log writer finish
+    await logger.complete()
     asyncio.get_event_loop().stop()
 
 
@@ -0,0 +1,328 @@
+import asyncio
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from telethon import TelegramClient, utils
+from telethon.errors import FileReferenceExpiredError
+from telethon.tl.types import Message, MessageMediaDocument, MessageMediaPhoto
+from loguru import logger
+
+
+class MediaCache:
+    """
+    Resolves each source media object once and reuses the result for every later send.
+    
+    The first send of a photo or document goes out with the source media (or, for chats
+    that forbid forwarding, a file downloaded in chunks and uploaded once). The media of
+    the resulting message is then cached by source media ID, so further destinations and
+    reposts of the same file reuse it without downloading or uploading again. Cached
+    references expire after a while; a send rejected for that drops the entry and goes
+    out with the source media again, caching the new copy.
+    """
+    
+    def __init__(self, client: TelegramClient, max_bytes: int = 512 * 1024 * 1024,
+                 chunk_size: int = 512 * 1024, temp_dir: Optional[str] = None):
+        """
+        Initialize the MediaCache.
+        
+        Args:
+            client: An authenticated TelegramClient instance
+            max_bytes: Maximum total size of the media referenced by the cache before the least recently used entries are evicted
+            chunk_size: Size of the chunks used to stream media that has to be downloaded
+            temp_dir: Directory for downloaded media, the system default if not provided
+        """
+        self._client = client
+        self._max_bytes = max_bytes
+        self._chunk_size = chunk_size
+        self._temp_dir = temp_dir
+        
+        # Map of media keys to (reusable input media, media size in bytes)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._cached_bytes = 0
+        
+        # Media keys whose first send is in progress, other senders wait for it
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        
+        self._uploads = 0
+        self._uploads_avoided = 0
+        self._bytes_saved = 0
+        self._bytes_downloaded = 0
+        self._references_expired = 0
+    
+    async def send(self, message: Message, send_operation: Callable[[Any], Awaitable[Message]]) -> Message:
+        """
+        Send a message's media, reusing a cached reference when one exists.
+        
+        Args:
+            message: The source message whose media is sent
+            send_operation: Coroutine function sending the given file, returning the sent message
+        
+        Returns:
+            The sent message
+        """
+        key = self._media_key(message.media)
+        if key is None:
+            return await send_operation(message.media if message.media else None)
+        
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                try:
+                    sent_message = await send_operation(entry[0])
+                except FileReferenceExpiredError:
+                    self._forget(key, entry)
+                    self._references_expired += 1
+                    continue
+                self._uploads_avoided += 1
+                self._bytes_saved += entry[1]
+                return sent_message
+            
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            
+            # Another send of the same media is in progress, wait for it to cache the reference
+            await asyncio.shield(pending)
+        
+        pending = self._pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            return await self._send_first(key, message, send_operation)
+        finally:
+            del self._pending[key]
+            pending.set_result(None)
+    
+    async def send_album(self, messages: List[Message],
+                         send_operation: Callable[[List[Any]], Awaitable[List[Message]]]) -> List[Message]:
+        """
+        Send the media of several messages as one album, reusing cached references where they exist.
+        
+        Args:
+            messages: The source messages of the album, in order
+            send_operation: Coroutine function sending the given files as an album, returning the sent messages
+        
+        Returns:
+            The sent messages
+        """
+        keys = [self._media_key(message.media) for message in messages]
+        
+        # Wait for first sends of the same media elsewhere, then claim the media nobody is sending
+        while True:
+            waiting = [self._pending[key] for key in keys
+                       if key is not None and key in self._pending and key not in self._entries]
+            if not waiting:
+                break
+            await asyncio.gather(*(asyncio.shield(pending) for pending in waiting))
+        
+        claimed = {}
+        for key in keys:
+            if key is not None and key not in self._entries and key not in claimed:
+                claimed[key] = self._pending[key] = asyncio.get_running_loop().create_future()
+        
+        paths = []
+        try:
+            files = []
+            # Cached entries used for the album by position
+            reused: Dict[int, Tuple[Hashable, Tuple[Any, int]]] = {}
+            for index, (message, key) in enumerate(zip(messages, keys)):
+                entry = self._entries.get(key) if key is not None else None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    reused[index] = (key, entry)
+                    files.append(entry[0])
+                else:
+                    files.append(await self._source_file(message, paths))
+                    if key is not None:
+                        self._uploads += 1
+            
+            # Media sent from the source whose new copy is cached afterwards
+            fresh = set(claimed)
+            try:
+                sent_messages = await send_operation(files)
+            except FileReferenceExpiredError:
+                if not reused:
+                    raise
+                # Telegram doesn't say which reference expired, so every cached one is replaced
+                for index, (key, entry) in reused.items():
+                    self._forget(key, entry)
+                    self._references_expired += 1
+                    files[index] = await self._source_file(messages[index], paths)
+                    self._uploads += 1
+                    fresh.add(key)
+                reused = {}
+                sent_messages = await send_operation(files)
+            
+            for _, (_, size) in reused.values():
+                self._uploads_avoided += 1
+                self._bytes_saved += size
+            for message, key, sent_message in zip(messages, keys, sent_messages or []):
+                if key in fresh and getattr(sent_message, 'media', None) is not None:
+                    try:
+                        self._remember(key, utils.get_input_media(sent_message.media), self._media_size(message.media))
+                    except TypeError as e:
+                        logger.debug("Media of message {} can't be reused: {}", message.id, e)
+            return sent_messages
+        finally:
+            for path in paths:
+                os.remove(path)
+            for key, pending in claimed.items():
+                del self._pending[key]
+                pending.set_result(None)
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the media reuse counters.
+        
+        Returns:
+            Dictionary with uploads done and avoided, bytes saved and downloaded, expired references and cache size
+        """
+        return {
+            'uploads': self._uploads,
+            'uploads_avoided': self._uploads_avoided,
+            'bytes_saved': self._bytes_saved,
+            'bytes_downloaded': self._bytes_downloaded,
+            'references_expired': self._references_expired,
+            'cached_entries': len(self._entries),
+            'cached_bytes': self._cached_bytes,
+        }
+    
+    async def _send_first(self, key: Hashable, message: Message,
+                          send_operation: Callable[[Any], Awaitable[Message]]) -> Message:
+        """
+        Send media that isn't cached yet and cache the reference of the sent copy.
+        
+        Args:
+            key: The media key
+            message: The source message whose media is sent
+            send_operation: Coroutine function sending the given file, returning the sent message
+        
+        Returns:
+            The sent message
+        """
+        paths = []
+        try:
+            file = await self._source_file(message, paths)
+            self._uploads += 1
+            sent_message = await send_operation(file)
+        finally:
+            for path in paths:
+                os.remove(path)
+        
+        if sent_message is not None and getattr(sent_message, 'media', None) is not None:
+            try:
+                self._remember(key, utils.get_input_media(sent_message.media), self._media_size(message.media))
+            except TypeError as e:
+                logger.debug("Media of message {} can't be reused: {}", message.id, e)
+        
+        return sent_message
+    
+    async def _source_file(self, message: Message, paths: List[str]) -> Any:
+        """
+        Get what a message's media is sent as when no cached copy is used.
+        
+        Args:
+            message: The source message whose media is sent
+            paths: List the path of a downloaded file is added to, for the caller to remove
+        
+        Returns:
+            The source media, or the path of a downloaded copy if the source chat forbids reusing it
+        """
+        if self._media_key(message.media) is None or not getattr(message, 'noforwards', False):
+            return message.media
+        
+        # The source chat forbids reusing its media, so download it and upload a copy
+        paths.append(await self._download(message))
+        return paths[-1]
+    
+    async def _download(self, message: Message) -> str:
+        """
+        Stream a message's media to a temporary file in chunks.
+        
+        Args:
+            message: The message whose media is downloaded
+        
+        Returns:
+            Path of the temporary file
+        """
+        extension = utils.get_extension(message.media)
+        descriptor, path = tempfile.mkstemp(suffix=extension, dir=self._temp_dir)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                async for chunk in self._client.iter_download(message.media, chunk_size=self._chunk_size):
+                    file.write(chunk)
+                    self._bytes_downloaded += len(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        
+        return path
+    
+    def _remember(self, key: Hashable, input_media: Any, size: int) -> None:
+        """
+        Cache a reusable media reference, evicting the least recently used entries over the size limit.
+        
+        Args:
+            key: The media key
+            input_media: The reusable input media
+            size: Size of the media in bytes
+        """
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._cached_bytes -= previous[1]
+        self._entries[key] = (input_media, size)
+        self._cached_bytes += size
+        while self._cached_bytes > self._max_bytes and len(self._entries) > 1:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._cached_bytes -= evicted_size
+    
+    def _forget(self, key: Hashable, entry: Tuple[Any, int]) -> None:
+        """
+        Drop a cached reference that can't be used anymore, unless it was replaced already.
+        
+        Args:
+            key: The media key
+            entry: The cached (input media, size) that failed
+        """
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+            self._cached_bytes -= entry[1]
+            logger.debug("File reference of cached media {} expired, sending the source media again", key)
+    
+    @staticmethod
+    def _media_key(media: Any) -> Optional[Hashable]:
+        """
+        Get the cache key of a message's media.
+        
+        Args:
+            media: The media of the message
+        
+        Returns:
+            A key identifying the photo or document, None for other or missing media
+        """
+        if isinstance(media, MessageMediaPhoto) and media.photo is not None:
+            return ('photo', media.photo.id)
+        if isinstance(media, MessageMediaDocument) and media.document is not None:
+            return ('document', media.document.id)
+        return None
+    
+    @staticmethod
+    def _media_size(media: Any) -> int:
+        """
+        Get the size in bytes of a photo or document.
+        
+        Args:
+            media: The media of the message
+        
+        Returns:
+            The size of the largest photo size or of the document, 0 if unknown
+        """
+        if isinstance(media, MessageMediaDocument):
+            return getattr(media.document, 'size', 0) or 0
+        
+        sizes = getattr(media.photo, 'sizes', None) or []
+        largest = 0
+        for photo_size in sizes:
+            largest = max(largest, getattr(photo_size, 'size', 0) or 0, *(getattr(photo_size, 'sizes', None) or [0]))
+        return largest
\ No newline at end of file
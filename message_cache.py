@@ -0,0 +1,156 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from telethon import TelegramClient
+from telethon.tl.types import Message
+from loguru import logger
+
+
+class RecentMessageCache:
+    """Bounded ring buffer of recently seen source messages, keyed by chat and message ID."""
+    
+    def __init__(self, capacity: int = 5000):
+        """
+        Initialize the RecentMessageCache.
+        
+        Args:
+            capacity: Maximum number of messages kept, the oldest are dropped first
+        """
+        self._capacity = capacity
+        self._messages: "OrderedDict[Tuple[int, int], Message]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+    
+    def add(self, message: Message) -> None:
+        """
+        Remember a message.
+        
+        Args:
+            message: The message to remember
+        """
+        self._messages[(message.chat_id, message.id)] = message
+        if len(self._messages) > self._capacity:
+            self._messages.popitem(last=False)
+    
+    def get(self, chat_id: int, message_id: int) -> Optional[Message]:
+        """
+        Get a remembered message.
+        
+        Args:
+            chat_id: The ID of the chat the message was sent in
+            message_id: The ID of the message
+        
+        Returns:
+            The message if it is still in the buffer, None otherwise
+        """
+        message = self._messages.get((chat_id, message_id))
+        if message is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return message
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache hit/miss counters.
+        
+        Returns:
+            Dictionary with hits, misses and the number of cached messages
+        """
+        return {'hits': self._hits, 'misses': self._misses, 'size': len(self._messages)}
+
+
+class MessageBatchFetcher:
+    """Groups message lookups for the same chat made within a short window into one get_messages call."""
+    
+    def __init__(self, client: TelegramClient, window: float = 0.05, max_batch_size: int = 100):
+        """
+        Initialize the MessageBatchFetcher.
+        
+        Args:
+            client: An authenticated TelegramClient instance
+            window: Seconds to collect lookups before fetching them
+            max_batch_size: Number of collected IDs that triggers an immediate fetch
+        """
+        self._client = client
+        self._window = window
+        self._max_batch_size = max_batch_size
+        
+        # Pending lookups per chat: {chat_id: (peer, {message_id: [futures]})}
+        self._pending: Dict[int, Tuple[Any, Dict[int, List[asyncio.Future]]]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._requests = 0
+    
+    async def get_message(self, peer: Any, chat_id: int, message_id: int) -> Optional[Message]:
+        """
+        Fetch a message, batched with other lookups in the same chat.
+        
+        Args:
+            peer: The peer of the chat, as accepted by get_messages
+            chat_id: The ID of the chat, used to group lookups
+            message_id: The ID of the message to fetch
+        
+        Returns:
+            The message if it exists, None otherwise
+        """
+        future = asyncio.get_running_loop().create_future()
+        _, waiters = self._pending.setdefault(chat_id, (peer, {}))
+        waiters.setdefault(message_id, []).append(future)
+        
+        if len(waiters) >= self._max_batch_size:
+            self._flush(chat_id)
+        elif chat_id not in self._timers:
+            self._timers[chat_id] = asyncio.get_running_loop().call_later(self._window, self._flush, chat_id)
+        
+        return await future
+    
+    @property
+    def requests(self) -> int:
+        """
+        Get the number of get_messages calls made.
+        
+        Returns:
+            The number of requests sent to Telegram
+        """
+        return self._requests
+    
+    def _flush(self, chat_id: int) -> None:
+        """
+        Start fetching all pending lookups for a chat.
+        
+        Args:
+            chat_id: The ID of the chat to fetch the pending lookups for
+        """
+        timer = self._timers.pop(chat_id, None)
+        if timer is not None:
+            timer.cancel()
+        
+        peer, waiters = self._pending.pop(chat_id, (None, None))
+        if waiters:
+            asyncio.ensure_future(self._fetch(peer, waiters))
+    
+    async def _fetch(self, peer: Any, waiters: Dict[int, List[asyncio.Future]]) -> None:
+        """
+        Fetch a batch of messages and hand each one to the lookups waiting for it.
+        
+        Args:
+            peer: The peer of the chat
+            waiters: Map of message IDs to the futures waiting for them
+        """
+        ids = list(waiters)
+        self._requests += 1
+        try:
+            messages = await self._client.get_messages(peer, ids=ids)
+        except Exception as e:
+            logger.error(f"Error fetching {len(ids)} messages: {e}")
+            for futures in waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        
+        for message_id, message in zip(ids, messages):
+            for future in waiters[message_id]:
+                if not future.done():
+                    future.set_result(message)
\ No newline at end of file
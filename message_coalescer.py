@@ -0,0 +1,205 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from telethon.tl.types import Message
+from loguru import logger
+
+
+class _Group:
+    """Messages of one sender waiting to be sent together."""
+    
+    def __init__(self, key: Hashable, sender_id: Hashable, future: asyncio.Future):
+        self.key = key
+        self.sender_id = sender_id
+        self.messages: List[Message] = []
+        self.length = 0
+        self.future = future
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MessageCoalescer:
+    """
+    Merges messages from one sender into a single send.
+    
+    Messages are grouped by sender, or by another key such as the album ID. The
+    first buffered message of a group opens it, and the group is sent when the
+    window ends or the group is full, whichever comes first. Groups of the same
+    sender are sent in the order they were opened.
+    """
+    
+    def __init__(self, send_group: Callable[[List[Message]], Awaitable[Any]],
+                 window: float = 3.0, max_messages: int = 10, max_length: int = 3500,
+                 group_key: Optional[Callable[[Message], Hashable]] = None,
+                 sender_key: Optional[Callable[[Message], Hashable]] = None,
+                 measure: Optional[Callable[[Message], int]] = None):
+        """
+        Initialize the MessageCoalescer.
+        
+        Args:
+            send_group: Coroutine function sending a group of messages, returning the sent message(s)
+            window: Seconds a group stays open after its first message
+            max_messages: Number of messages that closes a group early
+            max_length: Total length that closes a group early, kept below Telegram's message limit
+            group_key: Function returning the group of a message, the sender ID if not provided
+            sender_key: Function returning the sender whose groups are sent in order, the sender ID if not provided
+            measure: Function returning the length a message adds to its group's send, the length of its text if not provided
+        """
+        self._send_group = send_group
+        self._window = window
+        self._max_messages = max_messages
+        self._max_length = max_length
+        self._group_key = group_key if group_key is not None else (lambda message: message.sender_id)
+        self._sender_key = sender_key if sender_key is not None else (lambda message: message.sender_id)
+        self._measure = measure if measure is not None else (lambda message: len(message.message or ''))
+        
+        # Open groups by key
+        self._groups: Dict[Hashable, _Group] = {}
+        # Group of every buffered message ID, until the group is sent
+        self._buffered: Dict[int, _Group] = {}
+        # Send of the most recently closed group per sender, so the next one waits for it
+        self._last_sends: Dict[Hashable, asyncio.Future] = {}
+        
+        self._groups_sent = 0
+        self._messages_coalesced = 0
+    
+    def can_coalesce(self, message: Message) -> bool:
+        """
+        Check if a message can be merged with others.
+        
+        Args:
+            message: The message to check
+        
+        Returns:
+            True for text messages without media that don't reply to anything
+        """
+        return (
+            message.media is None
+            and message.reply_to is None
+            and bool(message.message)
+            and self._measure(message) <= self._max_length
+        )
+    
+    def add(self, message: Message) -> asyncio.Future:
+        """
+        Buffer a message for a combined send.
+        
+        Args:
+            message: The message to buffer, see can_coalesce
+        
+        Returns:
+            Future resolving to the sent message once the message's group was sent, or None if sending failed
+        """
+        buffered_in = self._buffered.get(message.id)
+        if buffered_in is not None:
+            return buffered_in.future
+        
+        key = self._group_key(message)
+        length = self._measure(message)
+        group = self._groups.get(key)
+        if group is not None and group.length + length > self._max_length:
+            self._close(key)
+            group = None
+        
+        if group is None:
+            group = self._groups[key] = _Group(key, self._sender_key(message), asyncio.get_running_loop().create_future())
+            group.timer = asyncio.get_running_loop().call_later(self._window, self._close, key)
+        
+        group.messages.append(message)
+        group.length += length
+        self._buffered[message.id] = group
+        
+        future = group.future
+        if len(group.messages) >= self._max_messages:
+            self._close(key)
+        return future
+    
+    async def flush_sender(self, sender_id: Hashable) -> None:
+        """
+        Send a sender's open groups now and wait until all its groups are sent.
+        
+        Args:
+            sender_id: The ID of the sender
+        """
+        for key in [key for key, group in self._groups.items() if group.sender_id == sender_id]:
+            self._close(key)
+        last_send = self._last_sends.get(sender_id)
+        if last_send is not None:
+            await asyncio.shield(last_send)
+    
+    async def flush_message(self, message_id: int) -> None:
+        """
+        Make sure a message isn't waiting in a group, sending its group now if needed.
+        
+        Args:
+            message_id: The ID of the source message
+        """
+        group = self._buffered.get(message_id)
+        if group is not None:
+            await self.flush_sender(group.sender_id)
+    
+    async def flush(self) -> None:
+        """Send all open groups and wait for every pending send."""
+        for key in list(self._groups):
+            self._close(key)
+        pending = [send for send in self._last_sends.values() if not send.done()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the coalescing counters.
+        
+        Returns:
+            Dictionary with the number of groups sent, the messages they contained and open groups
+        """
+        return {
+            'groups_sent': self._groups_sent,
+            'messages_coalesced': self._messages_coalesced,
+            'open_groups': len(self._groups),
+        }
+    
+    def _close(self, key: Hashable) -> None:
+        """
+        Close an open group and start sending it after the sender's previous group.
+        
+        Args:
+            key: The key of the group
+        """
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+        
+        sender_id = group.sender_id
+        previous = self._last_sends.get(sender_id)
+        send = asyncio.ensure_future(self._send(group, previous))
+        self._last_sends[sender_id] = send
+        send.add_done_callback(
+            lambda _: self._last_sends.pop(sender_id, None) if self._last_sends.get(sender_id) is send else None
+        )
+    
+    async def _send(self, group: _Group, previous: Optional[asyncio.Future]) -> None:
+        """
+        Send a closed group and resolve its future.
+        
+        Args:
+            group: The group to send
+            previous: Send of the sender's previous group, awaited first to keep the order
+        """
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        
+        try:
+            result = await self._send_group(group.messages)
+            self._groups_sent += 1
+            self._messages_coalesced += len(group.messages)
+        except Exception as e:
+            logger.error(f"Error sending {len(group.messages)} coalesced messages: {e}")
+            result = None
+        finally:
+            for message in group.messages:
+                self._buffered.pop(message.id, None)
+        
+        if not group.future.done():
+            group.future.set_result(result)
\ No newline at end of file
@@ -0,0 +1,193 @@
+import copy
+from string import Formatter
+from typing import List, Optional, Tuple
+from telethon import helpers
+from telethon.tl.types import Message, MessageEntityTextUrl, MessageEntityMentionName, TypeMessageEntity
+
+
+# Template used when MESSAGE_TEMPLATE isn't set, matching the original message format
+DEFAULT_TEMPLATE = '#{user} - {text} - {link}'
+
+# Placeholders a template can use
+PLACEHOLDERS = ('user', 'text', 'link')
+
+# Maximum length of a message text in UTF-16 code units
+MESSAGE_LENGTH_LIMIT = 4096
+
+# Longest user identifier a message can show, usernames have at most 32 characters and IDs fewer digits
+MAX_USER_IDENTIFIER_LENGTH = 32
+
+
+def utf16_length(text: str) -> int:
+    """
+    Get the length of a string in UTF-16 code units, the unit of Telegram entity offsets.
+    
+    Args:
+        text: The string to measure
+    
+    Returns:
+        The length in UTF-16 code units
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+class MessageFormatter:
+    """
+    Builds the text and entities of forwarded messages from a template compiled once.
+    
+    The source message's own formatting is carried over with shifted offsets and the
+    link to the original is added as a text URL entity, so nothing has to be parsed
+    as markdown and markdown characters in the source text are sent as they are.
+    """
+    
+    def __init__(self, template: str = DEFAULT_TEMPLATE, link_text: str = 'to_chat'):
+        """
+        Compile the template.
+        
+        Args:
+            template: Output format using the {user}, {text} and {link} placeholders
+            link_text: Text of the link to the original message
+        """
+        if not link_text:
+            raise ValueError("The message link text must not be empty")
+        
+        # Template split into (literal, placeholder) pairs, the placeholder is None after the last literal
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        try:
+            for literal, field, format_spec, conversion in Formatter().parse(template):
+                if field is not None and (field not in PLACEHOLDERS or format_spec or conversion):
+                    raise ValueError(f"Unknown placeholder {{{field}}} in message template, "
+                                     f"expected some of {', '.join('{' + name + '}' for name in PLACEHOLDERS)}")
+                self._parts.append((literal, field))
+        except ValueError as e:
+            raise ValueError(f"Invalid message template {template!r}: {e}")
+        
+        self._link_text = link_text
+        self._link_text_length = utf16_length(link_text)
+        # UTF-16 lengths of the literals, computed once
+        self._literal_lengths = [utf16_length(literal) for literal, _ in self._parts]
+    
+    def format(self, message: Message, user_identifier: str, message_link: str) -> Tuple[str, List[TypeMessageEntity]]:
+        """
+        Build the text and entities of a forwarded message.
+        
+        Args:
+            message: The source message
+            user_identifier: Username or ID of the sender
+            message_link: Link to the original message
+        
+        Returns:
+            A tuple of the text and its formatting entities, to be sent with formatting_entities
+        """
+        source_text = message.message or ''
+        source_entities = message.entities or []
+        
+        pieces: List[str] = []
+        entities: List[TypeMessageEntity] = []
+        offset = 0
+        for (literal, field), literal_length in zip(self._parts, self._literal_lengths):
+            pieces.append(literal)
+            offset += literal_length
+            
+            if field == 'text':
+                pieces.append(source_text)
+                for entity in source_entities:
+                    # Mentions by user ID can't be sent back as they are received
+                    if isinstance(entity, MessageEntityMentionName):
+                        continue
+                    shifted = copy.copy(entity)
+                    shifted.offset = entity.offset + offset
+                    entities.append(shifted)
+                offset += utf16_length(source_text)
+            elif field == 'user':
+                pieces.append(user_identifier)
+                offset += utf16_length(user_identifier)
+            elif field == 'link':
+                pieces.append(self._link_text)
+                entities.append(MessageEntityTextUrl(offset, self._link_text_length, message_link))
+                offset += self._link_text_length
+        
+        text = ''.join(pieces)
+        
+        # Telegram strips surrounding whitespace, so strip it here and move the entities to match
+        if offset != len(text):
+            text = helpers.del_surrogate(helpers.strip_text(helpers.add_surrogate(text), entities))
+        else:
+            text = helpers.strip_text(text, entities)
+        
+        return text, entities
+    
+    def max_length(self, message: Message) -> int:
+        """
+        Get the longest the formatted text of a message can be, without looking up its sender.
+        
+        Args:
+            message: The source message
+        
+        Returns:
+            An upper bound of the formatted length in UTF-16 code units
+        """
+        field_lengths = {
+            'text': utf16_length(message.message or ''),
+            'user': MAX_USER_IDENTIFIER_LENGTH,
+            'link': self._link_text_length,
+            None: 0,
+        }
+        return sum(
+            literal_length + field_lengths[field]
+            for (_, field), literal_length in zip(self._parts, self._literal_lengths)
+        )
+    
+    def combine(self, parts: List[Tuple[str, List[TypeMessageEntity]]],
+                separator: str = '\n') -> Tuple[str, List[TypeMessageEntity]]:
+        """
+        Join formatted messages into one, moving each part's entities to its new position.
+        
+        Args:
+            parts: Text and entities of every message, as returned by format; the entities are moved in place
+            separator: Text placed between the parts
+        
+        Returns:
+            A tuple of the combined text and its formatting entities
+        """
+        separator_length = utf16_length(separator)
+        pieces: List[str] = []
+        entities: List[TypeMessageEntity] = []
+        offset = 0
+        for index, (text, part_entities) in enumerate(parts):
+            if index:
+                pieces.append(separator)
+                offset += separator_length
+            pieces.append(text)
+            for entity in part_entities:
+                entity.offset += offset
+                entities.append(entity)
+            offset += utf16_length(text)
+        return ''.join(pieces), entities
+
+
+class PrebuiltParseMode:
+    """
+    Parse mode returning entities built in advance, for Telethon calls that don't take formatting_entities.
+    
+    Album captions are only parsed through a parse mode, so this hands over the
+    entities of the caption without any markdown parsing.
+    """
+    
+    def __init__(self, entities: List[TypeMessageEntity]):
+        """
+        Initialize the PrebuiltParseMode.
+        
+        Args:
+            entities: The entities of the text that will be parsed
+        """
+        self._entities = entities
+    
+    def parse(self, text: str) -> Tuple[str, List[TypeMessageEntity]]:
+        """Return the text unchanged with the prebuilt entities, or none for empty text such as other album captions."""
+        return text, list(self._entities) if text else []
+    
+    @staticmethod
+    def unparse(text: str, entities: List[TypeMessageEntity]) -> str:
+        """Return the text without formatting."""
+        return text
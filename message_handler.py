@@ -1,48 +1,168 @@
-from typing import Optional
+import asyncio
+from typing import Collection, List, Optional
 from telethon.tl.types import Message
-from loguru import logger
 
 from user_service import UserService
 from message_repository import MessageRepository
+from filter_engine import MessageFilter
+from logging_setup import MESSAGE_LOG
+from metrics import MESSAGES_SKIPPED, STAGE_LATENCY
 
 
 class MessageHandler:
     """Handler for processing incoming messages and determining forwarding actions."""
     
-    def __init__(self, user_service: UserService, message_repository: MessageRepository, enable_message_links: bool = True):
+    def __init__(self, user_service: UserService, message_repositories: List[MessageRepository], enable_message_links: bool = True,
+                 message_filter: Optional[MessageFilter] = None):
         """
         Initialize the MessageHandler.
         
         Args:
             user_service: Service for checking if users should be tracked
-            message_repository: Repository for message operations
+            message_repositories: Repositories for message operations, one per destination chat
             enable_message_links: Whether to enable the feature to send links to original messages
+            message_filter: Content rules checked after the sender, or None to forward everything from tracked users
         """
         self._user_service = user_service
-        self._message_repository = message_repository
+        self._message_repositories = message_repositories
+        self._message_filter = message_filter
         # Message links are now always included in the formatted message, so this parameter is no longer used
         
-    async def handle_message(self, message: Message) -> None:
+    @property
+    def user_service(self) -> UserService:
+        """
+        Get the service deciding which users are tracked by this handler.
+        
+        Returns:
+            The user service
+        """
+        return self._user_service
+    
+    @property
+    def repositories(self) -> List[MessageRepository]:
+        """
+        Get the repositories the handler forwards to.
+        
+        Returns:
+            The repositories, one per destination chat
+        """
+        return list(self._message_repositories)
+    
+    def accepts(self, message: Message) -> bool:
+        """
+        Check if the handler forwards a message.
+        
+        Args:
+            message: The message to check
+        
+        Returns:
+            True if the sender is tracked and the content passes the filter, False otherwise
+        """
+        return self._rejection_reason(message) is None
+    
+    async def handle_message(self, message: Message,
+                             skip: Collection[MessageRepository] = ()) -> List[asyncio.Future]:
         """
         Handle an incoming message.
         
         Args:
             message: The message to handle
+            skip: Repositories another route already forwards the message to
+            
+        Returns:
+            Futures of sends still pending because the message was buffered for coalescing
         """
         # Check if message is from a tracked user
-        if not self._should_forward_message(message):
-            return
+        with STAGE_LATENCY.time(stage='filter'):
+            rejection_reason = self._rejection_reason(message)
+        if rejection_reason is not None:
+            MESSAGES_SKIPPED.inc(reason=rejection_reason)
+            return []
+        
+        repositories = [repository for repository in self._message_repositories if repository not in skip]
+        if not repositories:
+            return []
         
-        logger.info(f"Processing message {message.id} from user {message.sender_id}")
+        MESSAGE_LOG.event('processed', "Processing message {} from user {}", message.id, message.sender_id)
         
-        # Check if message is a reply
-        replied_message = await self._message_repository.get_replied_message(message)
+        # Check if message is a reply, resolving the parent once for all destinations
+        # Album parts and native forwards don't need the parent resolved here
+        replied_message = None
+        if repositories[0].needs_reply_parent(message):
+            with STAGE_LATENCY.time(stage='reply_resolution'):
+                replied_message = await repositories[0].get_replied_message(message)
         
         if replied_message:
-            logger.info(f"Message {message.id} is a reply to message {replied_message.id}")
-            await self._message_repository.forward_message_with_reply(message, replied_message)
-        else:
-            await self._message_repository.forward_message(message)
+            MESSAGE_LOG.event('replies', "Message {} is a reply to message {}", message.id, replied_message.id)
+            await asyncio.gather(*(
+                repository.forward_message_with_reply(message, replied_message)
+                for repository in repositories
+            ))
+            return []
+        
+        pending_sends = await asyncio.gather(*(
+            repository.forward_or_coalesce(message)
+            for repository in repositories
+        ))
+        return [send for send in pending_sends if send is not None]
+    
+    def is_handled(self, message: Message) -> bool:
+        """
+        Check if a processed message needs nothing more from this handler.
+        
+        Args:
+            message: The message that was handled
+        
+        Returns:
+            True if the message isn't forwarded by this handler or has a copy in every destination, False otherwise
+        """
+        if self._rejection_reason(message) is not None:
+            return True
+        return all(repository.has_copy(message.id) for repository in self._message_repositories)
+    
+    def tracks(self, message: Message) -> bool:
+        """
+        Check if the copies of a message are kept up to date by this handler.
+        
+        Args:
+            message: The message to check
+        
+        Returns:
+            True if the sender of the message is tracked, False otherwise
+        """
+        return bool(message.sender_id) and self._user_service.is_tracked(message.sender_id)
+    
+    async def handle_edit(self, message: Message, skip: Collection[MessageRepository] = ()) -> None:
+        """
+        Update the copies of an edited message in every destination.
+        
+        Args:
+            message: The source message in its edited state
+            skip: Repositories another route already updates the copies in
+        """
+        if not self.tracks(message):
+            return
+        await asyncio.gather(*(
+            repository.edit_forwarded(message)
+            for repository in self._message_repositories if repository not in skip
+        ))
+    
+    async def handle_delete(self, message_ids: List[int], skip: Collection[MessageRepository] = ()) -> None:
+        """
+        Remove the copies of deleted messages from every destination.
+        
+        Args:
+            message_ids: IDs of the deleted source messages
+            skip: Repositories another route already removes the copies from
+        """
+        await asyncio.gather(*(
+            repository.delete_forwarded(message_ids)
+            for repository in self._message_repositories if repository not in skip
+        ))
+    
+    async def flush(self) -> None:
+        """Send the messages buffered for coalescing in every destination."""
+        await asyncio.gather(*(repository.flush() for repository in self._message_repositories))
     
     def _should_forward_message(self, message: Message) -> bool:
         """
@@ -54,8 +174,22 @@ class MessageHandler:
         Returns:
             True if the message should be forwarded, False otherwise
         """
+        return self.accepts(message)
+    
+    def _rejection_reason(self, message: Message) -> Optional[str]:
+        """
+        Determine why a message should not be forwarded, checking the sender before any content rule.
+        
+        Args:
+            message: The message to check
+            
+        Returns:
+            The reason the message is skipped, or None if it should be forwarded
+        """
         # Check if sender is in tracked users
-        if not message.sender_id:
-            return False
+        if not message.sender_id or not self._user_service.is_tracked(message.sender_id):
+            return 'untracked'
         
-        return self._user_service.is_tracked(message.sender_id) 
\ No newline at end of file
+        if self._message_filter is not None:
+            return self._message_filter.rejection_reason(message)
+        return None
\ No newline at end of file
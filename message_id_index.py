@@ -0,0 +1,82 @@
+from typing import Iterator
+
+
+class MessageIdBitmap:
+    """
+    Compact set of message IDs from one chat, stored as a bitmap relative to a base ID.
+    
+    Message IDs within a chat increase monotonically, so one bit per ID between the
+    lowest and highest stored ID keeps millions of IDs in a few hundred kilobytes.
+    """
+    
+    # Number of bytes added at once when the bitmap has to grow
+    _GROWTH_BYTES = 4096
+    
+    def __init__(self):
+        """Initialize an empty MessageIdBitmap."""
+        self._base = 0
+        self._bits = bytearray()
+        self._count = 0
+    
+    def add(self, message_id: int) -> None:
+        """
+        Add a message ID to the set.
+        
+        Args:
+            message_id: The message ID to add
+        """
+        if not self._bits:
+            self._base = message_id & ~7
+            self._bits = bytearray(self._GROWTH_BYTES)
+        elif message_id < self._base:
+            # Rebase to make room for an older ID, e.g. during a backfill
+            new_base = max(0, (message_id & ~7) - self._GROWTH_BYTES * 8)
+            self._bits[:0] = bytearray((self._base - new_base) >> 3)
+            self._base = new_base
+        
+        offset = message_id - self._base
+        index = offset >> 3
+        if index >= len(self._bits):
+            self._bits.extend(bytearray(index - len(self._bits) + self._GROWTH_BYTES))
+        
+        mask = 1 << (offset & 7)
+        if not self._bits[index] & mask:
+            self._bits[index] |= mask
+            self._count += 1
+    
+    def __contains__(self, message_id: int) -> bool:
+        """
+        Check if a message ID is in the set.
+        
+        Args:
+            message_id: The message ID to check
+        
+        Returns:
+            True if the ID was added, False otherwise
+        """
+        offset = message_id - self._base
+        if offset < 0 or (offset >> 3) >= len(self._bits):
+            return False
+        return bool(self._bits[offset >> 3] & (1 << (offset & 7)))
+    
+    def __len__(self) -> int:
+        """Return the number of message IDs in the set."""
+        return self._count
+    
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over the message IDs in the set in ascending order."""
+        for index, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield self._base + (index << 3) + bit
+    
+    @property
+    def size_bytes(self) -> int:
+        """
+        Get the memory used by the bitmap itself.
+        
+        Returns:
+            The size of the bitmap in bytes
+        """
+        return len(self._bits)
\ No newline at end of file
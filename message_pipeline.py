@@ -0,0 +1,177 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from telethon.tl.types import Message
+from loguru import logger
+
+from metrics import ERRORS, STAGE_LATENCY
+
+
+class MessagePipeline:
+    """
+    Bounded work queue that processes messages on a pool of workers.
+    
+    Messages from the same sender and messages in the same reply chain are
+    processed in the order they were submitted; unrelated messages run in parallel.
+    """
+    
+    def __init__(self, handler: Callable[[Message], Awaitable[None]], worker_count: int = 4,
+                 queue_size: int = 1000):
+        """
+        Initialize the MessagePipeline.
+        
+        Args:
+            handler: Coroutine function that processes a single message
+            worker_count: Number of workers processing messages concurrently
+            queue_size: Maximum number of queued messages before submit blocks
+        """
+        self._handler = handler
+        self._worker_count = worker_count
+        # Queue of (message, dependencies, done future, ordering keys, enqueue time)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._workers: List[asyncio.Task] = []
+        
+        # Map of ordering keys to the completion future of the last message submitted for them
+        self._tails: Dict[Hashable, asyncio.Future] = {}
+        
+        # Backpressure metrics
+        self._submitted = 0
+        self._processed = 0
+        self._failed = 0
+        self._blocked_submits = 0
+        self._max_queue_depth = 0
+        self._total_queue_wait = 0.0
+        
+        # Enqueue times of the queued messages, oldest first
+        self._enqueue_times: deque = deque()
+    
+    async def start(self) -> None:
+        """Start the worker pool."""
+        for index in range(self._worker_count):
+            self._workers.append(asyncio.create_task(self._worker(index)))
+        logger.info(f"Started message pipeline with {self._worker_count} workers")
+    
+    async def submit(self, message: Message) -> None:
+        """
+        Queue a message for processing, waiting for free space if the queue is full.
+        
+        Args:
+            message: The message to process
+        """
+        # Resolve ordering dependencies synchronously so they follow submission order
+        wait_keys, own_keys = self._ordering_keys(message)
+        dependencies = [self._tails[key] for key in wait_keys if key in self._tails]
+        done = asyncio.get_running_loop().create_future()
+        for key in own_keys:
+            self._tails[key] = done
+        
+        if self._queue.full():
+            self._blocked_submits += 1
+        
+        self._submitted += 1
+        enqueued_at = time.monotonic()
+        await self._queue.put((message, dependencies, done, own_keys, enqueued_at))
+        self._enqueue_times.append(enqueued_at)
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+    
+    async def stop(self, timeout: Optional[float] = 30) -> None:
+        """
+        Wait for queued messages to be processed and stop the worker pool.
+        
+        Args:
+            timeout: Maximum seconds to wait for the queue to drain, or None to wait indefinitely
+        """
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Message pipeline stopped with {self._queue.qsize()} messages still queued")
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info(f"Message pipeline stats: {self.stats}")
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the pipeline backpressure metrics.
+        
+        Returns:
+            Dictionary with queue depth, throughput counters and average queue wait in seconds
+        """
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self._max_queue_depth,
+            'submitted': self._submitted,
+            'processed': self._processed,
+            'failed': self._failed,
+            'blocked_submits': self._blocked_submits,
+            'average_queue_wait': self._total_queue_wait / self._processed if self._processed else 0.0,
+        }
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of messages waiting for a worker."""
+        return self._queue.qsize()
+    
+    @property
+    def oldest_wait(self) -> float:
+        """Seconds the oldest queued message has been waiting for a worker, 0 if none is queued."""
+        return time.monotonic() - self._enqueue_times[0] if self._enqueue_times else 0.0
+    
+    def _ordering_keys(self, message: Message) -> Tuple[List[Hashable], List[Hashable]]:
+        """
+        Get the keys that determine which earlier messages a message must wait for.
+        
+        Args:
+            message: The message to get the keys for
+        
+        Returns:
+            A tuple of the keys to wait on and the keys the message becomes the latest entry for
+        """
+        chat_id = message.chat_id
+        wait_keys: List[Hashable] = [('sender', chat_id, message.sender_id)]
+        own_keys: List[Hashable] = [('sender', chat_id, message.sender_id), ('message', chat_id, message.id)]
+        
+        if message.reply_to is not None:
+            parent_id = message.reply_to.reply_to_msg_id
+            wait_keys.append(('message', chat_id, parent_id))
+            wait_keys.append(('thread', chat_id, parent_id))
+            own_keys.append(('thread', chat_id, parent_id))
+        
+        return wait_keys, own_keys
+    
+    async def _worker(self, index: int) -> None:
+        """
+        Process queued messages until cancelled.
+        
+        Args:
+            index: The number of the worker, used for logging
+        """
+        while True:
+            message, dependencies, done, own_keys, enqueued_at = await self._queue.get()
+            self._enqueue_times.popleft()
+            try:
+                queue_wait = time.monotonic() - enqueued_at
+                self._total_queue_wait += queue_wait
+                STAGE_LATENCY.observe(queue_wait, stage='queue')
+                if dependencies:
+                    await asyncio.gather(*dependencies)
+                
+                await self._handler(message)
+                self._processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed += 1
+                self._processed += 1
+                ERRORS.inc(stage='pipeline', type=type(e).__name__)
+                logger.error(f"Worker {index} failed to process message {message.id}: {e}")
+            finally:
+                done.set_result(None)
+                for key in own_keys:
+                    if self._tails.get(key) is done:
+                        del self._tails[key]
+                self._queue.task_done()
\ No newline at end of file
@@ -1,15 +1,50 @@
-from typing import Optional, Tuple, Any
+import asyncio
+import itertools
+import sys
+from typing import Dict, List, Optional, Tuple, Any
 from telethon import TelegramClient
 from telethon.tl.types import Message, User
 from loguru import logger
 
 from message_storage import MessageStorage
+from client_pool import PRIMARY_ACCOUNT
+from entity_cache import EntityCache
+from send_scheduler import SendScheduler, PRIORITY_HIGH, PRIORITY_NORMAL
+from single_flight import SingleFlight
+from message_cache import RecentMessageCache, MessageBatchFetcher
+from media_cache import MediaCache
+from message_formatter import MESSAGE_LENGTH_LIMIT, MessageFormatter, PrebuiltParseMode
+from message_coalescer import MessageCoalescer
+from content_dedup import ContentClaim, ContentIndex
+from logging_setup import MESSAGE_LOG
+from metrics import (ERRORS, MESSAGES_COALESCED, MESSAGES_DELETED, MESSAGES_EDITED, MESSAGES_FORWARDED,
+                     MESSAGES_SKIPPED, STAGE_LATENCY)
+
+
+# Maximum length of a media caption
+ALBUM_CAPTION_LIMIT = 1024
+
+# Maximum number of message IDs in one ForwardMessages request
+NATIVE_FORWARD_LIMIT = 100
 
 
 class MessageRepository:
     """Repository for handling Telegram message operations."""
     
-    def __init__(self, client: TelegramClient, destination_chat_id: int, source_chat_id: int):
+    def __init__(self, client: TelegramClient, destination_chat_id: int, source_chat_id: int,
+                 message_storage: Optional[MessageStorage] = None,
+                 entity_cache: Optional[EntityCache] = None,
+                 send_scheduler: Optional[SendScheduler] = None,
+                 recent_messages: Optional[RecentMessageCache] = None,
+                 message_fetcher: Optional[MessageBatchFetcher] = None,
+                 media_cache: Optional[MediaCache] = None,
+                 message_formatter: Optional[MessageFormatter] = None,
+                 coalesce_window: float = 0.0,
+                 coalesce_max_messages: int = 10,
+                 album_window: float = 0.5,
+                 native_forward: bool = False,
+                 native_forward_window: float = 0.5,
+                 content_index: Optional[ContentIndex] = None):
         """
         Initialize the MessageRepository.
         
@@ -17,11 +52,64 @@ class MessageRepository:
             client: An authenticated TelegramClient instance
             destination_chat_id: The ID of the chat to forward messages to
             source_chat_id: The ID of the source chat being monitored
+            message_storage: Storage backend for message mappings, in-memory if not provided
+            entity_cache: Cache for user entity lookups, a non-persistent one if not provided
+            send_scheduler: Scheduler all sends go through, a default one if not provided
+            recent_messages: Buffer of recently seen source messages used to resolve reply parents
+            message_fetcher: Batched fetcher for reply parents missing from recent_messages
+            media_cache: Cache of reusable media references shared by all destinations
+            message_formatter: Builds the text and entities of forwarded messages, the default format if not provided
+            coalesce_window: Seconds to collect consecutive text messages of a sender into one send, 0 to disable
+            coalesce_max_messages: Maximum number of messages merged into one send
+            album_window: Seconds to collect the parts of an album before sending it, 0 to send parts separately
+            native_forward: Whether to forward messages as they are instead of sending formatted copies
+            native_forward_window: Seconds to collect messages for one bulk forward
+            content_index: Recently forwarded content shared by all repositories, None to forward repeated content
         """
         self._client = client
         self._destination_chat_id = destination_chat_id
         self._source_chat_id = source_chat_id
-        self._message_storage = MessageStorage()
+        self._message_storage = message_storage if message_storage is not None else MessageStorage()
+        self._entity_cache = entity_cache if entity_cache is not None else EntityCache(client)
+        self._send_scheduler = send_scheduler if send_scheduler is not None else SendScheduler(client)
+        self._recent_messages = recent_messages if recent_messages is not None else RecentMessageCache()
+        self._message_fetcher = message_fetcher if message_fetcher is not None else MessageBatchFetcher(client)
+        self._media_cache = media_cache if media_cache is not None else MediaCache(client)
+        self._message_formatter = message_formatter if message_formatter is not None else MessageFormatter()
+        self._content_index = content_index
+        
+        # Links to source messages only differ by message ID, so build the chat part once
+        # For supergroups/channels, we need to remove the -100 prefix if it exists
+        chat_id_for_link = str(source_chat_id)
+        if chat_id_for_link.startswith('-100'):
+            chat_id_for_link = chat_id_for_link[4:]
+        self._message_link_prefix = f"https://t.me/c/{chat_id_for_link}/"
+        
+        # Forwards in progress, keyed by (source_chat_id, message_id), so concurrent
+        # callers for the same message wait for one send instead of sending again
+        self._in_flight = SingleFlight()
+        
+        # Native forwards keep the original message, so there is nothing to merge or re-upload,
+        # and every message of the source chat joins one batch sent in arrival order
+        self._native_batch = (
+            MessageCoalescer(self._forward_native_batch, window=native_forward_window,
+                             max_messages=NATIVE_FORWARD_LIMIT, max_length=sys.maxsize,
+                             group_key=lambda message: None, sender_key=lambda message: None)
+            if native_forward else None
+        )
+        # A merged send holds the formatted text of every message and a line break after each
+        self._coalescer = (
+            MessageCoalescer(self._forward_group, window=coalesce_window, max_messages=coalesce_max_messages,
+                             max_length=MESSAGE_LENGTH_LIMIT,
+                             measure=lambda message: self._message_formatter.max_length(message) + 1)
+            if coalesce_window > 0 and not native_forward else None
+        )
+        # Parts of an album arrive as separate messages sharing a grouped_id, and an album holds at most 10 items
+        self._album_buffer = (
+            MessageCoalescer(self._forward_album, window=album_window, max_messages=10,
+                             max_length=ALBUM_CAPTION_LIMIT, group_key=lambda message: message.grouped_id)
+            if album_window > 0 and not native_forward else None
+        )
     
     async def get_replied_message(self, message: Message) -> Optional[Message]:
         """
@@ -36,14 +124,21 @@ class MessageRepository:
         if message.reply_to is None:
             return None
         
+        # Serve the parent from recently seen messages if possible
+        replied_message = self._recent_messages.get(message.chat_id, message.reply_to.reply_to_msg_id)
+        if replied_message is not None:
+            return replied_message
+        
         try:
-            # Get the message that this message is replying to
-            replied_message = await self._client.get_messages(
+            # Get the message that this message is replying to, batched with other lookups
+            replied_message = await self._message_fetcher.get_message(
                 message.peer_id,
-                ids=message.reply_to.reply_to_msg_id
+                message.chat_id,
+                message.reply_to.reply_to_msg_id
             )
             return replied_message
         except Exception as e:
+            ERRORS.inc(stage='reply_resolution', type=type(e).__name__)
             logger.error(f"Error retrieving replied message: {e}")
             return None
     
@@ -57,13 +152,7 @@ class MessageRepository:
         Returns:
             A link to the original message
         """
-        # Format the chat ID for the link
-        # For supergroups/channels, we need to remove the -100 prefix if it exists
-        chat_id_for_link = str(self._source_chat_id)
-        if chat_id_for_link.startswith('-100'):
-            chat_id_for_link = chat_id_for_link[4:]
-            
-        return f"https://t.me/c/{chat_id_for_link}/{message_id}"
+        return f"{self._message_link_prefix}{message_id}"
     
     async def get_user_identifier(self, user_id: int) -> str:
         """
@@ -75,32 +164,220 @@ class MessageRepository:
         Returns:
             The username without @ prefix if available, otherwise the user ID as a string
         """
+        with STAGE_LATENCY.time(stage='entity_lookup'):
+            username = await self._entity_cache.get_username(user_id)
+        if username:
+            MESSAGE_LOG.event('user lookups', "Found valid username '{}' for user {}", username, user_id)
+            return f"{username}"
+        
+        # Якщо username порожній або None, використовуємо ID
+        MESSAGE_LOG.event('user lookups', "Username is empty or None for user {}, using ID instead", user_id)
+        return f"{user_id}"
+    
+    async def forward_or_coalesce(self, message: Message) -> Optional[asyncio.Future]:
+        """
+        Forward a message, or buffer it to be sent together with the sender's next messages.
+        
+        Args:
+            message: The message to process
+            
+        Returns:
+            Future resolving to the combined message if the message was buffered, None if it was forwarded already
+        """
+        already_forwarded = self._message_storage.is_message_forwarded(
+            self._source_chat_id, message.id, self._destination_chat_id
+        )
+        
+        fingerprint = (
+            self._content_index.fingerprint(message)
+            if self._content_index is not None and not already_forwarded else None
+        )
+        if fingerprint is None:
+            return await self._forward_or_coalesce(message, already_forwarded)
+        
+        claim, is_new = self._content_index.claim(
+            self._destination_chat_id, fingerprint, self._source_chat_id, message.id
+        )
+        if not is_new:
+            if claim.settled:
+                await self._forward_duplicate(message, claim)
+                return None
+            # The first copy is still buffered or being sent
+            return asyncio.ensure_future(self._forward_duplicate(message, claim))
+        
+        # Later copies of the content wait until this one was sent, or until it failed in any way
+        pending = None
         try:
-            user = await self._client.get_entity(user_id)
-            if user.username and user.username.strip():
-                logger.info(f"Found valid username '{user.username}' for user {user_id}")
-                return f"{user.username}"
-            
-            # Якщо username порожній або None, використовуємо ID
-            logger.info(f"Username is empty or None for user {user_id}, using ID instead")
-            return f"{user_id}"
-        except Exception as e:
-            logger.error(f"Error getting user entity: {e}")
-            return f"{user_id}"
+            pending = await self._forward_or_coalesce(message, already_forwarded)
+            return pending
+        finally:
+            if pending is None:
+                claim.settle()
+            else:
+                pending.add_done_callback(lambda _: claim.settle())
+    
+    async def _forward_or_coalesce(self, message: Message, already_forwarded: bool) -> Optional[asyncio.Future]:
+        """
+        Forward a message or buffer it, after it was checked for repeated content.
+        
+        Args:
+            message: The message to process
+            already_forwarded: Whether the message has a copy in the destination already
+            
+        Returns:
+            Future resolving to the combined message if the message was buffered, None if it was forwarded already
+        """
+        if self._native_batch is not None:
+            if already_forwarded:
+                MESSAGES_SKIPPED.inc(reason='duplicate')
+                return None
+            return self._native_batch.add(message)
+        
+        if self.is_album_member(message) and not already_forwarded:
+            # Texts the sender posted before the album go first
+            if self._coalescer is not None:
+                await self._coalescer.flush_sender(message.sender_id)
+            return self._album_buffer.add(message)
+        
+        if self._coalescer is not None and self._coalescer.can_coalesce(message) and not already_forwarded:
+            if self._album_buffer is not None:
+                await self._album_buffer.flush_sender(message.sender_id)
+            return self._coalescer.add(message)
+        
+        # Send what the sender has buffered first to keep their messages in order
+        await self._flush_sender(message.sender_id)
+        await self.forward_message(message)
+        return None
+    
+    async def _forward_duplicate(self, message: Message, claim: ContentClaim) -> Optional[int]:
+        """
+        Map a message to the copy of the earlier message with the same content instead of sending it.
+        
+        Args:
+            message: The message repeating earlier content
+            claim: The claim of the earlier message
+            
+        Returns:
+            The ID of the destination message the message was mapped to or sent as, None if sending failed
+        """
+        await claim.wait()
+        destination_message_id = self._message_storage.get_destination_message_id(
+            claim.source_chat_id, claim.source_message_id, self._destination_chat_id
+        )
+        if destination_message_id is None:
+            # The earlier message wasn't forwarded, so this one is sent after all
+            new_message = await self.forward_message(message)
+            return new_message.id if new_message is not None else None
+        
+        self._message_storage.add_message_mapping(
+            self._source_chat_id, message.id, self._destination_chat_id, destination_message_id
+        )
+        MESSAGES_SKIPPED.inc(reason='duplicate_content')
+        MESSAGE_LOG.event('repeats mapped', "Message {} repeats message {} of chat {}, mapped to {} in chat {}",
+                          message.id, claim.source_message_id, claim.source_chat_id, destination_message_id,
+                          self._destination_chat_id)
+        return destination_message_id
+    
+    def has_copy(self, message_id: int) -> bool:
+        """
+        Check if a source message has a copy in the destination.
+        
+        Args:
+            message_id: The ID of the source message
+        
+        Returns:
+            True if the message was forwarded or mapped to an existing copy, False otherwise
+        """
+        return self._message_storage.is_message_forwarded(self._source_chat_id, message_id, self._destination_chat_id)
+    
+    def is_album_member(self, message: Message) -> bool:
+        """
+        Check if a message is sent as part of its album rather than on its own.
+        
+        Args:
+            message: The message to check
+            
+        Returns:
+            True if the message belongs to an album and albums are collected, False otherwise
+        """
+        return self._album_buffer is not None and message.grouped_id is not None and message.media is not None
     
-    async def forward_message(self, message: Message) -> Optional[Message]:
+    def needs_reply_parent(self, message: Message) -> bool:
+        """
+        Check if the parent of a reply has to be resolved before the message is sent.
+        
+        Args:
+            message: The message to check
+        
+        Returns:
+            False for native forwards, which keep their own reply header, and for album parts,
+            which are sent with their album, True otherwise
+        """
+        return self._native_batch is None and not self.is_album_member(message)
+    
+    async def flush(self) -> None:
+        """Send all buffered messages and wait until they are sent."""
+        buffers = (('Coalescing', self._coalescer), ('Album', self._album_buffer), ('Native forward', self._native_batch))
+        for name, buffer in buffers:
+            if buffer is not None:
+                await buffer.flush()
+                logger.info(f"{name} stats for {self._source_chat_id} -> {self._destination_chat_id}: {buffer.stats}")
+    
+    async def _flush_sender(self, sender_id: int) -> None:
+        """
+        Send everything a sender has buffered and wait until it is sent.
+        
+        Args:
+            sender_id: The ID of the sender
+        """
+        for buffer in (self._coalescer, self._album_buffer):
+            if buffer is not None:
+                await buffer.flush_sender(sender_id)
+    
+    async def _flush_message(self, message_id: int) -> None:
+        """
+        Make sure a source message isn't waiting in a buffer, sending its group now if needed.
+        
+        Args:
+            message_id: The ID of the source message
+        """
+        for buffer in (self._coalescer, self._album_buffer):
+            if buffer is not None:
+                await buffer.flush_message(message_id)
+    
+    async def forward_message(self, message: Message, priority: int = PRIORITY_NORMAL) -> Optional[Message]:
         """
         Process a message by creating a new formatted message in the destination chat.
         
+        Concurrent calls for the same message share a single forward.
+        
         Args:
             message: The message to process
+            priority: Send priority, reply parents use PRIORITY_HIGH
+            
+        Returns:
+            The new message if successful, None otherwise
+        """
+        return await self._in_flight.run(
+            (self._source_chat_id, message.id),
+            lambda: self._forward_message(message, priority)
+        )
+    
+    async def _forward_message(self, message: Message, priority: int) -> Optional[Message]:
+        """
+        Create a new formatted message in the destination chat unless it was already forwarded.
+        
+        Args:
+            message: The message to process
+            priority: Send priority
             
         Returns:
             The new message if successful, None otherwise
         """
         # Check if this message was already forwarded
-        if self._message_storage.is_message_forwarded(self._source_chat_id, message.id):
-            logger.info(f"Message {message.id} already forwarded, skipping")
+        if self._message_storage.is_message_forwarded(self._source_chat_id, message.id, self._destination_chat_id):
+            MESSAGES_SKIPPED.inc(reason='duplicate')
+            MESSAGE_LOG.event('already forwarded', "Message {} already forwarded, skipping", message.id)
             return None
         
         try:
@@ -110,35 +387,481 @@ class MessageRepository:
             # Get message link
             message_link = self._get_message_link(message.id)
             
-            # Format the message with wrapped link
-            formatted_text = f"#{user_identifier} - {message.text or ''} - [to_chat]({message_link})"
+            # Format the message, keeping the source formatting and linking to the original
+            formatted_text, formatting_entities = self._message_formatter.format(message, user_identifier, message_link)
             
-            logger.info(f"Sending formatted message with user identifier: #{user_identifier}")
+            MESSAGE_LOG.event('sends started', "Sending formatted message with user identifier: #{}", user_identifier)
             
-            # Send new message
-            new_message = await self._client.send_message(
-                self._destination_chat_id,
-                formatted_text,
-                file=message.media if message.media else None,
-                parse_mode='markdown'
-            )
+            # Send new message, reusing media already sent elsewhere
+            with STAGE_LATENCY.time(stage='send'):
+                new_message = await self._media_cache.send(
+                    message,
+                    lambda file: self._send_scheduler.send_message(
+                        self._destination_chat_id,
+                        formatted_text,
+                        file=file,
+                        formatting_entities=formatting_entities,
+                        priority=priority
+                    )
+                )
             
             # Store the mapping
-            self._message_storage.add_message_mapping(
-                self._source_chat_id, 
-                message.id, 
-                self._destination_chat_id, 
-                new_message.id
-            )
+            with STAGE_LATENCY.time(stage='storage_write'):
+                self._message_storage.add_message_mapping(
+                    self._source_chat_id, 
+                    message.id, 
+                    self._destination_chat_id, 
+                    new_message.id,
+                    sender=self._send_scheduler.sender_of(new_message)
+                )
+            MESSAGES_FORWARDED.inc()
             
-            logger.info(f"Sent formatted message for {message.id} to chat {self._destination_chat_id}")
+            MESSAGE_LOG.event('sent', "Sent formatted message for {} to chat {}", message.id, self._destination_chat_id)
             return new_message
             
         except Exception as e:
+            ERRORS.inc(stage='forward', type=type(e).__name__)
             logger.error(f"Error sending formatted message for {message.id}: {e}")
             return None
     
-    async def forward_message_with_reply(self, message: Message, replied_message: Message) -> Tuple[Optional[Message], Optional[Message]]:
+    async def _forward_group(self, messages: List[Message]) -> Optional[Message]:
+        """
+        Send consecutive messages of one sender as a single message linking to each original.
+        
+        Args:
+            messages: The messages to send, in the order they were received
+            
+        Returns:
+            The combined message if successful, None otherwise
+        """
+        messages = [
+            message for message in messages
+            if not self._message_storage.is_message_forwarded(self._source_chat_id, message.id, self._destination_chat_id)
+        ]
+        if not messages:
+            return None
+        if len(messages) == 1:
+            return await self.forward_message(messages[0])
+        
+        try:
+            user_identifier = await self.get_user_identifier(messages[0].sender_id)
+            formatted_text, formatting_entities = self._message_formatter.combine([
+                self._message_formatter.format(message, user_identifier, self._get_message_link(message.id))
+                for message in messages
+            ])
+            
+            with STAGE_LATENCY.time(stage='send'):
+                new_message = await self._send_scheduler.send_message(
+                    self._destination_chat_id,
+                    formatted_text,
+                    formatting_entities=formatting_entities
+                )
+            
+            # Every source message maps to the combined message, so replies to any of them thread to it
+            with STAGE_LATENCY.time(stage='storage_write'):
+                self._message_storage.add_message_mappings(
+                    ((self._source_chat_id, message.id, self._destination_chat_id, new_message.id)
+                     for message in messages),
+                    sender=self._send_scheduler.sender_of(new_message)
+                )
+            MESSAGES_FORWARDED.inc(len(messages))
+            MESSAGES_COALESCED.inc(len(messages))
+            
+            MESSAGE_LOG.event('coalesced sends', "Sent {} coalesced messages from user {} to chat {}",
+                              len(messages), messages[0].sender_id, self._destination_chat_id)
+            return new_message
+            
+        except Exception as e:
+            ERRORS.inc(stage='forward', type=type(e).__name__)
+            logger.error(f"Error sending {len(messages)} coalesced messages: {e}")
+            return None
+    
+    async def _forward_album(self, messages: List[Message]) -> Optional[Message]:
+        """
+        Send the parts of an album as one album with a single caption.
+        
+        Args:
+            messages: The parts of the album, in the order they were received
+            
+        Returns:
+            The first message of the sent album if successful, None otherwise
+        """
+        messages = [
+            message for message in messages
+            if not self._message_storage.is_message_forwarded(self._source_chat_id, message.id, self._destination_chat_id)
+        ]
+        if not messages:
+            return None
+        if len(messages) == 1:
+            return await self.forward_message(messages[0])
+        
+        try:
+            # Thread the album to its parent if the parent was forwarded
+            reply_to = None
+            if messages[0].reply_to is not None:
+                parent_id = messages[0].reply_to.reply_to_msg_id
+                if self._coalescer is not None:
+                    await self._coalescer.flush_message(parent_id)
+                reply_to = self._message_storage.get_destination_message_id(
+                    self._source_chat_id, parent_id, self._destination_chat_id
+                )
+            
+            caption, caption_entities = await self._format_album_caption(messages)
+            
+            with STAGE_LATENCY.time(stage='send'):
+                sent_messages = await self._media_cache.send_album(
+                    messages,
+                    lambda files: self._send_scheduler.submit(
+                        self._destination_chat_id,
+                        lambda client: client.send_file(
+                            self._destination_chat_id,
+                            files,
+                            caption=caption,
+                            parse_mode=PrebuiltParseMode(caption_entities),
+                            reply_to=reply_to
+                        ),
+                        pinned=True
+                    )
+                )
+            if not sent_messages:
+                return None
+            
+            # Map every part to its copy, so replies to any part thread correctly
+            with STAGE_LATENCY.time(stage='storage_write'):
+                self._message_storage.add_message_mappings(
+                    ((self._source_chat_id, message.id, self._destination_chat_id,
+                      sent_messages[index].id if index < len(sent_messages) else sent_messages[0].id)
+                     for index, message in enumerate(messages)),
+                    sender=self._send_scheduler.sender_of(sent_messages[0])
+                )
+            MESSAGES_FORWARDED.inc(len(messages))
+            
+            MESSAGE_LOG.event('albums sent', "Sent album of {} messages from user {} to chat {}",
+                              len(messages), messages[0].sender_id, self._destination_chat_id)
+            return sent_messages[0]
+            
+        except Exception as e:
+            ERRORS.inc(stage='forward', type=type(e).__name__)
+            logger.error(f"Error sending album of {len(messages)} messages: {e}")
+            return None
+    
+    async def _format_album_caption(self, messages: List[Message]) -> Tuple[str, List[Any]]:
+        """
+        Format the caption of an album, which is shown on its first part only.
+        
+        Args:
+            messages: The parts of the album, in order
+            
+        Returns:
+            The text and entities of the caption
+        """
+        # Albums usually carry their caption on one part only
+        caption_message = next((message for message in messages if message.message), messages[0])
+        user_identifier = await self.get_user_identifier(messages[0].sender_id)
+        return self._message_formatter.format(
+            caption_message, user_identifier, self._get_message_link(messages[0].id)
+        )
+    
+    async def _get_album_parts(self, message: Message) -> List[Message]:
+        """
+        Get the forwarded parts of the album a message belongs to.
+        
+        Parts of an album are posted together, so they have neighbouring IDs.
+        
+        Args:
+            message: A part of the album, in its current state
+            
+        Returns:
+            The forwarded parts of the album in order, including the message itself
+        """
+        neighbour_ids = [
+            message_id for message_id in range(message.id - 9, message.id + 10)
+            if message_id != message.id
+            and self._message_storage.is_message_forwarded(self._source_chat_id, message_id, self._destination_chat_id)
+        ]
+        # Looked up together, so the ones not seen recently are fetched with one request
+        neighbours = await asyncio.gather(*(self._get_source_message(message_id) for message_id in neighbour_ids))
+        parts = [part for part in neighbours if part is not None and part.grouped_id == message.grouped_id]
+        parts.append(message)
+        return sorted(parts, key=lambda part: part.id)
+    
+    async def _forward_native_batch(self, messages: List[Message]) -> Optional[List[Message]]:
+        """
+        Forward a batch of messages with as few ForwardMessages requests as possible.
+        
+        Messages from chats that forbid forwarding are sent as formatted copies instead,
+        keeping their place in the batch.
+        
+        Args:
+            messages: The messages to forward, in the order they were received
+            
+        Returns:
+            The forwarded messages, None if nothing was forwarded
+        """
+        messages = [
+            message for message in messages
+            if not self._message_storage.is_message_forwarded(self._source_chat_id, message.id, self._destination_chat_id)
+        ]
+        
+        forwarded: List[Message] = []
+        for restricted, run in itertools.groupby(messages, key=lambda message: bool(getattr(message, 'noforwards', False))):
+            if restricted:
+                for message in run:
+                    new_message = await self.forward_message(message)
+                    if new_message is not None:
+                        forwarded.append(new_message)
+            else:
+                forwarded.extend(await self._forward_natively(list(run)))
+        return forwarded or None
+    
+    async def _forward_natively(self, messages: List[Message]) -> List[Message]:
+        """
+        Forward messages of the source chat in one ForwardMessages request and record them in bulk.
+        
+        Args:
+            messages: At most NATIVE_FORWARD_LIMIT messages, in order
+            
+        Returns:
+            The forwarded messages, empty if the request failed
+        """
+        message_ids = [message.id for message in messages]
+        try:
+            with STAGE_LATENCY.time(stage='send'):
+                # Only the listening account is known to see the source chat
+                new_messages = await self._send_scheduler.submit(
+                    self._destination_chat_id,
+                    lambda client: client.forward_messages(self._destination_chat_id, message_ids, self._source_chat_id),
+                    pinned=True
+                )
+            
+            # Messages deleted before the forward come back as None
+            mapped = [
+                (message_id, new_message) for message_id, new_message in zip(message_ids, new_messages)
+                if new_message is not None
+            ]
+            with STAGE_LATENCY.time(stage='storage_write'):
+                self._message_storage.add_message_mappings(
+                    ((self._source_chat_id, message_id, self._destination_chat_id, new_message.id)
+                     for message_id, new_message in mapped),
+                    sender=self._send_scheduler.sender_of(mapped[0][1]) if mapped else None
+                )
+            MESSAGES_FORWARDED.inc(len(mapped))
+            
+            MESSAGE_LOG.event('native forwards', "Forwarded {} of {} messages from chat {} to chat {}",
+                              len(mapped), len(message_ids), self._source_chat_id, self._destination_chat_id)
+            return [new_message for _, new_message in mapped]
+            
+        except Exception as e:
+            ERRORS.inc(stage='forward', type=type(e).__name__)
+            logger.error(f"Error forwarding {len(message_ids)} messages from chat {self._source_chat_id}: {e}")
+            return []
+    
+    async def edit_forwarded(self, message: Message) -> bool:
+        """
+        Update the forwarded copy of an edited source message.
+        
+        Only the text is updated. A copy merged from several messages is rebuilt from all of them,
+        and an edited album part updates the caption on the first part of the album.
+        
+        Args:
+            message: The source message in its edited state
+            
+        Returns:
+            True if the copy was updated, False if there was nothing to update
+        """
+        if self._native_batch is not None:
+            # Forwarded messages can't be edited by anyone but their author
+            return False
+        
+        # The message may still be waiting to be merged
+        await self._flush_message(message.id)
+        destination_message_id = self._message_storage.get_destination_message_id(
+            self._source_chat_id, message.id, self._destination_chat_id
+        )
+        if destination_message_id is None:
+            return False
+        
+        try:
+            album = await self._get_album_parts(message) if self.is_album_member(message) else []
+            if len(album) > 1:
+                # Only the first part of a sent album carries the caption
+                destination_message_id = self._message_storage.get_destination_message_id(
+                    self._source_chat_id, album[0].id, self._destination_chat_id
+                )
+                formatted = await self._format_album_caption(album)
+            else:
+                formatted = await self._format_copy(destination_message_id, message)
+            if formatted is None:
+                return False
+            formatted_text, formatting_entities = formatted
+            
+            with STAGE_LATENCY.time(stage='send'):
+                await self._send_scheduler.submit(
+                    self._destination_chat_id,
+                    lambda client: client.edit_message(
+                        self._destination_chat_id,
+                        destination_message_id,
+                        formatted_text,
+                        formatting_entities=formatting_entities
+                    ),
+                    sender=self._author_of(destination_message_id)
+                )
+            MESSAGES_EDITED.inc()
+            
+            MESSAGE_LOG.event('edits', "Edited message {} in chat {} after message {} was edited",
+                              destination_message_id, self._destination_chat_id, message.id)
+            return True
+            
+        except Exception as e:
+            ERRORS.inc(stage='edit', type=type(e).__name__)
+            logger.error(f"Error editing the copy of message {message.id}: {e}")
+            return False
+    
+    async def delete_forwarded(self, message_ids: List[int]) -> int:
+        """
+        Delete the forwarded copies of deleted source messages with one request per account that sent them.
+        
+        A copy merged from several messages is rebuilt from the remaining ones instead.
+        
+        Args:
+            message_ids: IDs of the deleted source messages
+            
+        Returns:
+            Number of deleted source messages that had a copy in the destination
+        """
+        # Deleted source message IDs by the copy they are part of, and the authors of the copies
+        copies: Dict[int, List[int]] = {}
+        authors: Dict[int, str] = {}
+        for message_id in message_ids:
+            destination_message_id = self._message_storage.get_destination_message_id(
+                self._source_chat_id, message_id, self._destination_chat_id
+            )
+            if destination_message_id is None:
+                continue
+            if destination_message_id not in authors:
+                authors[destination_message_id] = self._author_of(destination_message_id)
+            self._message_storage.remove_message_mapping(self._source_chat_id, message_id, self._destination_chat_id)
+            copies.setdefault(destination_message_id, []).append(message_id)
+        if not copies:
+            return 0
+        
+        # Copies to delete by the account that sent them
+        stale: Dict[str, List[int]] = {}
+        for destination_message_id in copies:
+            remaining = self._message_storage.get_source_message_ids(self._destination_chat_id, destination_message_id)
+            if not remaining:
+                stale.setdefault(authors[destination_message_id], []).append(destination_message_id)
+                continue
+            if all(source_chat_id != self._source_chat_id for source_chat_id, _ in remaining):
+                # The same content posted in another chat still maps to the copy
+                continue
+            
+            # Other messages merged into the copy still exist
+            try:
+                formatted = await self._format_copy(destination_message_id)
+                if formatted is None:
+                    stale.setdefault(authors[destination_message_id], []).append(destination_message_id)
+                    continue
+                formatted_text, formatting_entities = formatted
+                await self._send_scheduler.submit(
+                    self._destination_chat_id,
+                    lambda client: client.edit_message(
+                        self._destination_chat_id,
+                        destination_message_id,
+                        formatted_text,
+                        formatting_entities=formatting_entities
+                    ),
+                    sender=authors[destination_message_id]
+                )
+            except Exception as e:
+                ERRORS.inc(stage='delete', type=type(e).__name__)
+                logger.error(f"Error rebuilding message {destination_message_id} in chat "
+                             f"{self._destination_chat_id}: {e}")
+        
+        deleted = sum(len(source_ids) for source_ids in copies.values())
+        for sender, stale_ids in stale.items():
+            try:
+                with STAGE_LATENCY.time(stage='send'):
+                    await self._send_scheduler.submit(
+                        self._destination_chat_id,
+                        lambda client, stale_ids=stale_ids: client.delete_messages(self._destination_chat_id, stale_ids),
+                        sender=sender
+                    )
+            except Exception as e:
+                ERRORS.inc(stage='delete', type=type(e).__name__)
+                logger.error(f"Error deleting {len(stale_ids)} messages in chat {self._destination_chat_id}: {e}")
+        MESSAGES_DELETED.inc(deleted)
+        MESSAGE_LOG.event('deletions', "Propagated deletion of {} messages to chat {}",
+                          deleted, self._destination_chat_id)
+        return deleted
+    
+    def _author_of(self, destination_message_id: int) -> str:
+        """
+        Get the account that sent a copy, the only one that may edit it.
+        
+        Args:
+            destination_message_id: The ID of the copy in the destination chat
+            
+        Returns:
+            The name of the account, the listening account for copies stored without one
+        """
+        sender = self._message_storage.get_sender(self._destination_chat_id, destination_message_id)
+        return sender if sender is not None else PRIMARY_ACCOUNT
+    
+    async def _format_copy(self, destination_message_id: int,
+                           edited: Optional[Message] = None) -> Optional[Tuple[str, List[Any]]]:
+        """
+        Format the text of a forwarded copy from the current state of its source messages.
+        
+        Args:
+            destination_message_id: The ID of the copy in the destination chat
+            edited: A source message known to be newer than any cached version
+            
+        Returns:
+            The text and entities of the copy, None if none of its source messages exist anymore
+        """
+        source_ids = [
+            source_message_id for source_chat_id, source_message_id
+            in self._message_storage.get_source_message_ids(self._destination_chat_id, destination_message_id)
+            if source_chat_id == self._source_chat_id
+        ]
+        
+        messages = []
+        for source_message_id in source_ids:
+            if edited is not None and edited.id == source_message_id:
+                messages.append(edited)
+                continue
+            source_message = await self._get_source_message(source_message_id)
+            if source_message is not None:
+                messages.append(source_message)
+        if not messages:
+            return None
+        
+        user_identifier = await self.get_user_identifier(messages[0].sender_id)
+        parts = [
+            self._message_formatter.format(message, user_identifier, self._get_message_link(message.id))
+            for message in messages
+        ]
+        return parts[0] if len(parts) == 1 else self._message_formatter.combine(parts)
+    
+    async def _get_source_message(self, message_id: int) -> Optional[Message]:
+        """
+        Get a message of the source chat, from recently seen messages if possible.
+        
+        Args:
+            message_id: The ID of the message
+            
+        Returns:
+            The message if it exists, None otherwise
+        """
+        source_message = self._recent_messages.get(self._source_chat_id, message_id)
+        if source_message is None:
+            source_message = await self._message_fetcher.get_message(
+                self._source_chat_id, self._source_chat_id, message_id
+            )
+        return source_message
+    
+    async def forward_message_with_reply(self, message: Message, replied_message: Message) -> Tuple[Optional[int], Optional[Message]]:
         """
         Process a message that is a reply to another message.
         
@@ -147,18 +870,23 @@ class MessageRepository:
             replied_message: The message that the original message is replying to
             
         Returns:
-            A tuple containing the processed replied message and the processed original message
+            A tuple containing the ID of the processed replied message in the destination chat and the processed original message
         """
         try:
+            # The parent or earlier messages of the sender may still be waiting to be merged
+            await self._flush_message(replied_message.id)
+            await self._flush_sender(message.sender_id)
+            
             # Check if the replied message was already forwarded
             dest_replied_id = self._message_storage.get_destination_message_id(
                 self._source_chat_id, 
-                replied_message.id
+                replied_message.id,
+                self._destination_chat_id
             )
             
             # If not, send the replied message first
             if dest_replied_id is None:
-                forwarded_replied_message = await self.forward_message(replied_message)
+                forwarded_replied_message = await self.forward_message(replied_message, PRIORITY_HIGH)
                 if forwarded_replied_message is None:
                     # If we couldn't forward the replied message, just forward the original message
                     forwarded_message = await self.forward_message(message)
@@ -166,39 +894,80 @@ class MessageRepository:
                     
                 dest_replied_id = forwarded_replied_message.id
             
+            # Send as a reply, sharing the send with any concurrent forward of the same message
+            new_message = await self._in_flight.run(
+                (self._source_chat_id, message.id),
+                lambda: self._forward_reply(message, dest_replied_id)
+            )
+            if new_message is None:
+                return None, None
+            
+            # Return the replied message ID and the new message
+            return dest_replied_id, new_message
+            
+        except Exception as e:
+            ERRORS.inc(stage='forward', type=type(e).__name__)
+            logger.error(f"Error sending formatted reply for message {message.id}: {e}")
+            return None, None
+    
+    async def _forward_reply(self, message: Message, dest_replied_id: int) -> Optional[Message]:
+        """
+        Create a new formatted message replying to an already forwarded message, unless it was already forwarded.
+        
+        Args:
+            message: The message to process
+            dest_replied_id: The ID of the forwarded replied message in the destination chat
+            
+        Returns:
+            The new message if successful, None otherwise
+        """
+        # Check if this message was already forwarded
+        if self._message_storage.is_message_forwarded(self._source_chat_id, message.id, self._destination_chat_id):
+            MESSAGES_SKIPPED.inc(reason='duplicate')
+            MESSAGE_LOG.event('already forwarded', "Message {} already forwarded, skipping", message.id)
+            return None
+        
+        try:
             # Get user identifier (username or ID)
             user_identifier = await self.get_user_identifier(message.sender_id)
             
             # Get message link
             message_link = self._get_message_link(message.id)
             
-            # Format the message with wrapped link
-            formatted_text = f"#{user_identifier} - {message.text or ''} - [to_chat]({message_link})"
+            # Format the message, keeping the source formatting and linking to the original
+            formatted_text, formatting_entities = self._message_formatter.format(message, user_identifier, message_link)
             
-            logger.info(f"Sending formatted reply with user identifier: #{user_identifier}")
+            MESSAGE_LOG.event('sends started', "Sending formatted reply with user identifier: #{}", user_identifier)
             
-            # Send as a reply to the forwarded replied message
-            new_message = await self._client.send_message(
-                self._destination_chat_id,
-                formatted_text,
-                file=message.media if message.media else None,
-                reply_to=dest_replied_id,
-                parse_mode='markdown'
-            )
+            # Send as a reply to the forwarded replied message, reusing media already sent elsewhere
+            with STAGE_LATENCY.time(stage='send'):
+                new_message = await self._media_cache.send(
+                    message,
+                    lambda file: self._send_scheduler.send_message(
+                        self._destination_chat_id,
+                        formatted_text,
+                        file=file,
+                        reply_to=dest_replied_id,
+                        formatting_entities=formatting_entities
+                    )
+                )
             
             # Store the mapping
-            self._message_storage.add_message_mapping(
-                self._source_chat_id, 
-                message.id, 
-                self._destination_chat_id, 
-                new_message.id
-            )
+            with STAGE_LATENCY.time(stage='storage_write'):
+                self._message_storage.add_message_mapping(
+                    self._source_chat_id, 
+                    message.id, 
+                    self._destination_chat_id, 
+                    new_message.id,
+                    sender=self._send_scheduler.sender_of(new_message)
+                )
+            MESSAGES_FORWARDED.inc()
             
-            logger.info(f"Sent formatted reply for message {message.id} to chat {self._destination_chat_id}")
-            
-            # Return the replied message ID and the new message
-            return await self._client.get_messages(self._destination_chat_id, ids=dest_replied_id), new_message
+            MESSAGE_LOG.event('replies sent', "Sent formatted reply for message {} to chat {}",
+                              message.id, self._destination_chat_id)
+            return new_message
             
         except Exception as e:
+            ERRORS.inc(stage='forward', type=type(e).__name__)
             logger.error(f"Error sending formatted reply for message {message.id}: {e}")
-            return None, None 
\ No newline at end of file
+            return None
\ No newline at end of file
@@ -1,18 +1,46 @@
-from typing import Dict, Tuple, Optional
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple, Optional
 from loguru import logger
 
+from message_id_index import MessageIdBitmap
+
 
 class MessageStorage:
     """Storage for tracking forwarded messages to avoid duplicates."""
     
-    def __init__(self):
-        """Initialize the message storage."""
-        # Map of source message IDs to destination message IDs
-        # {(source_chat_id, source_message_id): (destination_chat_id, destination_message_id)}
-        self._message_map: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    def __init__(self, mapping_horizon: Optional[int] = None):
+        """
+        Initialize the message storage.
+        
+        Args:
+            mapping_horizon: Number of message IDs behind the newest one in a source chat for which
+                the destination mapping is kept, or None to keep every mapping
+        """
+        self._mapping_horizon = mapping_horizon
+        
+        # Map of source message IDs to destination message IDs, one per destination chat,
+        # grouped by source chat in insertion order so the oldest mappings can be evicted first
+        # {source_chat_id: {(source_message_id, destination_chat_id): destination_message_id}}
+        self._message_map: Dict[int, "OrderedDict[Tuple[int, int], int]"] = {}
+        
+        # Forwarded source message IDs per source and destination chat, kept after the mappings are evicted
+        # {source_chat_id: {destination_chat_id: MessageIdBitmap}}
+        self._forwarded: Dict[int, Dict[int, MessageIdBitmap]] = {}
+        
+        # Newest source message ID seen per source chat
+        self._newest_message_ids: Dict[int, int] = {}
+        
+        # Reverse index of the mappings, several source messages share one destination message when coalesced
+        # {(destination_chat_id, destination_message_id): [(source_chat_id, source_message_id)]}
+        self._sources: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        
+        # Account that sent each destination message, which alone may edit it
+        # {(destination_chat_id, destination_message_id): account_name}
+        self._senders: Dict[Tuple[int, int], str] = {}
     
     def add_message_mapping(self, source_chat_id: int, source_message_id: int, 
-                           destination_chat_id: int, destination_message_id: int) -> None:
+                           destination_chat_id: int, destination_message_id: int,
+                           sender: Optional[str] = None) -> None:
         """
         Add a mapping between a source message and its forwarded destination message.
         
@@ -21,38 +49,198 @@ class MessageStorage:
             source_message_id: The ID of the source message
             destination_chat_id: The ID of the destination chat
             destination_message_id: The ID of the destination message
+            sender: Name of the account that sent the destination message, None to keep the known one
         """
         key = (source_chat_id, source_message_id)
         value = (destination_chat_id, destination_message_id)
-        self._message_map[key] = value
-        logger.debug(f"Added message mapping: {key} -> {value}")
+        chat_map = self._message_map.setdefault(source_chat_id, OrderedDict())
+        previous = chat_map.get((source_message_id, destination_chat_id))
+        if previous is not None:
+            self._remove_source(destination_chat_id, previous, key)
+        chat_map[(source_message_id, destination_chat_id)] = destination_message_id
+        self._sources.setdefault((destination_chat_id, destination_message_id), []).append(key)
+        if sender is not None:
+            self._senders[(destination_chat_id, destination_message_id)] = sender
+        self._mark_forwarded(source_chat_id, source_message_id, destination_chat_id)
+        
+        if self._mapping_horizon is not None:
+            self._evict_old_mappings(source_chat_id, source_message_id, chat_map)
+        
+        logger.debug("Added message mapping: {} -> {}", key, value)
+    
+    def add_message_mappings(self, mappings: Iterable[Tuple[int, int, int, int]],
+                             sender: Optional[str] = None) -> None:
+        """
+        Add many mappings at once, such as the messages of one bulk forward.
+        
+        Args:
+            mappings: (source_chat_id, source_message_id, destination_chat_id, destination_message_id) tuples
+            sender: Name of the account that sent the destination messages
+        """
+        for mapping in mappings:
+            self.add_message_mapping(*mapping, sender=sender)
     
-    def get_destination_message_id(self, source_chat_id: int, source_message_id: int) -> Optional[int]:
+    def get_destination_message_id(self, source_chat_id: int, source_message_id: int,
+                                   destination_chat_id: Optional[int] = None) -> Optional[int]:
         """
         Get the destination message ID for a given source message.
         
         Args:
             source_chat_id: The ID of the source chat
             source_message_id: The ID of the source message
+            destination_chat_id: The ID of the destination chat, or None for any destination
             
         Returns:
             The ID of the destination message if it exists, None otherwise
         """
-        key = (source_chat_id, source_message_id)
-        if key in self._message_map:
-            return self._message_map[key][1]
+        chat_map = self._message_map.get(source_chat_id)
+        if not chat_map:
+            return None
+        if destination_chat_id is not None:
+            return chat_map.get((source_message_id, destination_chat_id))
+        
+        for known_destination_chat_id in self._forwarded.get(source_chat_id, ()):
+            destination_message_id = chat_map.get((source_message_id, known_destination_chat_id))
+            if destination_message_id is not None:
+                return destination_message_id
         return None
     
-    def is_message_forwarded(self, source_chat_id: int, source_message_id: int) -> bool:
+    def get_source_message_ids(self, destination_chat_id: int, destination_message_id: int) -> List[Tuple[int, int]]:
+        """
+        Get the source messages a destination message was created from.
+        
+        Args:
+            destination_chat_id: The ID of the destination chat
+            destination_message_id: The ID of the destination message
+            
+        Returns:
+            (source_chat_id, source_message_id) pairs in the order they were added, empty if unknown
+        """
+        return list(self._sources.get((destination_chat_id, destination_message_id), ()))
+    
+    def get_sender(self, destination_chat_id: int, destination_message_id: int) -> Optional[str]:
+        """
+        Get the account that sent a destination message.
+        
+        Args:
+            destination_chat_id: The ID of the destination chat
+            destination_message_id: The ID of the destination message
+            
+        Returns:
+            The name of the account, None if it wasn't recorded
+        """
+        return self._senders.get((destination_chat_id, destination_message_id))
+    
+    def remove_message_mapping(self, source_chat_id: int, source_message_id: int, destination_chat_id: int) -> None:
+        """
+        Forget where a source message was forwarded to, e.g. after it was deleted.
+        
+        The message is still recognised as forwarded, so it is never sent again.
+        
+        Args:
+            source_chat_id: The ID of the source chat
+            source_message_id: The ID of the source message
+            destination_chat_id: The ID of the destination chat
+        """
+        chat_map = self._message_map.get(source_chat_id)
+        if not chat_map:
+            return
+        destination_message_id = chat_map.pop((source_message_id, destination_chat_id), None)
+        if destination_message_id is not None:
+            self._remove_source(destination_chat_id, destination_message_id, (source_chat_id, source_message_id))
+    
+    def is_message_forwarded(self, source_chat_id: int, source_message_id: int,
+                             destination_chat_id: Optional[int] = None) -> bool:
         """
         Check if a message has already been forwarded.
         
         Args:
             source_chat_id: The ID of the source chat
             source_message_id: The ID of the source message
+            destination_chat_id: The ID of the destination chat, or None for any destination
             
         Returns:
             True if the message has already been forwarded, False otherwise
         """
-        key = (source_chat_id, source_message_id)
-        return key in self._message_map 
\ No newline at end of file
+        bitmaps = self._forwarded.get(source_chat_id)
+        if not bitmaps:
+            return False
+        if destination_chat_id is None:
+            return any(source_message_id in bitmap for bitmap in bitmaps.values())
+        bitmap = bitmaps.get(destination_chat_id)
+        return bitmap is not None and source_message_id in bitmap
+    
+    @property
+    def persistent(self) -> bool:
+        """
+        Check if the mappings survive a restart.
+        
+        Returns:
+            False for the in-memory storage
+        """
+        return False
+    
+    def flush(self) -> None:
+        """Make all added mappings durable. The in-memory storage has nothing to write."""
+        pass
+    
+    def close(self) -> None:
+        """Release any resources held by the storage. The in-memory storage holds none."""
+        pass
+    
+    def _mark_forwarded(self, source_chat_id: int, source_message_id: int, destination_chat_id: int) -> None:
+        """
+        Record a source message as forwarded to a destination chat in the bitmaps.
+        
+        Args:
+            source_chat_id: The ID of the source chat
+            source_message_id: The ID of the source message
+            destination_chat_id: The ID of the destination chat
+        """
+        bitmaps = self._forwarded.setdefault(source_chat_id, {})
+        bitmap = bitmaps.get(destination_chat_id)
+        if bitmap is None:
+            bitmap = bitmaps[destination_chat_id] = MessageIdBitmap()
+        bitmap.add(source_message_id)
+    
+    def _evict_old_mappings(self, source_chat_id: int, source_message_id: int,
+                            chat_map: "OrderedDict[Tuple[int, int], int]") -> None:
+        """
+        Drop the mappings of a source chat that fell behind the mapping horizon.
+        
+        The forwarded bitmaps are kept, so evicted messages are still recognised as duplicates.
+        
+        Args:
+            source_chat_id: The ID of the source chat
+            source_message_id: The ID of the source message just added
+            chat_map: The mappings of the source chat
+        """
+        newest = max(self._newest_message_ids.get(source_chat_id, source_message_id), source_message_id)
+        self._newest_message_ids[source_chat_id] = newest
+        
+        oldest_kept = newest - self._mapping_horizon
+        while chat_map:
+            oldest_key = next(iter(chat_map))
+            if oldest_key[0] >= oldest_kept:
+                break
+            destination_message_id = chat_map.pop(oldest_key)
+            self._remove_source(oldest_key[1], destination_message_id, (source_chat_id, oldest_key[0]))
+    
+    def _remove_source(self, destination_chat_id: int, destination_message_id: int, source: Tuple[int, int]) -> None:
+        """
+        Drop a source message from the reverse index of a destination message.
+        
+        Args:
+            destination_chat_id: The ID of the destination chat
+            destination_message_id: The ID of the destination message
+            source: The (source_chat_id, source_message_id) pair to drop
+        """
+        key = (destination_chat_id, destination_message_id)
+        sources = self._sources.get(key)
+        if sources is None:
+            return
+        if source in sources:
+            sources.remove(source)
+        if not sources:
+            del self._sources[key]
+            self._senders.pop(key, None) 
\ No newline at end of file
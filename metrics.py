@@ -0,0 +1,372 @@
+import asyncio
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from loguru import logger
+
+
+# Latency buckets in seconds, from cache hits up to sends held back by FloodWaits
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """
+    Format label names and values in the Prometheus text format.
+    
+    Args:
+        names: The label names
+        values: The label values, in the same order
+        extra: An already formatted label to append, e.g. le="0.5"
+    
+    Returns:
+        The formatted labels including braces, or an empty string if there are none
+    """
+    parts = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, keeping integers without a fraction."""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        """
+        Initialize the Counter.
+        
+        Args:
+            name: The metric name
+            documentation: Help text of the metric
+            label_names: Names of the labels the count is split by
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        if not self.label_names:
+            self._values[()] = 0
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increase the count.
+        
+        Args:
+            amount: Amount to add
+            labels: Values of the metric's labels
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: str) -> float:
+        """
+        Get the current count.
+        
+        Args:
+            labels: Values of the metric's labels
+        
+        Returns:
+            The count, 0 if nothing was counted for these labels
+        """
+        return self._values.get(tuple(str(labels[name]) for name in self.label_names), 0)
+    
+    def render(self) -> List[str]:
+        """Render the counter in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, optionally split by labels."""
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Initialize the Histogram.
+        
+        Args:
+            name: The metric name
+            documentation: Help text of the metric
+            label_names: Names of the labels the distribution is split by
+            buckets: Upper bounds of the buckets in increasing order
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._buckets = tuple(buckets)
+        # {label values: [count per bucket (last one is +Inf), sum, count]}
+        self._values: Dict[Tuple[str, ...], List] = {}
+    
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record a value.
+        
+        Args:
+            value: The observed value
+            labels: Values of the metric's labels
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self._buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self._buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+    
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observe the time spent in a with block, including time spent awaiting.
+        
+        Args:
+            labels: Values of the metric's labels
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+    
+    def count(self, **labels: str) -> int:
+        """
+        Get the number of observations.
+        
+        Args:
+            labels: Values of the metric's labels
+        
+        Returns:
+            The number of observed values
+        """
+        entry = self._values.get(tuple(str(labels[name]) for name in self.label_names))
+        return entry[2] if entry is not None else 0
+    
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """
+        Get the number and sum of observations for every label combination.
+        
+        Returns:
+            Dictionary of label values to (count, sum)
+        """
+        return {key: (count, total) for key, (_, total, count) in self._values.items()}
+    
+    def render(self) -> List[str]:
+        """Render the histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (bucket_counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                labels = _format_labels(self.label_names, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback whenever the metrics are collected."""
+    
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        """
+        Initialize the Gauge.
+        
+        Args:
+            name: The metric name
+            documentation: Help text of the metric
+            callback: Function returning the current value
+        """
+        self.name = name
+        self.documentation = documentation
+        self._callback = callback
+    
+    def render(self) -> List[str]:
+        """Render the gauge in the Prometheus text format."""
+        try:
+            value = float(self._callback())
+        except Exception as e:
+            logger.debug(f"Error reading gauge {self.name}: {e}")
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+    
+    def __init__(self):
+        """Initialize the MetricsRegistry."""
+        self._metrics: Dict[str, object] = {}
+    
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        """
+        Create and register a counter.
+        
+        Args:
+            name: The metric name
+            documentation: Help text of the metric
+            label_names: Names of the labels the count is split by
+        
+        Returns:
+            The counter
+        """
+        return self._register(Counter(name, documentation, label_names))
+    
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Create and register a histogram.
+        
+        Args:
+            name: The metric name
+            documentation: Help text of the metric
+            label_names: Names of the labels the distribution is split by
+            buckets: Upper bounds of the buckets in increasing order
+        
+        Returns:
+            The histogram
+        """
+        return self._register(Histogram(name, documentation, label_names, buckets))
+    
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        """
+        Create and register a gauge, replacing an earlier gauge of the same name.
+        
+        Args:
+            name: The metric name
+            documentation: Help text of the metric
+            callback: Function returning the current value
+        
+        Returns:
+            The gauge
+        """
+        gauge = Gauge(name, documentation, callback)
+        self._metrics[name] = gauge
+        return gauge
+    
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text format.
+        
+        Returns:
+            The exposition text
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+    
+    def _register(self, metric):
+        """Register a metric, failing if the name is taken."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+class MetricsServer:
+    """Minimal HTTP server exposing a registry in the Prometheus text format on /metrics."""
+    
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = '127.0.0.1'):
+        """
+        Initialize the MetricsServer.
+        
+        Args:
+            registry: The metrics to expose
+            port: Port to listen on
+            host: Address to listen on
+        """
+        self._registry = registry
+        self._port = port
+        self._host = host
+        self._server: Optional[asyncio.AbstractServer] = None
+    
+    async def start(self) -> None:
+        """Start listening."""
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        logger.info(f"Serving metrics on http://{self._host}:{self._port}/metrics")
+    
+    async def stop(self) -> None:
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer a single HTTP request.
+        
+        Args:
+            reader: Stream of the request
+            writer: Stream of the response
+        """
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Skip the request headers
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/metrics', '/'):
+                status, content_type, body = '200 OK', 'text/plain; version=0.0.4; charset=utf-8', self._registry.render()
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain; charset=utf-8', 'Not found\n'
+            
+            payload = body.encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1') + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Error serving metrics request: {e}")
+        finally:
+            writer.close()
+
+
+# Metrics of the forwarding path, shared by all components
+REGISTRY = MetricsRegistry()
+
+EVENTS_RECEIVED = REGISTRY.counter(
+    'forwarder_events_received_total', 'New message events received from source chats')
+MESSAGES_FORWARDED = REGISTRY.counter(
+    'forwarder_messages_forwarded_total', 'Messages sent to destination chats')
+MESSAGES_COALESCED = REGISTRY.counter(
+    'forwarder_messages_coalesced_total', 'Messages sent merged with others from the same sender')
+MESSAGES_EDITED = REGISTRY.counter(
+    'forwarder_messages_edited_total', 'Forwarded copies updated after their source was edited')
+MESSAGES_DELETED = REGISTRY.counter(
+    'forwarder_messages_deleted_total', 'Source messages whose deletion was propagated to a destination')
+MESSAGES_SKIPPED = REGISTRY.counter(
+    'forwarder_messages_skipped_total', 'Messages not forwarded, by reason', ['reason'])
+ERRORS = REGISTRY.counter(
+    'forwarder_errors_total', 'Errors by stage and exception type', ['stage', 'type'])
+SEND_RETRIES = REGISTRY.counter(
+    'forwarder_send_retries_total', 'Sends retried after a transient error, by exception type', ['type'])
+FLOOD_WAITS = REGISTRY.counter(
+    'forwarder_flood_waits_total', 'FloodWait and slow mode errors received')
+FLOOD_WAIT_SECONDS = REGISTRY.counter(
+    'forwarder_flood_wait_seconds_total', 'Seconds requested by FloodWait and slow mode errors')
+ACCOUNT_REQUESTS = REGISTRY.counter(
+    'forwarder_account_requests_total', 'Requests sent, by account', ['account'])
+ACCOUNT_BUSY_SECONDS = REGISTRY.counter(
+    'forwarder_account_busy_seconds_total', 'Seconds spent in requests, by account', ['account'])
+ACCOUNT_FLOOD_WAITS = REGISTRY.counter(
+    'forwarder_account_flood_waits_total', 'FloodWait and slow mode errors received, by account', ['account'])
+STAGE_LATENCY = REGISTRY.histogram(
+    'forwarder_stage_latency_seconds', 'Time spent in each stage of the forwarding path', ['stage'])
\ No newline at end of file
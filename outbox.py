@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+class Outbox:
+    """
+    Append-only write-ahead log of messages accepted for forwarding.
+    
+    A message is added when it is received and completed once all its forwards
+    and their mappings are stored. Records are written and fsynced in batches
+    on a short timer; completions are only written after the message storage is
+    flushed, so a completed message is never forwarded again after a crash.
+    Messages still pending at startup are replayed.
+    """
+    
+    def __init__(self, path: str, sync_interval: float = 0.1, compact_threshold: int = 10000,
+                 before_sync: Optional[Callable[[], None]] = None):
+        """
+        Initialize the Outbox.
+        
+        Args:
+            path: Path of the log file
+            sync_interval: Seconds to collect records before writing and fsyncing them
+            compact_threshold: Number of records written since the last compaction that triggers one
+            before_sync: Function making stored mappings durable, called before completions are written
+        """
+        self._path = path
+        self._sync_interval = sync_interval
+        self._compact_threshold = compact_threshold
+        self._before_sync = before_sync
+        
+        # Messages added but not completed yet, keyed by (chat_id, message_id)
+        self._pending: Dict[Tuple[int, int], None] = {}
+        # Records waiting for the next sync
+        self._buffer: List[str] = []
+        self._records_since_compaction = 0
+        self._sync_handle: Optional[asyncio.TimerHandle] = None
+        self._file = None
+        # Whether a failed write may have left a partial line at the end of the log
+        self._torn = False
+        
+        self._added = 0
+        self._completed = 0
+        self._syncs = 0
+    
+    def load(self) -> List[Tuple[int, int]]:
+        """
+        Read the log, compact it to the pending messages and open it for appending.
+        
+        Returns:
+            The (chat_id, message_id) pairs of the messages that were never completed, in log order
+        """
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        if os.path.exists(self._path):
+            with open(self._path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        key = (int(record['chat_id']), int(record['id']))
+                    except (ValueError, KeyError, TypeError):
+                        # A torn write at the end of the log from a crash
+                        logger.warning(f"Skipping unreadable outbox record: {line.strip()[:100]}")
+                        continue
+                    if record.get('done'):
+                        self._pending.pop(key, None)
+                    else:
+                        self._pending[key] = None
+        
+        self._compact()
+        if self._pending:
+            logger.info(f"Outbox has {len(self._pending)} unfinished messages to replay")
+        return list(self._pending)
+    
+    def add(self, chat_id: int, message_id: int) -> None:
+        """
+        Record that a message was accepted for forwarding.
+        
+        Args:
+            chat_id: The ID of the source chat
+            message_id: The ID of the message
+        """
+        key = (chat_id, message_id)
+        if key in self._pending:
+            return
+        
+        self._pending[key] = None
+        self._added += 1
+        self._buffer.append(json.dumps({'chat_id': chat_id, 'id': message_id}))
+        self._schedule_sync()
+    
+    def complete(self, chat_id: int, message_id: int) -> None:
+        """
+        Record that a message was forwarded to all its destinations.
+        
+        Args:
+            chat_id: The ID of the source chat
+            message_id: The ID of the message
+        """
+        if self._pending.pop((chat_id, message_id), False) is False:
+            return
+        
+        self._completed += 1
+        self._buffer.append(json.dumps({'chat_id': chat_id, 'id': message_id, 'done': True}))
+        self._schedule_sync()
+    
+    def sync(self) -> None:
+        """Write the buffered records and fsync the log."""
+        if self._sync_handle is not None:
+            self._sync_handle.cancel()
+            self._sync_handle = None
+        
+        if not self._buffer or self._file is None:
+            return
+        
+        if self._before_sync is not None:
+            self._before_sync()
+        
+        records, self._buffer = self._buffer, []
+        try:
+            # Start on a new line after a failed write, so a partial record stays on its own line
+            self._file.write(('\n' if self._torn else '') + '\n'.join(records) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            # Keep the records for the next attempt, ahead of any added since
+            self._buffer = records + self._buffer
+            self._torn = True
+            logger.error(f"Error writing outbox, keeping {len(records)} records for the next sync: {e}")
+            self._schedule_retry()
+            return
+        
+        self._torn = False
+        self._syncs += 1
+        self._records_since_compaction += len(records)
+        if self._records_since_compaction >= self._compact_threshold:
+            self._compact()
+    
+    def close(self) -> None:
+        """Write the buffered records and close the log."""
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        logger.info(f"Outbox stats: {self.stats}")
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the outbox counters.
+        
+        Returns:
+            Dictionary with added, completed and pending messages and the number of fsyncs
+        """
+        return {
+            'added': self._added,
+            'completed': self._completed,
+            'pending': len(self._pending),
+            'syncs': self._syncs,
+        }
+    
+    def _compact(self) -> None:
+        """Replace the log with one holding only the pending messages."""
+        if self._file is not None:
+            self._file.close()
+        
+        temporary_path = f"{self._path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            for chat_id, message_id in self._pending:
+                file.write(json.dumps({'chat_id': chat_id, 'id': message_id}) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self._path)
+        
+        self._file = open(self._path, 'a', encoding='utf-8')
+        self._records_since_compaction = 0
+        self._torn = False
+    
+    def _schedule_sync(self) -> None:
+        """Schedule a sync on the running event loop, or sync now if there is none."""
+        if self._sync_handle is not None:
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.sync()
+            return
+        
+        self._sync_handle = loop.call_later(self._sync_interval, self.sync)    
+    def _schedule_retry(self) -> None:
+        """Schedule another sync after a failed one, if an event loop is running."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a loop the next add, complete or close retries
+            return
+        self._schedule_sync()
\ No newline at end of file
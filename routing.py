@@ -0,0 +1,173 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+from telethon.tl.types import Message
+
+from message_handler import MessageHandler
+from message_repository import MessageRepository
+from user_service import UserService
+
+
+class RoutingTable:
+    """
+    Precomputed index of message handlers by source chat ID.
+    
+    Routes with the same source and destination chats share one repository. A message
+    matching several of them is passed to that repository by the first one only.
+    """
+    
+    def __init__(self):
+        """Initialize an empty RoutingTable."""
+        # Map of source chat IDs to the handlers of every route monitoring the chat
+        self._handlers: Dict[int, Tuple[MessageHandler, ...]] = {}
+        # Name and tracked users of every route, in configuration order
+        self._routes: List[Tuple[str, UserService]] = []
+    
+    def add_route(self, name: str, user_service: UserService) -> None:
+        """
+        Register a route so its tracked users can be changed at runtime.
+        
+        Args:
+            name: Name of the route
+            user_service: The service deciding which users the route tracks
+        """
+        self._routes.append((name, user_service))
+    
+    def add_handler(self, chat_id: int, handler: MessageHandler) -> None:
+        """
+        Register a handler for messages from a source chat.
+        
+        Args:
+            chat_id: The ID of the source chat
+            handler: The handler of a route monitoring the chat
+        """
+        self._handlers[chat_id] = self._handlers.get(chat_id, ()) + (handler,)
+    
+    def handlers_for_chat(self, chat_id: int) -> Tuple[MessageHandler, ...]:
+        """
+        Get the handlers for messages from a source chat.
+        
+        Args:
+            chat_id: The ID of the source chat
+        
+        Returns:
+            The handlers of every route monitoring the chat, empty if there are none
+        """
+        return self._handlers.get(chat_id, ())
+    
+    def is_tracked(self, chat_id: int, user_id: int) -> bool:
+        """
+        Check if any route monitoring a chat tracks a user.
+        
+        Args:
+            chat_id: The ID of the source chat
+            user_id: The ID of the user
+        
+        Returns:
+            True if messages from the user in the chat are forwarded, False otherwise
+        """
+        return any(handler.user_service.is_tracked(user_id) for handler in self._handlers.get(chat_id, ()))
+    
+    async def dispatch(self, message: Message) -> List[asyncio.Future]:
+        """
+        Pass a message to every route monitoring the chat it was sent in.
+        
+        Args:
+            message: The message to dispatch
+        
+        Returns:
+            Futures of sends still pending because the message was buffered for coalescing
+        """
+        handlers = self._handlers.get(message.chat_id, ())
+        if len(handlers) == 1:
+            return await handlers[0].handle_message(message)
+        if not handlers:
+            return []
+        
+        taken: Set[MessageRepository] = set()
+        calls = []
+        for handler in handlers:
+            calls.append(handler.handle_message(message, frozenset(taken)))
+            if handler.accepts(message):
+                taken.update(handler.repositories)
+        results = await asyncio.gather(*calls)
+        return [send for pending_sends in results for send in pending_sends]
+    
+    def is_handled(self, message: Message) -> bool:
+        """
+        Check if a dispatched message reached every destination of the routes that forward it.
+        
+        Args:
+            message: The dispatched message
+        
+        Returns:
+            True if nothing is left to forward, False if a forward failed or is still pending
+        """
+        return all(handler.is_handled(message) for handler in self._handlers.get(message.chat_id, ()))
+    
+    async def dispatch_edit(self, message: Message) -> None:
+        """
+        Pass an edited message to every route monitoring the chat it was sent in.
+        
+        Args:
+            message: The message in its edited state
+        """
+        taken: Set[MessageRepository] = set()
+        calls = []
+        for handler in self._handlers.get(message.chat_id, ()):
+            calls.append(handler.handle_edit(message, frozenset(taken)))
+            if handler.tracks(message):
+                taken.update(handler.repositories)
+        await asyncio.gather(*calls)
+    
+    async def dispatch_delete(self, chat_id: Optional[int], message_ids: List[int]) -> None:
+        """
+        Pass deleted message IDs to every route monitoring the chat they were deleted in.
+        
+        Args:
+            chat_id: The ID of the chat, or None if Telegram didn't say, which happens
+                for basic groups whose message IDs are unique across the account's chats
+            message_ids: IDs of the deleted messages
+        """
+        if chat_id is not None:
+            handlers = self._handlers.get(chat_id, ())
+        else:
+            handlers = tuple(
+                handler
+                for source_chat_id, chat_handlers in self._handlers.items() if not str(source_chat_id).startswith('-100')
+                for handler in chat_handlers
+            )
+        taken: Set[MessageRepository] = set()
+        calls = []
+        for handler in handlers:
+            calls.append(handler.handle_delete(message_ids, frozenset(taken)))
+            taken.update(handler.repositories)
+        await asyncio.gather(*calls)
+    
+    async def flush(self) -> None:
+        """Send the messages buffered for coalescing in every route."""
+        repositories = {
+            id(repository): repository
+            for chat_handlers in self._handlers.values() for handler in chat_handlers
+            for repository in handler.repositories
+        }
+        await asyncio.gather(*(repository.flush() for repository in repositories.values()))
+    
+    @property
+    def routes(self) -> List[Tuple[str, UserService]]:
+        """
+        Get the routes of the table.
+        
+        Returns:
+            List of route names and their user services
+        """
+        return list(self._routes)
+    
+    @property
+    def source_chat_ids(self) -> List[int]:
+        """
+        Get the IDs of all monitored chats.
+        
+        Returns:
+            List of source chat IDs
+        """
+        return list(self._handlers)
\ No newline at end of file
@@ -0,0 +1,342 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError, SlowModeWaitError, ServerError, TimedOutError
+from loguru import logger
+
+from client_pool import ClientPool, SenderAccount
+from metrics import FLOOD_WAITS, FLOOD_WAIT_SECONDS, SEND_RETRIES, STAGE_LATENCY
+
+
+# Send priorities, lower values are sent first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+# Errors worth retrying with backoff; anything else fails the send immediately
+RETRYABLE_ERRORS = (ServerError, TimedOutError, ConnectionError, asyncio.TimeoutError)
+
+
+class TokenBucket:
+    """Token bucket rate limiter that can also be paused for a fixed time."""
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the TokenBucket.
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens the bucket holds
+        """
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+    
+    def delay(self) -> float:
+        """
+        Get the time until a token is available.
+        
+        Returns:
+            Seconds to wait before a token can be consumed, 0 if one is available now
+        """
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+        
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self._rate
+    
+    def consume(self) -> None:
+        """Take one token from the bucket."""
+        self._tokens -= 1
+    
+    def pause(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for the given time and empty the bucket.
+        
+        Args:
+            seconds: Seconds to pause for
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class SendScheduler:
+    """
+    Central scheduler for outbound Telegram requests.
+    
+    Requests are queued per destination chat, ordered by priority and sent with an
+    account of the client pool. Each account is rate limited with a token bucket per
+    chat plus a global one. FloodWait errors pause the affected bucket for the requested
+    time and the request is retried, with another account if the pool has one and the
+    request isn't bound to an account, instead of dropped.
+    """
+    
+    def __init__(self, client: TelegramClient, per_chat_rate: float = 20 / 60, per_chat_burst: int = 5,
+                 global_rate: float = 30, max_retries: int = 5, base_backoff: float = 1.0,
+                 max_backoff: float = 60.0, pool: Optional[ClientPool] = None):
+        """
+        Initialize the SendScheduler.
+        
+        Args:
+            client: An authenticated TelegramClient instance
+            per_chat_rate: Requests per second allowed for a single chat
+            per_chat_burst: Number of requests a single chat can send back to back
+            global_rate: Requests per second allowed across all chats
+            max_retries: Number of retries for a request failing with a retryable error
+            base_backoff: Seconds to wait before the first retry, doubled on each further retry
+            max_backoff: Maximum seconds to wait between retries
+            pool: Accounts requests are spread over, only the client if not provided
+        """
+        self._pool = pool if pool is not None else ClientPool(client)
+        self._per_chat_rate = per_chat_rate
+        self._per_chat_burst = per_chat_burst
+        self._global_rate = global_rate
+        self._max_retries = max_retries
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        
+        # Rate limiters per account, across chats and per chat
+        self._global_buckets: Dict[str, TokenBucket] = {}
+        self._buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        # Per-chat state: pending request heap and the task draining it
+        self._queues: Dict[int, List[Tuple[int, int, Callable, asyncio.Future, bool, Optional[str]]]] = {}
+        self._dispatchers: Dict[int, asyncio.Task] = {}
+        self._sequence = itertools.count()
+        
+        self._sent = 0
+        self._retries = 0
+        self._failures = 0
+        self._flood_waits = 0
+        self._flood_wait_seconds = 0
+    
+    async def submit(self, chat_id: int, operation: Callable[[TelegramClient], Awaitable[Any]],
+                     priority: int = PRIORITY_NORMAL, pinned: bool = False, sender: Optional[str] = None) -> Any:
+        """
+        Queue a request for a chat and wait for its result.
+        
+        Args:
+            chat_id: The ID of the chat the request is sent to
+            operation: Coroutine function performing the request with the given client
+            priority: Priority of the request, PRIORITY_HIGH requests go first
+            pinned: Whether the request must be sent by the listening account, e.g. because it
+                refers to media or messages only that account has resolved
+            sender: Name of the account that must send the request, e.g. because only the
+                author of a message may edit it
+        
+        Returns:
+            The result of the request
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues.setdefault(chat_id, []),
+                       (priority, next(self._sequence), operation, future, pinned, sender))
+        
+        if chat_id not in self._dispatchers:
+            self._dispatchers[chat_id] = asyncio.create_task(self._dispatch(chat_id))
+        
+        return await future
+    
+    async def send_message(self, chat_id: int, *args, priority: int = PRIORITY_NORMAL, **kwargs) -> Any:
+        """
+        Send a message through the scheduler.
+        
+        Args:
+            chat_id: The ID of the chat to send the message to
+            *args: Positional arguments for TelegramClient.send_message
+            priority: Priority of the send, PRIORITY_HIGH sends go first
+            **kwargs: Keyword arguments for TelegramClient.send_message
+        
+        Returns:
+            The sent message
+        """
+        # Media references belong to the account that resolved them
+        return await self.submit(
+            chat_id,
+            lambda client: client.send_message(chat_id, *args, **kwargs),
+            priority,
+            pinned=kwargs.get('file') is not None
+        )
+    
+    def sender_of(self, message: Any) -> str:
+        """
+        Get the name of the account that sent a message.
+        
+        Args:
+            message: A message returned by a request, which keeps the client it came from
+        
+        Returns:
+            The name of the account, to send later edits and deletions of the message with
+        """
+        return self._pool.account_of(getattr(message, 'client', None)).name
+    
+    async def stop(self) -> None:
+        """Cancel all pending requests and stop the dispatchers."""
+        for task in self._dispatchers.values():
+            task.cancel()
+        await asyncio.gather(*self._dispatchers.values(), return_exceptions=True)
+        self._dispatchers.clear()
+        
+        for queue in self._queues.values():
+            for _, _, _, future, _, _ in queue:
+                if not future.done():
+                    future.cancel()
+        self._queues.clear()
+        logger.info(f"Send scheduler stats: {self.stats}")
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the scheduler counters.
+        
+        Returns:
+            Dictionary with sent, retried and failed requests, FloodWait count and seconds, and queued requests
+        """
+        return {
+            'sent': self._sent,
+            'retries': self._retries,
+            'failures': self._failures,
+            'flood_waits': self._flood_waits,
+            'flood_wait_seconds': self._flood_wait_seconds,
+            'queued': sum(len(queue) for queue in self._queues.values()),
+        }
+    
+    async def _dispatch(self, chat_id: int) -> None:
+        """
+        Send the queued requests for a chat one at a time until its queue is empty.
+        
+        Args:
+            chat_id: The ID of the chat to send requests for
+        """
+        queue = self._queues[chat_id]
+        
+        try:
+            while queue:
+                # Wait until the next request could go out, without taking a token yet
+                head = queue[0]
+                await self._wait_for_token(self._pool.select(chat_id, head[4], head[5]), chat_id, consume=False)
+                # Pick the request only now, so higher priority requests queued meanwhile go first
+                _, _, operation, future, pinned, sender = heapq.heappop(queue)
+                if future.done():
+                    # The caller went away while the request was queued
+                    continue
+                # Take the token from the account that sends the picked request, which
+                # differs from the one waited for if the request is bound to an account
+                account = self._pool.select(chat_id, pinned, sender)
+                await self._wait_for_token(account, chat_id)
+                
+                try:
+                    result = await self._send(chat_id, account, operation, pinned, sender)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    self._failures += 1
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                
+                self._sent += 1
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._dispatchers.pop(chat_id, None)
+            if not queue:
+                self._queues.pop(chat_id, None)
+    
+    async def _send(self, chat_id: int, account: SenderAccount,
+                    operation: Callable[[TelegramClient], Awaitable[Any]], pinned: bool,
+                    sender: Optional[str] = None) -> Any:
+        """
+        Perform a request, waiting out FloodWait errors and retrying transient failures.
+        
+        Args:
+            chat_id: The ID of the chat the request is sent to
+            account: The account to send the request with, whose token has been taken
+            operation: Coroutine function performing the request with the given client
+            pinned: Whether the request must be sent by the listening account
+            sender: Name of the account that must send the request, if any
+            
+        Returns:
+            The result of the request
+        """
+        attempt = 0
+        while True:
+            try:
+                with STAGE_LATENCY.time(stage='api'), self._pool.track(account):
+                    return await operation(account.client)
+            except (FloodWaitError, SlowModeWaitError) as e:
+                self._flood_waits += 1
+                self._flood_wait_seconds += e.seconds
+                FLOOD_WAITS.inc()
+                FLOOD_WAIT_SECONDS.inc(e.seconds)
+                self._bucket(account, chat_id).pause(e.seconds)
+                self._pool.report_flood_wait(account, chat_id, e.seconds)
+                
+                # Fail over to an account that isn't waiting, if there is one
+                next_account = self._pool.select(chat_id, pinned, sender)
+                if next_account is account:
+                    logger.warning(f"FloodWait of {e.seconds}s for chat {chat_id}, retrying after it")
+                else:
+                    logger.warning(f"FloodWait of {e.seconds}s for chat {chat_id} on account {account.name}, "
+                                   f"retrying with {next_account.name}")
+                account = next_account
+                await self._wait_for_token(account, chat_id)
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self._max_retries:
+                    raise
+                self._retries += 1
+                SEND_RETRIES.inc(type=type(e).__name__)
+                backoff = min(self._max_backoff, self._base_backoff * 2 ** (attempt - 1))
+                backoff *= random.uniform(0.5, 1.5)
+                logger.warning(f"Send to chat {chat_id} failed ({e}), retry {attempt} in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+    
+    async def _wait_for_token(self, account: SenderAccount, chat_id: int, consume: bool = True) -> None:
+        """
+        Wait until both the chat bucket and the global bucket of an account have a token, then consume them.
+        
+        Args:
+            account: The account the request is sent with
+            chat_id: The ID of the chat the request is sent to
+            consume: Whether to take the tokens, False to only wait until they are available
+        """
+        bucket = self._bucket(account, chat_id)
+        global_bucket = self._global_buckets.get(account.name)
+        if global_bucket is None:
+            global_bucket = self._global_buckets[account.name] = TokenBucket(self._global_rate, self._global_rate)
+        
+        while True:
+            delay = max(bucket.delay(), global_bucket.delay())
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        
+        if consume:
+            bucket.consume()
+            global_bucket.consume()
+    
+    def _bucket(self, account: SenderAccount, chat_id: int) -> TokenBucket:
+        """
+        Get the token bucket of an account for a chat, creating it on first use.
+        
+        Args:
+            account: The account sending to the chat
+            chat_id: The ID of the chat
+        
+        Returns:
+            The token bucket
+        """
+        key = (account.name, chat_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self._per_chat_rate, self._per_chat_burst)
+        return bucket
\ No newline at end of file
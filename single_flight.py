@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single in-flight operation."""
+    
+    def __init__(self):
+        """Initialize the SingleFlight registry."""
+        # Map of keys to the task currently computing their result
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+    
+    async def run(self, key: Hashable, operation: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run an operation for a key, or wait for the one already running for it.
+        
+        Args:
+            key: The key identifying the operation
+            operation: Factory returning the coroutine to run if nothing is in flight for the key
+        
+        Returns:
+            The result of the operation shared by every concurrent caller
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(operation())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        
+        # Shield the shared task so one cancelled caller does not cancel it for the others
+        return await asyncio.shield(task)
+    
+    def is_in_flight(self, key: Hashable) -> bool:
+        """
+        Check if an operation is currently running for a key.
+        
+        Args:
+            key: The key to check
+        
+        Returns:
+            True if an operation is in flight for the key, False otherwise
+        """
+        return key in self._in_flight
+    
+    def __len__(self) -> int:
+        """Return the number of operations currently in flight."""
+        return len(self._in_flight)
\ No newline at end of file
@@ -0,0 +1,366 @@
+import asyncio
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+from message_storage import MessageStorage
+
+
+class SqliteMessageStorage(MessageStorage):
+    """
+    Persistent message storage backed by SQLite in WAL mode.
+    
+    Inserts are buffered and committed in groups on a short timer. The IDs of forwarded
+    messages are loaded into the same bitmaps the in-memory storage uses, so the duplicate
+    check on the hot path never reads the database, and a bounded LRU cache in front of
+    the database serves mapping lookups.
+    """
+    
+    def __init__(self, path: str, flush_interval: float = 0.5, cache_size: int = 10000,
+                 max_batch_size: int = 500):
+        """
+        Initialize the SQLite message storage.
+        
+        Args:
+            path: Path to the SQLite database file
+            flush_interval: Seconds to wait before committing buffered inserts
+            cache_size: Maximum number of mappings kept in the in-memory LRU cache
+            max_batch_size: Number of buffered inserts that triggers an immediate commit
+        """
+        super().__init__()
+        self._path = path
+        self._flush_interval = flush_interval
+        self._cache_size = cache_size
+        self._max_batch_size = max_batch_size
+        
+        # LRU cache of recently used mappings
+        # {(source_chat_id, source_message_id, destination_chat_id): destination_message_id}
+        self._cache: "OrderedDict[Tuple[int, int, int], int]" = OrderedDict()
+        
+        # Inserts waiting for the next group commit, keyed the same way as the cache
+        # {(source_chat_id, source_message_id, destination_chat_id): (destination_message_id, sender)}
+        self._pending: Dict[Tuple[int, int, int], Tuple[int, Optional[str]]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS message_mappings (
+                source_chat_id INTEGER NOT NULL,
+                source_message_id INTEGER NOT NULL,
+                destination_chat_id INTEGER NOT NULL,
+                destination_message_id INTEGER NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                sender TEXT,
+                PRIMARY KEY (source_chat_id, source_message_id, destination_chat_id)
+            ) WITHOUT ROWID
+            """
+        )
+        # Databases created before deletions were propagated have no tombstone column,
+        # and those created before the sending account was recorded have no sender column
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(message_mappings)")}
+        if 'deleted' not in columns:
+            self._connection.execute("ALTER TABLE message_mappings ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+        if 'sender' not in columns:
+            self._connection.execute("ALTER TABLE message_mappings ADD COLUMN sender TEXT")
+        # Reverse lookups from a forwarded copy to its sources, for edits and deletions
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS message_mappings_destination "
+            "ON message_mappings (destination_chat_id, destination_message_id)"
+        )
+        self._connection.commit()
+        
+        # Deleted mappings are loaded as well, so their messages are never forwarded again
+        forwarded = 0
+        for source_chat_id, source_message_id, destination_chat_id in self._connection.execute(
+            "SELECT source_chat_id, source_message_id, destination_chat_id FROM message_mappings"
+        ):
+            self._mark_forwarded(source_chat_id, source_message_id, destination_chat_id)
+            forwarded += 1
+        logger.info(f"Opened SQLite message storage at {path} with {forwarded} forwarded messages")
+    
+    def add_message_mapping(self, source_chat_id: int, source_message_id: int,
+                           destination_chat_id: int, destination_message_id: int,
+                           sender: Optional[str] = None) -> None:
+        """
+        Add a mapping between a source message and its forwarded destination message.
+        
+        The mapping is visible to lookups immediately and is written to disk
+        with the next group commit.
+        
+        Args:
+            source_chat_id: The ID of the source chat
+            source_message_id: The ID of the source message
+            destination_chat_id: The ID of the destination chat
+            destination_message_id: The ID of the destination message
+            sender: Name of the account that sent the destination message, None to keep the known one
+        """
+        key = (source_chat_id, source_message_id, destination_chat_id)
+        self._remember(key, destination_message_id)
+        self._pending[key] = (destination_message_id, sender)
+        self._mark_forwarded(source_chat_id, source_message_id, destination_chat_id)
+        logger.debug("Added message mapping: {} -> {}", key, destination_message_id)
+        
+        if len(self._pending) >= self._max_batch_size:
+            self.flush()
+        else:
+            self._schedule_flush()
+    
+    def add_message_mappings(self, mappings: Iterable[Tuple[int, int, int, int]],
+                             sender: Optional[str] = None) -> None:
+        """
+        Add many mappings at once, such as the messages of one bulk forward.
+        
+        The batch is checked against the group commit size once instead of per mapping.
+        
+        Args:
+            mappings: (source_chat_id, source_message_id, destination_chat_id, destination_message_id) tuples
+            sender: Name of the account that sent the destination messages
+        """
+        count = 0
+        for source_chat_id, source_message_id, destination_chat_id, destination_message_id in mappings:
+            key = (source_chat_id, source_message_id, destination_chat_id)
+            self._remember(key, destination_message_id)
+            self._pending[key] = (destination_message_id, sender)
+            self._mark_forwarded(source_chat_id, source_message_id, destination_chat_id)
+            count += 1
+        if not count:
+            return
+        logger.debug("Added {} message mappings", count)
+        
+        if len(self._pending) >= self._max_batch_size:
+            self.flush()
+        else:
+            self._schedule_flush()
+    
+    def get_destination_message_id(self, source_chat_id: int, source_message_id: int,
+                                   destination_chat_id: Optional[int] = None) -> Optional[int]:
+        """
+        Get the destination message ID for a given source message.
+        
+        Args:
+            source_chat_id: The ID of the source chat
+            source_message_id: The ID of the source message
+            destination_chat_id: The ID of the destination chat, or None for any destination
+        
+        Returns:
+            The ID of the destination message if it exists, None otherwise
+        """
+        if destination_chat_id is None:
+            return self._lookup_any_destination(source_chat_id, source_message_id)
+        return self._lookup((source_chat_id, source_message_id, destination_chat_id))
+    
+    def get_source_message_ids(self, destination_chat_id: int, destination_message_id: int) -> List[Tuple[int, int]]:
+        """
+        Get the source messages a destination message was created from.
+        
+        Args:
+            destination_chat_id: The ID of the destination chat
+            destination_message_id: The ID of the destination message
+            
+        Returns:
+            (source_chat_id, source_message_id) pairs in message ID order, empty if unknown
+        """
+        rows = self._connection.execute(
+            "SELECT source_chat_id, source_message_id FROM message_mappings "
+            "WHERE destination_chat_id = ? AND destination_message_id = ? AND deleted = 0",
+            (destination_chat_id, destination_message_id)
+        ).fetchall()
+        # Buffered inserts override what was committed before them
+        sources = {
+            (source_chat_id, source_message_id) for source_chat_id, source_message_id in rows
+            if self._pending.get((source_chat_id, source_message_id, destination_chat_id),
+                                 (destination_message_id,))[0] == destination_message_id
+        }
+        sources.update(
+            (source_chat_id, source_message_id)
+            for (source_chat_id, source_message_id, pending_chat_id), (value, _) in self._pending.items()
+            if pending_chat_id == destination_chat_id and value == destination_message_id
+        )
+        return sorted(sources, key=lambda source: (source[1], source[0]))
+    
+    def get_sender(self, destination_chat_id: int, destination_message_id: int) -> Optional[str]:
+        """
+        Get the account that sent a destination message.
+        
+        Args:
+            destination_chat_id: The ID of the destination chat
+            destination_message_id: The ID of the destination message
+            
+        Returns:
+            The name of the account, None if it wasn't recorded
+        """
+        for (_, _, pending_chat_id), (value, sender) in self._pending.items():
+            if pending_chat_id == destination_chat_id and value == destination_message_id and sender is not None:
+                return sender
+        
+        # Deleted mappings still tell who sent a copy that is rebuilt from the remaining ones
+        row = self._connection.execute(
+            "SELECT sender FROM message_mappings "
+            "WHERE destination_chat_id = ? AND destination_message_id = ? AND sender IS NOT NULL LIMIT 1",
+            (destination_chat_id, destination_message_id)
+        ).fetchone()
+        return row[0] if row is not None else None
+    
+    def remove_message_mapping(self, source_chat_id: int, source_message_id: int, destination_chat_id: int) -> None:
+        """
+        Forget where a source message was forwarded to, e.g. after it was deleted.
+        
+        The row is kept as a tombstone, so like in the in-memory storage the message
+        is still recognised as forwarded, also after a restart, and never sent again.
+        
+        Args:
+            source_chat_id: The ID of the source chat
+            source_message_id: The ID of the source message
+            destination_chat_id: The ID of the destination chat
+        """
+        key = (source_chat_id, source_message_id, destination_chat_id)
+        self._cache.pop(key, None)
+        pending = self._pending.pop(key, None)
+        try:
+            with self._connection:
+                if pending is not None:
+                    # Not committed yet, so write it as a tombstone right away
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO message_mappings "
+                        "(source_chat_id, source_message_id, destination_chat_id, destination_message_id, "
+                        "sender, deleted) VALUES (?, ?, ?, ?, ?, 1)",
+                        key + pending
+                    )
+                else:
+                    self._connection.execute(
+                        "UPDATE message_mappings SET deleted = 1 "
+                        "WHERE source_chat_id = ? AND source_message_id = ? AND destination_chat_id = ?",
+                        key
+                    )
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting message mapping {key}: {e}")
+    
+    @property
+    def persistent(self) -> bool:
+        """
+        Check if the mappings survive a restart.
+        
+        Returns:
+            True, the mappings are kept in the database
+        """
+        return True
+    
+    def flush(self) -> None:
+        """Commit all buffered inserts to the database in a single transaction."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        if not self._pending:
+            return
+        
+        pending, self._pending = self._pending, {}
+        try:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO message_mappings "
+                    "(source_chat_id, source_message_id, destination_chat_id, destination_message_id, "
+                    "sender, deleted) VALUES (?, ?, ?, ?, ?, 0)",
+                    [key + value for key, value in pending.items()]
+                )
+            logger.debug("Committed {} message mappings", len(pending))
+        except sqlite3.Error as e:
+            # Keep the rows so the next flush can retry them
+            pending.update(self._pending)
+            self._pending = pending
+            logger.error(f"Error committing message mappings: {e}")
+    
+    def close(self) -> None:
+        """Flush buffered inserts and close the database connection."""
+        self.flush()
+        self._connection.close()
+        logger.info("Closed SQLite message storage")
+    
+    def _lookup(self, key: Tuple[int, int, int]) -> Optional[int]:
+        """
+        Look up a mapping in the LRU cache, then the pending inserts, then the database.
+        
+        Args:
+            key: The (source_chat_id, source_message_id, destination_chat_id) triple to look up
+        
+        Returns:
+            The ID of the destination message if it exists, None otherwise
+        """
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+            return value
+        
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending[0]
+        
+        row = self._connection.execute(
+            "SELECT destination_message_id FROM message_mappings "
+            "WHERE source_chat_id = ? AND source_message_id = ? AND destination_chat_id = ? AND deleted = 0",
+            key
+        ).fetchone()
+        if row is None:
+            return None
+        
+        self._remember(key, row[0])
+        return row[0]
+    
+    def _lookup_any_destination(self, source_chat_id: int, source_message_id: int) -> Optional[int]:
+        """
+        Look up a mapping of a source message to any destination chat in the pending inserts,
+        then the database, bypassing the LRU cache.
+        
+        Args:
+            source_chat_id: The ID of the source chat
+            source_message_id: The ID of the source message
+        
+        Returns:
+            The ID of a destination message if one exists, None otherwise
+        """
+        # Buffered inserts override what was committed before them
+        for (pending_chat_id, pending_message_id, _), (value, _) in self._pending.items():
+            if pending_chat_id == source_chat_id and pending_message_id == source_message_id:
+                return value
+        
+        row = self._connection.execute(
+            "SELECT destination_message_id FROM message_mappings "
+            "WHERE source_chat_id = ? AND source_message_id = ? AND deleted = 0 LIMIT 1",
+            (source_chat_id, source_message_id)
+        ).fetchone()
+        return row[0] if row is not None else None
+    
+    def _remember(self, key: Tuple[int, int, int], value: int) -> None:
+        """
+        Put a mapping into the LRU cache, evicting the least recently used entry if full.
+        
+        Args:
+            key: The (source_chat_id, source_message_id, destination_chat_id) triple
+            value: The ID of the destination message
+        """
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+    
+    def _schedule_flush(self) -> None:
+        """Schedule a group commit on the running event loop, or commit now if there is none."""
+        if self._flush_handle is not None:
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        
+        self._flush_handle = loop.call_later(self._flush_interval, self.flush)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+from loguru import logger
+
+
+class StateSnapshot:
+    """
+    State of several components saved on shutdown and restored before connecting on the next start.
+    
+    Each component stores a JSON-serializable section under its own name, so a restart
+    doesn't have to rebuild what the previous run already knew.
+    """
+    
+    def __init__(self, path: Optional[str]):
+        """
+        Initialize the StateSnapshot.
+        
+        Args:
+            path: Path of the JSON file the snapshot is saved to, or None to disable it
+        """
+        self._path = path
+        self._sections: Dict[str, Any] = {}
+    
+    def load(self) -> None:
+        """Load the snapshot from disk, starting empty if it is missing or unreadable."""
+        if not self._path or not os.path.exists(self._path):
+            return
+        
+        try:
+            with open(self._path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading state snapshot: {e}")
+            return
+        
+        self._sections = data.get('sections', {})
+        age = time.time() - data.get('saved_at', time.time())
+        logger.info(f"Loaded state snapshot with {len(self._sections)} sections, saved {age:.0f}s ago")
+    
+    def get(self, name: str) -> Optional[Any]:
+        """
+        Get the saved state of a component.
+        
+        Args:
+            name: Name of the section
+        
+        Returns:
+            The saved state, None if there is none
+        """
+        return self._sections.get(name)
+    
+    def set(self, name: str, state: Any) -> None:
+        """
+        Replace the state of a component, saved with the next save.
+        
+        Args:
+            name: Name of the section
+            state: JSON-serializable state
+        """
+        self._sections[name] = state
+    
+    def save(self) -> None:
+        """Write the snapshot to disk, replacing the previous one in one step."""
+        if not self._path:
+            return
+        
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        temp_path = f"{self._path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({'saved_at': time.time(), 'sections': self._sections}, file)
+            os.replace(temp_path, self._path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Error saving state snapshot: {e}")
\ No newline at end of file
@@ -1,61 +1,178 @@
 import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
 from telethon import TelegramClient, events
 from telethon.tl.types import Message
 from loguru import logger
 
-from config import TelegramConfig, ForwarderConfig
+from config import TelegramConfig, ForwarderConfig, reload_forwarder_config
 from user_service import UserService
 from message_repository import MessageRepository
+from message_storage import MessageStorage
+from sqlite_message_storage import SqliteMessageStorage
+from entity_cache import EntityCache
+from send_scheduler import SendScheduler
+from client_pool import ClientPool
+from message_cache import RecentMessageCache, MessageBatchFetcher
+from media_cache import MediaCache
+from content_dedup import ContentIndex
 from message_handler import MessageHandler
+from message_pipeline import MessagePipeline
+from routing import RoutingTable
+from backfill import Backfiller, CursorStore
+from event_recorder import EventRecorder
+from outbox import Outbox
+from debouncer import Debouncer
+from admin_commands import AdminCommands
+from state_snapshot import StateSnapshot
+from logging_setup import MESSAGE_LOG
+from metrics import REGISTRY, EVENTS_RECEIVED, STAGE_LATENCY, MetricsServer
+
+
+# Settings a reload applies; the others only take effect after a restart
+RELOADABLE_SETTINGS = (
+    'source_chat_id', 'destination_chat_id', 'routes_file', 'routes', 'tracked_users', 'enable_message_links',
+    'message_template', 'message_link_text', 'message_formatter', 'coalesce_window', 'coalesce_max_messages',
+    'album_window', 'native_forward', 'native_forward_window',
+)
 
 
 class TelegramForwarder:
     """Main application class for the Telegram message forwarding system."""
     
-    def __init__(self, telegram_config: TelegramConfig, forwarder_config: ForwarderConfig):
+    def __init__(self, telegram_config: TelegramConfig, forwarder_config: ForwarderConfig,
+                 backfill_from: Optional[int] = None, client: Optional[TelegramClient] = None,
+                 senders: Optional[Sequence[Tuple[str, TelegramClient]]] = None):
         """
         Initialize the TelegramForwarder.
         
         Args:
             telegram_config: Configuration for Telegram API authentication
             forwarder_config: Configuration for message forwarding
+            backfill_from: Message ID to backfill every source chat from, overriding the saved cursors
+            client: Client to use instead of creating one from the Telegram configuration
+            senders: Names and clients of sending accounts to use instead of the configured sender sessions
         """
         self._telegram_config = telegram_config
         self._forwarder_config = forwarder_config
+        self._backfill_from = backfill_from
         
         # Initialize client
-        self._client = TelegramClient(
+        self._client = client if client is not None else TelegramClient(
             'forwarder_session',
             telegram_config.api_id,
             telegram_config.api_hash
         )
         
+        # Accounts that share the sending, each logged in with its own session
+        if senders is None:
+            senders = [
+                (session, TelegramClient(session, telegram_config.api_id, telegram_config.api_hash))
+                for session in forwarder_config.sender_sessions
+            ]
+        self._client_pool = ClientPool(
+            self._client,
+            senders,
+            strategy=forwarder_config.send_pool_strategy,
+            include_primary=forwarder_config.send_pool_include_listener
+        )
+        
         # Initialize services
-        self._user_service = UserService(forwarder_config.tracked_users)
-        self._message_repository = None
-        self._message_handler = None
+        self._message_storage = self._create_message_storage()
+        self._entity_cache = EntityCache(
+            self._client,
+            ttl=forwarder_config.entity_cache_ttl,
+            negative_ttl=forwarder_config.entity_cache_negative_ttl,
+            path=forwarder_config.entity_cache_path
+        )
+        self._send_scheduler = SendScheduler(
+            self._client,
+            per_chat_rate=forwarder_config.send_rate_per_chat / 60,
+            per_chat_burst=forwarder_config.send_burst_per_chat,
+            global_rate=forwarder_config.send_global_rate,
+            max_retries=forwarder_config.send_max_retries,
+            pool=self._client_pool
+        )
+        self._recent_messages = RecentMessageCache(forwarder_config.reply_cache_size)
+        self._message_fetcher = MessageBatchFetcher(self._client, window=forwarder_config.reply_fetch_window)
+        self._media_cache = MediaCache(
+            self._client,
+            max_bytes=forwarder_config.media_cache_max_mb * 1024 * 1024,
+            chunk_size=forwarder_config.media_chunk_size_kb * 1024,
+            temp_dir=forwarder_config.media_temp_dir
+        )
+        self._content_index = (
+            ContentIndex(
+                window=forwarder_config.content_dedup_window,
+                max_entries=forwarder_config.content_dedup_max_entries
+            )
+            if forwarder_config.content_dedup else None
+        )
+        self._cursor_store = CursorStore(forwarder_config.backfill_cursor_path)
+        self._state_snapshot = StateSnapshot(forwarder_config.state_snapshot_path or None)
+        self._outbox = (
+            Outbox(
+                forwarder_config.outbox_path,
+                sync_interval=forwarder_config.outbox_sync_interval,
+                before_sync=self._message_storage.flush
+            )
+            if forwarder_config.outbox_enabled else None
+        )
+        self._event_recorder = (
+            EventRecorder(forwarder_config.record_events_path) if forwarder_config.record_events_path else None
+        )
+        self._metrics_server = (
+            MetricsServer(REGISTRY, forwarder_config.metrics_port, forwarder_config.metrics_host)
+            if forwarder_config.metrics_port else None
+        )
+        # Repeated edits of a message within the delay result in one update of its copies
+        self._edit_debouncer = Debouncer(self._propagate_edit, delay=forwarder_config.edit_debounce)
+        self._routing_table = None
+        self._message_pipeline = None
+        
+        # Callbacks registered for the source chats, replaced when a reload changes the chats
+        self._event_handlers = []
+        self._reload_lock = asyncio.Lock()
+        self._admin_commands = None
+        self._config_watcher = None
+        
+        # Seconds from calling start until events were handled, and the work deferred past that point
+        self._ready_seconds: Optional[float] = None
+        self._warm_up_task = None
+        self._log_summarizer = None
+        # New messages received while catching up, forwarded once the catch-up is done; None after that
+        self._held_messages: Optional[List[Message]] = []
     
     async def start(self):
         """Start the forwarder and begin listening for messages."""
         try:
+            started_at = time.perf_counter()
             logger.info("Starting Telegram Forwarder")
             
+            # Restore what the last run knew before connecting, so it isn't looked up again
+            self._state_snapshot.load()
+            self._entity_cache.load()
+            self._client_pool.import_state(self._state_snapshot.get('client_pool'))
+            if self._persist_content_index:
+                self._content_index.import_state(self._state_snapshot.get('content_index'))
+            
             # Connect to Telegram
             await self._client.start(phone=self._telegram_config.phone_number)
             logger.info("Connected to Telegram")
             
             # Initialize repositories and handlers after client is connected
-            self._message_repository = MessageRepository(
-                self._client,
-                self._forwarder_config.destination_chat_id,
-                self._forwarder_config.source_chat_id
-            )
+            self._routing_table = self._build_routing_table(self._forwarder_config)
             
-            self._message_handler = MessageHandler(
-                self._user_service,
-                self._message_repository,
-                self._forwarder_config.enable_message_links
+            self._message_pipeline = MessagePipeline(
+                self._process_message,
+                worker_count=self._forwarder_config.pipeline_workers,
+                queue_size=self._forwarder_config.pipeline_queue_size
             )
+            await self._message_pipeline.start()
+            self._register_gauges()
+            if self._metrics_server is not None:
+                await self._metrics_server.start()
             
             # Log feature status
             if self._forwarder_config.enable_message_links:
@@ -63,8 +180,43 @@ class TelegramForwarder:
             else:
                 logger.info("Message link feature is disabled")
             
-            # Register event handlers
+            # Read what the last run left unfinished before new messages are logged
+            self._cursor_store.load()
+            unfinished = self._outbox.load() if self._outbox is not None else []
+            
+            # Receive events right away, new messages are held until the catch-up below is done
             self._register_event_handlers()
+            self._ready_seconds = time.perf_counter() - started_at
+            logger.info(f"Ready to forward {self._ready_seconds:.2f}s after starting")
+            
+            # Nothing the first messages depend on is left, the rest is done in the background
+            self._warm_up_task = asyncio.ensure_future(self._warm_up())
+            # Summaries of per-message lines are due also while no messages arrive
+            if MESSAGE_LOG.sampled:
+                self._log_summarizer = asyncio.ensure_future(self._summarize_log())
+            
+            # Accept configuration changes while running
+            if self._forwarder_config.control_chat_id is not None:
+                await self._register_control_handler()
+            if self._forwarder_config.config_watch_interval > 0:
+                self._config_watcher = asyncio.ensure_future(self._watch_config())
+            
+            # Finish forwards interrupted by the last shutdown before anything new
+            if unfinished:
+                await self._replay_outbox(unfinished)
+            
+            # Catch up on messages posted while the forwarder was down, up to where live events took over
+            backfiller = None
+            if self._forwarder_config.backfill_enabled or self._backfill_from is not None:
+                backfiller = Backfiller(
+                    self._client,
+                    self._routing_table,
+                    self._message_pipeline,
+                    self._cursor_store,
+                    self._recent_messages
+                )
+                await backfiller.run(self._routing_table.source_chat_ids, self._backfill_from)
+            await self._release_held_messages(backfiller)
             
             # Keep the client running
             await self._run_until_disconnected()
@@ -73,13 +225,427 @@ class TelegramForwarder:
             logger.error(f"Error starting Telegram Forwarder: {e}")
             raise
     
+    @property
+    def ready_seconds(self) -> Optional[float]:
+        """
+        Get the startup time.
+        
+        Returns:
+            Seconds from calling start until events were handled, None if that point wasn't reached yet
+        """
+        return self._ready_seconds
+    
+    async def _release_held_messages(self, backfiller: Optional[Backfiller]) -> None:
+        """
+        Forward the new messages received while catching up, then forward new messages as they arrive.
+        
+        Messages the backfill already submitted are dropped.
+        
+        Args:
+            backfiller: The backfiller that caught up on the source chats, None if backfill is off
+        """
+        held = self._held_messages
+        released = 0
+        # Messages arriving while the held ones are submitted join the end of the list
+        while held:
+            message = held.pop(0)
+            watermark = backfiller.watermark(message.chat_id) if backfiller is not None else None
+            if watermark is not None and message.id <= watermark:
+                continue
+            self._cursor_store.begin(message.chat_id, message.id)
+            await self._message_pipeline.submit(message)
+            released += 1
+        self._held_messages = None
+        if released:
+            logger.info(f"Forwarding {released} messages received while catching up")
+    
+    async def _warm_up(self) -> None:
+        """
+        Resolve tracked users and log in the sender accounts after events are handled.
+        
+        Until they are done, lookups of a user share the pending resolution and the primary sends everything.
+        """
+        try:
+            await self._entity_cache.prewarm(
+                {user_id for _, user_service in self._routing_table.routes for user_id in user_service.tracked_users}
+            )
+            self._entity_cache.save()
+            await self._client_pool.start(
+                {chat_id for route in self._forwarder_config.routes for chat_id in route.destination_chat_ids}
+            )
+        except Exception as e:
+            logger.error(f"Error warming up after startup: {e}")
+    
+    @property
+    def _persist_content_index(self) -> bool:
+        """
+        Check if recently forwarded contents are kept across restarts.
+        
+        A restored content only leads to the copy of its first message through the stored
+        mappings, so it is only kept with a storage whose mappings survive the restart.
+        
+        Returns:
+            True if content deduplication is enabled and the message storage is persistent
+        """
+        return self._content_index is not None and self._message_storage.persistent
+    
+    def _create_message_storage(self) -> MessageStorage:
+        """
+        Create the message storage backend selected in the configuration.
+        
+        Returns:
+            The configured message storage
+        """
+        if self._forwarder_config.storage_backend == 'sqlite':
+            return SqliteMessageStorage(
+                self._forwarder_config.storage_path,
+                flush_interval=self._forwarder_config.storage_flush_interval,
+                cache_size=self._forwarder_config.storage_cache_size
+            )
+        
+        # A horizon of 0 keeps every mapping
+        return MessageStorage(mapping_horizon=self._forwarder_config.storage_mapping_horizon or None)
+    
+    def _build_routing_table(self, config: ForwarderConfig) -> RoutingTable:
+        """
+        Create the handlers for every configured route and index them by source chat.
+        
+        Routes with the same source and destination chats share the repository the first
+        of them creates, so a message matching several routes is forwarded once.
+        
+        Args:
+            config: The configuration to take the routes and their settings from
+        
+        Returns:
+            The routing table used to dispatch incoming messages
+        """
+        routing_table = RoutingTable()
+        # Repositories by (source_chat_id, destination_chat_id), with the route that created each and its settings
+        repositories: Dict[Tuple[int, int], Tuple[str, Tuple, MessageRepository]] = {}
+        for route in config.routes:
+            user_service = UserService(route.tracked_users)
+            routing_table.add_route(route.name, user_service)
+            coalesce_window = (
+                route.coalesce_window if route.coalesce_window is not None
+                else config.coalesce_window
+            )
+            coalesce_max_messages = (
+                route.coalesce_max_messages if route.coalesce_max_messages is not None
+                else config.coalesce_max_messages
+            )
+            native_forward = (
+                route.native_forward if route.native_forward is not None
+                else config.native_forward
+            )
+            settings = (coalesce_window, coalesce_max_messages, native_forward)
+            for source_chat_id in route.source_chat_ids:
+                route_repositories = []
+                for destination_chat_id in route.destination_chat_ids:
+                    key = (source_chat_id, destination_chat_id)
+                    if key in repositories:
+                        owner, owner_settings, repository = repositories[key]
+                        if owner_settings != settings:
+                            logger.warning(f"Routes '{owner}' and '{route.name}' both forward chat {source_chat_id} "
+                                           f"to chat {destination_chat_id}, using the settings of '{owner}'")
+                    else:
+                        repository = MessageRepository(
+                            self._client,
+                            destination_chat_id,
+                            source_chat_id,
+                            self._message_storage,
+                            self._entity_cache,
+                            self._send_scheduler,
+                            self._recent_messages,
+                            self._message_fetcher,
+                            self._media_cache,
+                            config.message_formatter,
+                            coalesce_window,
+                            coalesce_max_messages,
+                            config.album_window,
+                            native_forward,
+                            config.native_forward_window,
+                            self._content_index
+                        )
+                        repositories[key] = (route.name, settings, repository)
+                    route_repositories.append(repository)
+                handler = MessageHandler(
+                    user_service,
+                    route_repositories,
+                    config.enable_message_links,
+                    route.message_filter
+                )
+                routing_table.add_handler(source_chat_id, handler)
+            
+            logger.info(f"Route '{route.name}': {len(route.source_chat_ids)} sources -> "
+                        f"{len(route.destination_chat_ids)} destinations, {len(route.tracked_users)} tracked users")
+        
+        return routing_table
+    
+    async def _process_message(self, message: Message) -> None:
+        """
+        Pass a message to its routes and record it as processed for backfill.
+        
+        Args:
+            message: The message to process
+        """
+        # A reload may replace the table before buffered sends finish
+        routing_table = self._routing_table
+        pending_sends = await routing_table.dispatch(message)
+        if pending_sends:
+            # Buffered for coalescing, so the message is only done once the merged message is sent
+            asyncio.gather(*pending_sends, return_exceptions=True).add_done_callback(
+                lambda _: self._complete_message(routing_table, message)
+            )
+        else:
+            self._complete_message(routing_table, message)
+    
+    def _complete_message(self, routing_table: RoutingTable, message: Message) -> None:
+        """
+        Mark a processed message done for backfill and in the outbox if it reached every destination.
+        
+        A message whose forward failed stays pending in the outbox and holds the backfill
+        cursor back, so it is retried on the next start.
+        
+        Args:
+            routing_table: The routing table the message was dispatched with
+            message: The processed message
+        """
+        handled = routing_table.is_handled(message)
+        self._cursor_store.complete(message.chat_id, message.id, handled)
+        if not handled:
+            logger.warning(f"Message {message.id} of chat {message.chat_id} wasn't forwarded to every destination, "
+                           f"leaving it for a retry")
+        elif self._outbox is not None:
+            self._outbox.complete(message.chat_id, message.id)
+    
+    async def _replay_outbox(self, pending: List[Tuple[int, int]]) -> None:
+        """
+        Forward the messages accepted before the last shutdown that were never completed.
+        
+        Args:
+            pending: The (chat_id, message_id) pairs of the unfinished messages, as loaded from the outbox
+        """
+        message_ids_by_chat: Dict[int, List[int]] = {}
+        for chat_id, message_id in pending:
+            message_ids_by_chat.setdefault(chat_id, []).append(message_id)
+        
+        replayed = 0
+        for chat_id, message_ids in message_ids_by_chat.items():
+            for start in range(0, len(message_ids), 100):
+                batch = message_ids[start:start + 100]
+                try:
+                    messages = await self._client.get_messages(chat_id, ids=batch)
+                except Exception as e:
+                    # Leave the messages pending for the next start
+                    logger.error(f"Error fetching unfinished messages from chat {chat_id}: {e}")
+                    continue
+                
+                for message_id, message in zip(batch, messages):
+                    if message is None:
+                        # Deleted in the meantime, nothing left to forward
+                        self._outbox.complete(chat_id, message_id)
+                        continue
+                    self._recent_messages.add(message)
+                    self._cursor_store.begin(chat_id, message_id)
+                    await self._message_pipeline.submit(message)
+                    replayed += 1
+        
+        logger.info(f"Replaying {replayed} unfinished messages from the outbox")
+    
+    def _register_gauges(self) -> None:
+        """Expose queue lengths and lag of the running services as metrics."""
+        pipeline = self._message_pipeline
+        REGISTRY.gauge('forwarder_pipeline_queue_depth', 'Messages waiting for a pipeline worker',
+                       lambda: pipeline.queue_depth)
+        REGISTRY.gauge('forwarder_pipeline_queue_lag_seconds', 'Age of the oldest message waiting for a worker',
+                       lambda: pipeline.oldest_wait)
+        REGISTRY.gauge('forwarder_send_queue_depth', 'Sends waiting in the scheduler',
+                       lambda: self._send_scheduler.stats['queued'])
+        REGISTRY.gauge('forwarder_ready_seconds', 'Seconds from starting until events were handled',
+                       lambda: self._ready_seconds)
+    
     def _register_event_handlers(self):
         """Register event handlers for the client."""
-        @self._client.on(events.NewMessage(chats=[self._forwarder_config.source_chat_id]))
+        @self._client.on(events.NewMessage(chats=self._routing_table.source_chat_ids))
         async def on_new_message(event):
             """Handle new message events."""
             message: Message = event.message
-            await self._message_handler.handle_message(message)
+            EVENTS_RECEIVED.inc()
+            with STAGE_LATENCY.time(stage='receive'):
+                # Remember every source message so replies to it resolve without a network call
+                self._recent_messages.add(message)
+                # Log messages that will be forwarded so a crash before their send doesn't lose them
+                if self._outbox is not None and self._routing_table.is_tracked(message.chat_id, message.sender_id):
+                    self._outbox.add(message.chat_id, message.id)
+                if self._event_recorder is not None:
+                    self._event_recorder.record(message)
+                if self._held_messages is not None:
+                    self._held_messages.append(message)
+                    return
+                self._cursor_store.begin(message.chat_id, message.id)
+                await self._message_pipeline.submit(message)
+        
+        self._event_handlers.append(on_new_message)
+        
+        if self._forwarder_config.propagate_edits:
+            @self._client.on(events.MessageEdited(chats=self._routing_table.source_chat_ids))
+            async def on_message_edited(event):
+                """Handle message edit events."""
+                message: Message = event.message
+                # Replies to the message resolve to its new version
+                self._recent_messages.add(message)
+                if self._routing_table.is_tracked(message.chat_id, message.sender_id):
+                    self._edit_debouncer.submit((message.chat_id, message.id), message)
+            
+            self._event_handlers.append(on_message_edited)
+        
+        if self._forwarder_config.propagate_deletes:
+            # Deletions in basic groups come without a chat, so they can't be filtered by chat here
+            @self._client.on(events.MessageDeleted())
+            async def on_message_deleted(event):
+                """Handle message deletion events."""
+                chat_id = event.chat_id
+                if chat_id is not None and not self._routing_table.handlers_for_chat(chat_id):
+                    return
+                for message_id in event.deleted_ids:
+                    self._edit_debouncer.cancel((chat_id, message_id))
+                await self._routing_table.dispatch_delete(chat_id, event.deleted_ids)
+            
+            self._event_handlers.append(on_message_deleted)
+    
+    def _unregister_event_handlers(self) -> None:
+        """Remove the event handlers registered for the source chats."""
+        for callback in self._event_handlers:
+            self._client.remove_event_handler(callback)
+        self._event_handlers = []
+    
+    async def _register_control_handler(self) -> None:
+        """Listen for admin commands in the control chat."""
+        control_chat_id = self._forwarder_config.control_chat_id
+        # Without a list of admins only the account owner may send commands
+        admin_user_ids = self._forwarder_config.admin_user_ids or [(await self._client.get_me()).id]
+        self._admin_commands = AdminCommands(
+            self._client,
+            self._entity_cache,
+            lambda: self._routing_table,
+            self.reload,
+            admin_user_ids
+        )
+        
+        @self._client.on(events.NewMessage(chats=[control_chat_id]))
+        async def on_control_message(event):
+            """Handle messages in the control chat."""
+            if event.chat_id != control_chat_id:
+                return
+            answer = await self._admin_commands.handle(event.message)
+            if answer is None:
+                return
+            try:
+                sent = await self._send_scheduler.send_message(control_chat_id, answer, reply_to=event.message.id)
+                self._admin_commands.remember_answer(sent.id)
+            except Exception as e:
+                logger.error(f"Error answering admin command: {e}")
+        
+        logger.info(f"Accepting admin commands in chat {control_chat_id} from {len(admin_user_ids)} users")
+    
+    async def reload(self) -> bool:
+        """
+        Reload the routes and tracked users from the configuration without reconnecting.
+        
+        The new routing table is built and the entity cache warmed for new users before
+        the table replaces the current one in a single step, so every message is handled
+        entirely by either the old or the new routes.
+        
+        Returns:
+            True if the configuration was reloaded, False if it was invalid or the forwarder isn't running
+        """
+        if self._routing_table is None:
+            logger.warning("Not reloading the configuration before the forwarder has started")
+            return False
+        
+        async with self._reload_lock:
+            try:
+                config = reload_forwarder_config()
+            except (ValueError, OSError) as e:
+                logger.error(f"Keeping the current configuration, the new one is invalid: {e}")
+                return False
+            
+            restart_required = sorted(
+                name for name, value in vars(config).items()
+                if name not in RELOADABLE_SETTINGS and value != getattr(self._forwarder_config, name, None)
+            )
+            if restart_required:
+                logger.warning(f"Changes to {', '.join(restart_required)} take effect after a restart")
+            
+            routing_table = self._build_routing_table(config)
+            if self._admin_commands is not None:
+                self._admin_commands.apply(routing_table)
+            await self._entity_cache.prewarm(
+                {user_id for _, user_service in routing_table.routes for user_id in user_service.tracked_users}
+            )
+            self._entity_cache.save()
+            known_destinations = {
+                chat_id for route in self._forwarder_config.routes for chat_id in route.destination_chat_ids
+            }
+            await self._client_pool.prepare(
+                {chat_id for route in config.routes for chat_id in route.destination_chat_ids} - known_destinations
+            )
+            
+            old_routing_table = self._routing_table
+            for name in RELOADABLE_SETTINGS:
+                setattr(self._forwarder_config, name, getattr(config, name))
+            self._routing_table = routing_table
+            if set(routing_table.source_chat_ids) != set(old_routing_table.source_chat_ids):
+                self._unregister_event_handlers()
+                self._register_event_handlers()
+            
+            # Send what the old routes were still collecting
+            await old_routing_table.flush()
+            logger.info(f"Configuration reloaded: {len(config.routes)} routes, "
+                        f"{len(config.tracked_users)} tracked users")
+            return True
+    
+    async def _watch_config(self) -> None:
+        """Reload the configuration whenever one of its files changes."""
+        modified = self._config_modification_times()
+        while True:
+            await asyncio.sleep(self._forwarder_config.config_watch_interval)
+            current = self._config_modification_times()
+            if current != modified:
+                logger.info("Configuration files changed, reloading")
+                await self.reload()
+                # A reload may point to another routes file
+                modified = self._config_modification_times()
+    
+    async def _summarize_log(self) -> None:
+        """Log a summary of the per-message lines every summary interval."""
+        while True:
+            await asyncio.sleep(MESSAGE_LOG.interval)
+            MESSAGE_LOG.summarize()
+    
+    def _config_modification_times(self) -> Dict[str, Optional[int]]:
+        """
+        Get the modification times of the configuration files.
+        
+        Returns:
+            Dictionary of path to modification time in nanoseconds, None for missing files
+        """
+        times = {}
+        for path in self._forwarder_config.source_paths:
+            try:
+                times[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                times[path] = None
+        return times
+    
+    async def _propagate_edit(self, message: Message) -> None:
+        """
+        Update the copies of an edited message once its edits have settled.
+        
+        Args:
+            message: The latest version of the edited message
+        """
+        await self._routing_table.dispatch_edit(message)
     
     async def _run_until_disconnected(self):
         """Run the client until disconnected."""
@@ -90,8 +656,42 @@ class TelegramForwarder:
         """Stop the forwarder and disconnect from Telegram."""
         try:
             logger.info("Stopping Telegram Forwarder")
+            if self._config_watcher is not None:
+                self._config_watcher.cancel()
+            if self._message_pipeline is not None:
+                await self._message_pipeline.stop()
+            if self._routing_table is not None:
+                await self._routing_table.flush()
+            await self._edit_debouncer.flush()
+            logger.info(f"Edit debouncer stats: {self._edit_debouncer.stats}")
+            if self._log_summarizer is not None:
+                self._log_summarizer.cancel()
+            MESSAGE_LOG.summarize()
+            await self._send_scheduler.stop()
+            if self._warm_up_task is not None:
+                self._warm_up_task.cancel()
+            await self._client_pool.stop()
+            self._state_snapshot.set('client_pool', self._client_pool.export_state())
+            if self._persist_content_index:
+                self._state_snapshot.set('content_index', self._content_index.export_state())
+            self._state_snapshot.save()
+            self._cursor_store.save()
+            if self._outbox is not None:
+                self._outbox.close()
+            if self._event_recorder is not None:
+                self._event_recorder.close()
+            logger.info(f"Reply cache stats: {self._recent_messages.stats}, "
+                        f"batched fetches: {self._message_fetcher.requests}")
+            logger.info(f"Media cache stats: {self._media_cache.stats}")
+            if self._content_index is not None:
+                logger.info(f"Content deduplication stats: {self._content_index.stats}")
+            if self._metrics_server is not None:
+                await self._metrics_server.stop()
             await self._client.disconnect()
             logger.info("Disconnected from Telegram")
+            self._message_storage.close()
+            self._entity_cache.save()
+            logger.info(f"Entity cache stats: {self._entity_cache.stats}")
         except Exception as e:
             logger.error(f"Error stopping Telegram Forwarder: {e}")
             raise 
\ No newline at end of file
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+from loguru import logger
+
+# The forwarder modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark.harness import configure_environment
+
+
+@pytest.fixture(autouse=True)
+def quiet_logs():
+    """Keep the forwarder's log output out of the test report."""
+    logger.remove()
+    yield
+
+
+@pytest.fixture
+def environment(tmp_path):
+    """
+    Configure the forwarder for the fake chats, with its files in a temporary directory.
+    
+    Yields:
+        Function applying the benchmark environment plus the given overrides
+    """
+    saved = dict(os.environ)
+    
+    def configure(**overrides: str) -> None:
+        configure_environment(str(tmp_path), overrides)
+    
+    yield configure
+    os.environ.clear()
+    os.environ.update(saved)
\ No newline at end of file
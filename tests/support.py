@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Callable, Optional, Sequence, Tuple
+
+from telethon import events
+
+from benchmark.fake_client import FakeMessage, FakeTelegramClient
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    """
+    Wait until a condition holds.
+    
+    Args:
+        condition: Function checking the condition
+        timeout: Seconds to wait before failing
+    """
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def start_forwarder(client: FakeTelegramClient,
+                          senders: Optional[Sequence[Tuple[str, FakeTelegramClient]]] = None):
+    """
+    Start a forwarder with fake clients and wait until it handles events.
+    
+    Args:
+        client: The fake client of the listening account
+        senders: Names and fake clients of sending accounts
+    
+    Returns:
+        The forwarder and the task running it
+    """
+    # Imported here so the configuration module reads the test environment
+    from config import TelegramConfig, ForwarderConfig
+    from telegram_forwarder import TelegramForwarder
+    
+    forwarder = TelegramForwarder(TelegramConfig(), ForwarderConfig(), client=client, senders=senders or [])
+    runner = asyncio.ensure_future(forwarder.start())
+    await wait_for(lambda: runner.done() or forwarder.ready_seconds is not None)
+    if runner.done():
+        runner.result()
+    return forwarder, runner
+
+
+async def stop_forwarder(forwarder, runner: asyncio.Future) -> None:
+    """
+    Stop a forwarder started with start_forwarder.
+    
+    Args:
+        forwarder: The forwarder
+        runner: The task running it
+    """
+    await forwarder.stop()
+    await runner
+
+
+async def deliver(client: FakeTelegramClient, event_type: type, message: FakeMessage) -> None:
+    """
+    Pass a message to the handlers registered for an event type, like Telethon does for an update.
+    
+    Args:
+        client: The fake client the handlers are registered with
+        event_type: events.NewMessage or events.MessageEdited
+        message: The message of the update
+    """
+    client.add_history(message)
+    event = SimpleNamespace(message=message, chat_id=message.chat_id)
+    # MessageEdited builds on NewMessage, so the type is compared exactly
+    for builder, handler in list(client.handlers):
+        if type(builder) is event_type:
+            await handler(event)
+
+
+async def deliver_deletion(client: FakeTelegramClient, chat_id: int, message_ids: Sequence[int]) -> None:
+    """
+    Pass a deletion to the handlers registered for it.
+    
+    Args:
+        client: The fake client the handlers are registered with
+        chat_id: The ID of the chat the messages were deleted in
+        message_ids: IDs of the deleted messages
+    """
+    event = SimpleNamespace(chat_id=chat_id, deleted_ids=list(message_ids))
+    for builder, handler in list(client.handlers):
+        if type(builder) is events.MessageDeleted:
+            await handler(event)
\ No newline at end of file
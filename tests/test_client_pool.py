@@ -0,0 +1,25 @@
+import asyncio
+
+from benchmark.fake_client import FakeTelegramClient
+from client_pool import ClientPool
+
+CHAT_ID = -1001000000002
+
+
+def test_sender_accounts_that_are_not_logged_in_are_left_out():
+    """Logging in would ask for a code on the terminal, so the pool only connects and checks the session."""
+    async def scenario():
+        primary = FakeTelegramClient()
+        logged_in = FakeTelegramClient()
+        logged_out = FakeTelegramClient(authorized=False)
+        pool = ClientPool(primary, [('s1', logged_out), ('s2', logged_in)], include_primary=False)
+        await pool.start([CHAT_ID])
+        
+        assert [account.name for account in pool.accounts] == ['primary', 's2']
+        assert 'start' not in logged_out.calls and 'start' not in logged_in.calls
+        assert not logged_out.is_connected()
+        assert {pool.select(chat_id).name for chat_id in range(CHAT_ID - 20, CHAT_ID)} == {'primary'}
+        assert pool.select(CHAT_ID).name == 's2'
+        await pool.stop()
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,74 @@
+import asyncio
+import itertools
+
+import pytest
+from telethon import events
+
+from benchmark.fake_client import FakeMessage, FakeTelegramClient
+from benchmark.streams import SOURCE_CHAT_ID, TRACKED_USERS, make_document
+from support import deliver, deliver_deletion, start_forwarder, stop_forwarder, wait_for
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_edits_and_deletes_are_sent_by_the_author_of_the_copy(environment, backend):
+    """Only the account that sent a copy may edit it, so the fake clients reject edits by anyone else."""
+    environment(STORAGE_BACKEND=backend, EDIT_DEBOUNCE='0', COALESCE_WINDOW='0',
+                SEND_POOL_INCLUDE_LISTENER='false')
+    
+    async def scenario():
+        message_ids = itertools.count(1)
+        primary = FakeTelegramClient(message_ids=message_ids)
+        senders = [(name, FakeTelegramClient(message_ids=message_ids)) for name in ('s1', 's2')]
+        forwarder, runner = await start_forwarder(primary, senders)
+        # Text goes to the sender accounts once they checked the destination
+        await wait_for(lambda: all(client.calls.get('get_input_entity') for _, client in senders))
+        await asyncio.sleep(0.05)
+        
+        user_id = TRACKED_USERS[0]
+        text = FakeMessage(10, SOURCE_CHAT_ID, user_id, 'text')
+        photo = FakeMessage(11, SOURCE_CHAT_ID, user_id, 'photo', media=make_document(500, 1024))
+        for message in (text, photo):
+            await deliver(primary, events.NewMessage, message)
+        clients = [primary] + [client for _, client in senders]
+        await wait_for(lambda: sum(len(client.sent) for client in clients) == 2)
+        # Media references only resolve for the listening account
+        assert len(primary.sent) == 1
+        
+        for message in (FakeMessage(10, SOURCE_CHAT_ID, user_id, 'text edited'),
+                        FakeMessage(11, SOURCE_CHAT_ID, user_id, 'photo edited', media=photo.media)):
+            await deliver(primary, events.MessageEdited, message)
+        await wait_for(lambda: sum(client.calls.get('edit_message', 0) for client in clients) == 2)
+        await deliver_deletion(primary, SOURCE_CHAT_ID, [10, 11])
+        await stop_forwarder(forwarder, runner)
+        
+        for client in clients:
+            # Every account edited and deleted exactly the copies it sent
+            assert client.calls.get('edit_message', 0) == len(client.sent)
+            assert client.calls.get('delete_messages', 0) == (1 if client.sent else 0)
+        assert sum(len(client.sent) for client in clients) == 2
+    
+    asyncio.run(scenario())
+
+def test_album_edit_fetches_the_other_parts_with_one_request(environment):
+    """Album parts that are no longer cached are looked up together, so the batch fetcher groups them."""
+    environment(EDIT_DEBOUNCE='0', COALESCE_WINDOW='0', REPLY_CACHE_SIZE='1')
+    
+    async def scenario():
+        client = FakeTelegramClient()
+        forwarder, runner = await start_forwarder(client)
+        user_id = TRACKED_USERS[0]
+        album = [FakeMessage(20 + index, SOURCE_CHAT_ID, user_id, 'caption' if index == 0 else '',
+                             media=make_document(900 + index, 1024), grouped_id=77) for index in range(4)]
+        for message in album:
+            await deliver(client, events.NewMessage, message)
+        await wait_for(lambda: len(client.sent) == len(album))
+        fetches = client.calls.get('get_messages', 0)
+        
+        edited = FakeMessage(20, SOURCE_CHAT_ID, user_id, 'caption edited', media=album[0].media, grouped_id=77)
+        await deliver(client, events.MessageEdited, edited)
+        await wait_for(lambda: client.calls.get('edit_message', 0) > 0)
+        await stop_forwarder(forwarder, runner)
+        
+        assert client.calls.get('get_messages', 0) - fetches == 1
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,11 @@
+from message_storage import MessageStorage
+
+
+def test_memory_storage_forgets_the_sender_with_the_last_mapping():
+    storage = MessageStorage()
+    storage.add_message_mapping(1, 10, 2, 100, sender='s1')
+    storage.add_message_mapping(1, 11, 2, 100)
+    storage.remove_message_mapping(1, 10, 2)
+    assert storage.get_sender(2, 100) == 's1'
+    storage.remove_message_mapping(1, 11, 2)
+    assert storage.get_sender(2, 100) is None
\ No newline at end of file
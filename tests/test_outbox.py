@@ -0,0 +1,63 @@
+import asyncio
+import errno
+
+import outbox
+from outbox import Outbox
+
+
+class FailingFile:
+    """File that writes part of the text and fails the given number of writes, like a full disk."""
+    
+    def __init__(self, file, failures: int):
+        self._file = file
+        self.failures = failures
+    
+    def write(self, text: str) -> int:
+        if self.failures:
+            self.failures -= 1
+            self._file.write(text[:len(text) // 2])
+            raise OSError(errno.ENOSPC, 'No space left on device')
+        return self._file.write(text)
+    
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def open_failing(monkeypatch, failures: int) -> None:
+    """Make the outbox open its log for appending as a file failing the next writes."""
+    def failing_open(path, mode='r', **kwargs):
+        file = open(path, mode, **kwargs)
+        return FailingFile(file, failures) if mode == 'a' else file
+    monkeypatch.setattr(outbox, 'open', failing_open, raising=False)
+
+
+def test_records_of_a_failed_write_are_written_by_the_next_sync(tmp_path, monkeypatch):
+    path = str(tmp_path / 'outbox.jsonl')
+    open_failing(monkeypatch, failures=1)
+    log = Outbox(path)
+    log.load()
+    
+    # Without an event loop every record is synced right away; the first write fails
+    log.add(1, 10)
+    log.add(1, 11)
+    log.complete(1, 10)
+    log.close()
+    monkeypatch.undo()
+    
+    assert Outbox(path).load() == [(1, 11)]
+
+
+def test_failed_write_is_retried_without_new_records(tmp_path, monkeypatch):
+    path = str(tmp_path / 'outbox.jsonl')
+    open_failing(monkeypatch, failures=2)
+    
+    async def scenario():
+        log = Outbox(path, sync_interval=0.01)
+        log.load()
+        log.add(1, 10)
+        log.add(1, 11)
+        await asyncio.sleep(0.2)
+        # Read while the log is still open, as after a crash
+        return Outbox(path).load()
+    
+    assert asyncio.run(scenario()) == [(1, 10), (1, 11)]
\ No newline at end of file
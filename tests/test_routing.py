@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+from telethon import events
+
+from benchmark.fake_client import FakeMessage, FakeTelegramClient
+from benchmark.streams import DESTINATION_CHAT_ID, SOURCE_CHAT_ID, TRACKED_USERS
+from support import deliver, deliver_deletion, start_forwarder, stop_forwarder, wait_for
+
+OTHER_DESTINATION_CHAT_ID = -1001000000003
+
+
+@pytest.mark.parametrize('coalesce_window', ['0', '0.1'])
+def test_routes_sharing_a_destination_forward_a_message_once(environment, tmp_path, coalesce_window):
+    routes_file = tmp_path / 'routes.json'
+    routes_file.write_text(json.dumps({'routes': [
+        {'name': 'everything', 'sources': [SOURCE_CHAT_ID], 'destinations': [DESTINATION_CHAT_ID],
+         'tracked_users': TRACKED_USERS},
+        {'name': 'releases', 'sources': [SOURCE_CHAT_ID],
+         'destinations': [DESTINATION_CHAT_ID, OTHER_DESTINATION_CHAT_ID],
+         'tracked_users': TRACKED_USERS[:1], 'filters': {'keywords': ['release']}},
+    ]}))
+    environment(ROUTES_FILE=str(routes_file), COALESCE_WINDOW=coalesce_window, EDIT_DEBOUNCE='0')
+    
+    async def scenario():
+        client = FakeTelegramClient()
+        forwarder, runner = await start_forwarder(client)
+        user_id = TRACKED_USERS[0]
+        await deliver(client, events.NewMessage, FakeMessage(10, SOURCE_CHAT_ID, user_id, 'release 1.0'))
+        await deliver(client, events.NewMessage, FakeMessage(11, SOURCE_CHAT_ID, user_id, 'lunch'))
+        await wait_for(lambda: len({chat_id for chat_id, _, _ in client.sent}) == 2)
+        await asyncio.sleep(0.2)
+        
+        destinations = [chat_id for chat_id, _, _ in client.sent]
+        assert destinations.count(OTHER_DESTINATION_CHAT_ID) == 1
+        assert sum('release 1.0' in text for chat_id, text, _ in client.sent if chat_id == DESTINATION_CHAT_ID) == 1
+        
+        await deliver(client, events.MessageEdited, FakeMessage(10, SOURCE_CHAT_ID, user_id, 'release 1.1'))
+        await wait_for(lambda: client.calls.get('edit_message', 0) >= 2)
+        await asyncio.sleep(0.1)
+        assert client.calls['edit_message'] == 2
+        
+        await deliver_deletion(client, SOURCE_CHAT_ID, [10])
+        await stop_forwarder(forwarder, runner)
+        # A copy merged with the next message is rebuilt instead of deleted
+        merged = coalesce_window != '0'
+        assert client.calls['delete_messages'] == (1 if merged else 2)
+        assert client.calls['edit_message'] == (3 if merged else 2)
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,50 @@
+import asyncio
+
+from telethon.errors import FloodWaitError
+
+from benchmark.fake_client import FakeTelegramClient
+from client_pool import ClientPool
+from send_scheduler import SendScheduler
+
+CHAT_ID = -1001000000002
+
+
+async def started_scheduler():
+    primary = FakeTelegramClient()
+    senders = [('s1', FakeTelegramClient()), ('s2', FakeTelegramClient())]
+    pool = ClientPool(primary, senders, include_primary=False)
+    await pool.start([CHAT_ID])
+    return SendScheduler(primary, per_chat_rate=1000, per_chat_burst=1000, global_rate=1000, pool=pool), primary, senders
+
+
+def test_requests_bound_to_a_sender_stay_on_it_after_a_flood_wait():
+    async def scenario():
+        scheduler, primary, senders = await started_scheduler()
+        clients = []
+        
+        async def edit(client):
+            clients.append(client)
+            if len(clients) == 1:
+                raise FloodWaitError(request=None, capture=0)
+            return 'edited'
+        
+        assert await scheduler.submit(CHAT_ID, edit, sender='s2') == 'edited'
+        assert clients == [senders[1][1], senders[1][1]]
+        await scheduler.stop()
+    
+    asyncio.run(scenario())
+
+
+def test_sender_of_names_the_account_a_message_came_from():
+    async def scenario():
+        scheduler, primary, senders = await started_scheduler()
+        sent = await scheduler.send_message(CHAT_ID, 'text')
+        assert scheduler.sender_of(sent) in ('s1', 's2')
+        # Media is pinned to the listening account
+        sent = await scheduler.send_message(CHAT_ID, 'photo', file=object())
+        assert scheduler.sender_of(sent) == 'primary'
+        # Accounts that left the pool fall back to the listening account
+        assert (await scheduler.submit(CHAT_ID, lambda client: asyncio.sleep(0, client), sender='gone')) is primary
+        await scheduler.stop()
+    
+    asyncio.run(scenario())
\ No newline at end of file
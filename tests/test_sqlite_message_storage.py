@@ -0,0 +1,70 @@
+import asyncio
+import sqlite3
+
+from sqlite_message_storage import SqliteMessageStorage
+
+
+def test_sender_of_a_copy_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'messages.db')
+    storage = SqliteMessageStorage(path)
+    storage.add_message_mappings([(1, 10, 2, 100), (1, 11, 2, 100)], sender='s2')
+    # A repeat mapped to the copy later doesn't know who sent it
+    storage.add_message_mapping(3, 5, 2, 100)
+    storage.close()
+    
+    storage = SqliteMessageStorage(path)
+    assert storage.get_sender(2, 100) == 's2'
+    storage.remove_message_mapping(1, 10, 2)
+    storage.remove_message_mapping(1, 11, 2)
+    assert storage.get_sender(2, 100) == 's2'
+    assert storage.get_sender(2, 101) is None
+    storage.close()
+
+
+def test_sender_is_known_before_the_group_commit(tmp_path):
+    async def scenario():
+        storage = SqliteMessageStorage(str(tmp_path / 'messages.db'), flush_interval=60)
+        storage.add_message_mapping(1, 10, 2, 100, sender='s1')
+        assert storage.get_sender(2, 100) == 's1'
+        storage.close()
+    
+    asyncio.run(scenario())
+
+
+def test_databases_without_the_sender_column_are_migrated(tmp_path):
+    path = str(tmp_path / 'messages.db')
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE message_mappings (source_chat_id INTEGER NOT NULL, source_message_id INTEGER NOT NULL, "
+        "destination_chat_id INTEGER NOT NULL, destination_message_id INTEGER NOT NULL, "
+        "PRIMARY KEY (source_chat_id, source_message_id, destination_chat_id)) WITHOUT ROWID"
+    )
+    connection.execute("INSERT INTO message_mappings VALUES (1, 10, 2, 100)")
+    connection.commit()
+    connection.close()
+    
+    storage = SqliteMessageStorage(path)
+    assert storage.get_destination_message_id(1, 10, 2) == 100
+    assert storage.get_sender(2, 100) is None
+    storage.add_message_mapping(1, 11, 2, 101, sender='primary')
+    storage.flush()
+    assert storage.get_sender(2, 101) == 'primary'
+    storage.close()
+
+def test_lookup_for_any_destination_prefers_pending_inserts(tmp_path):
+    async def scenario():
+        storage = SqliteMessageStorage(str(tmp_path / 'messages.db'), flush_interval=60)
+        storage.add_message_mapping(1, 10, 2, 100)
+        storage.add_message_mapping(1, 11, 2, 101)
+        storage.flush()
+        
+        # The copy was sent again and the new mapping isn't committed yet
+        storage.add_message_mapping(1, 10, 2, 200)
+        assert storage.get_destination_message_id(1, 10) == 200
+        
+        storage.add_message_mapping(1, 11, 2, 201)
+        storage.remove_message_mapping(1, 11, 2)
+        assert storage.get_destination_message_id(1, 11) is None
+        storage.close()
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from loguru import logger
+from telethon import events
+
+from benchmark.fake_client import FakeMessage, FakeTelegramClient, LatencyModel
+from benchmark.streams import SOURCE_CHAT_ID, TRACKED_USERS
+from logging_setup import MESSAGE_LOG
+from support import deliver, start_forwarder, stop_forwarder, wait_for
+
+
+def test_live_messages_are_held_until_the_backfill_caught_up(environment, tmp_path):
+    (tmp_path / 'backfill_cursors.json').write_text(json.dumps({str(SOURCE_CHAT_ID): 5}))
+    environment(BACKFILL_ENABLED='true', COALESCE_WINDOW='0')
+    
+    async def scenario():
+        # Each page of history takes a while, so live messages arrive during the backfill
+        client = FakeTelegramClient(latency={'iter_messages': LatencyModel(0.3)})
+        user_id = TRACKED_USERS[0]
+        for message_id in (6, 7, 8):
+            client.add_history(FakeMessage(message_id, SOURCE_CHAT_ID, user_id, f'missed {message_id}'))
+        
+        forwarder, runner = await start_forwarder(client)
+        # Handlers are registered before the backfill, which is still running
+        assert forwarder.ready_seconds < 0.3
+        assert not client.sent
+        
+        # The backfill also finds message 8, the live event of 9 arrives after its first page
+        await deliver(client, events.NewMessage, FakeMessage(8, SOURCE_CHAT_ID, user_id, 'missed 8'))
+        await deliver(client, events.NewMessage, FakeMessage(9, SOURCE_CHAT_ID, user_id, 'live 9'))
+        assert not client.sent
+        
+        await wait_for(lambda: len(client.sent) >= 4)
+        await asyncio.sleep(0.1)
+        await stop_forwarder(forwarder, runner)
+        assert [text.split(' - ')[1] for _, text, _ in client.sent] == ['missed 6', 'missed 7', 'missed 8', 'live 9']
+    
+    asyncio.run(scenario())
+
+
+def test_summary_of_per_message_lines_is_logged_while_idle(environment):
+    environment(COALESCE_WINDOW='0')
+    lines = []
+    logger.add(lambda line: lines.append(line.record['message']), level='INFO')
+    MESSAGE_LOG.configure(sampled=True, interval=0.1)
+    
+    async def scenario():
+        client = FakeTelegramClient()
+        forwarder, runner = await start_forwarder(client)
+        await deliver(client, events.NewMessage, FakeMessage(6, SOURCE_CHAT_ID, TRACKED_USERS[0], 'hello'))
+        await wait_for(lambda: client.sent)
+        # No other message arrives to trigger the summary
+        await wait_for(lambda: any(line.startswith('Last ') and 'sent' in line for line in lines))
+        await stop_forwarder(forwarder, runner)
+    
+    try:
+        asyncio.run(scenario())
+    finally:
+        MESSAGE_LOG.configure(sampled=False)
\ No newline at end of file